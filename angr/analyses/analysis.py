@@ -7,6 +7,7 @@ import logging
 import time
 
 from ..misc.plugins import PluginVendor, VendorPreset
+from ..misc.profiling import get_profiler
 from ..misc.ux import deprecated
 from ..errors import AngrAnalysisError
 
@@ -108,7 +109,16 @@ class AnalysisFactory:
                 raise AngrAnalysisError('The "progress_callback" parameter must be a None or a callable.')
 
         oself._show_progressbar = show_progressbar
-        oself.__init__(*args, **kwargs)
+
+        profiler = get_profiler()
+        if profiler is None:
+            oself.__init__(*args, **kwargs)
+        else:
+            start = time.perf_counter()
+            try:
+                oself.__init__(*args, **kwargs)
+            finally:
+                profiler.record_analysis(oself._name, start, time.perf_counter())
         return oself
 
 
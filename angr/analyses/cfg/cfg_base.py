@@ -1,5 +1,6 @@
 
 import logging
+import multiprocessing
 from collections import defaultdict
 
 import networkx
@@ -20,10 +21,45 @@ from ...errors import SimTranslationError, SimMemoryError, SimIRSBError, SimEngi
 from ...codenode import HookNode, BlockNode
 from .. import Analysis
 from .indirect_jump_resolvers.default_resolvers import default_indirect_jump_resolvers
+from .indirect_jump_resolvers.jumptable_cache import JumpTableCache
 
 l = logging.getLogger(name=__name__)
 
 
+# The CFG instance that forked worker processes resolve indirect jumps against. Worker processes are forked right before
+# a batch of indirect jumps is resolved, so they inherit a snapshot of the CFG recovered so far.
+_parallel_resolution_cfg = None
+
+
+def _resolve_indirect_jump_in_worker(jump_addr):
+    """
+    Resolve an indirect jump inside a worker process.
+
+    :param int jump_addr:   Address of the indirect jump.
+    :return:                A tuple of (jump address, index of the resolver or None if the jump is not resolved, resolved
+                            targets, jump table information that the resolver wrote to the IndirectJump object, and
+                            (key, entry) of all entries that were stored in the jump table cache).
+    :rtype:                 tuple
+    """
+
+    cfg = _parallel_resolution_cfg
+    jump = cfg.indirect_jumps[jump_addr]
+    cache = cfg._jumptable_cache
+    if cache is not None:
+        cache.start_recording()
+    try:
+        resolved_by, targets = cfg._resolve_one_indirect_jump(jump)
+    finally:
+        cache_entries = cache.stop_recording() if cache is not None else None
+
+    if resolved_by is None:
+        return jump_addr, None, None, None, cache_entries
+
+    jumptable_info = (jump.jumptable, jump.jumptable_addr, jump.jumptable_size, jump.jumptable_entry_size,
+                      jump.jumptable_entries, jump.resolved_targets)
+    return jump_addr, cfg.indirect_jump_resolvers.index(resolved_by), targets, jumptable_info, cache_entries
+
+
 class CFGBase(Analysis):
     """
     The base class for control flow graphs.
@@ -35,7 +71,8 @@ class CFGBase(Analysis):
     def __init__(self, sort, context_sensitivity_level, normalize=False, binary=None, force_segment=False,
                  iropt_level=None, base_state=None, resolve_indirect_jumps=True, indirect_jump_resolvers=None,
                  indirect_jump_target_limit=100000, detect_tail_calls=False, low_priority=False,
-                 sp_tracking_track_memory=True, model=None,
+                 sp_tracking_track_memory=True, model=None, indirect_jump_resolution_workers=None,
+                 jumptable_cache=None,
                  ):
         """
         :param str sort:                            'fast' or 'emulated'.
@@ -60,6 +97,13 @@ class CFGBase(Analysis):
                                                     without a base pointer. Only used if detect_tail_calls is enabled.
         :param None or CFGModel model:              The CFGModel instance to write to. A new CFGModel instance will be
                                                     created and registered with the knowledge base if `model` is None.
+        :param int indirect_jump_resolution_workers: Number of worker processes to resolve pending indirect jumps
+                                                    concurrently. Indirect jumps are resolved in the main process if it
+                                                    is None or less than 2.
+        :param jumptable_cache:                     A JumpTableCache instance, or the path of a file to load a
+                                                    JumpTableCache from, that the default jump table resolver uses. A
+                                                    cache with a path is saved after the analysis completes. No cache
+                                                    is used if it is None.
 
         :return: None
         """
@@ -102,11 +146,16 @@ class CFGBase(Analysis):
 
         # Indirect jump resolvers
         self._indirect_jump_target_limit = indirect_jump_target_limit
+        self._indirect_jump_resolution_workers = indirect_jump_resolution_workers
         self._resolve_indirect_jumps = resolve_indirect_jumps
+        if isinstance(jumptable_cache, str):
+            jumptable_cache = JumpTableCache(path=jumptable_cache)
+        self._jumptable_cache = jumptable_cache
         self.timeless_indirect_jump_resolvers = [ ]
         self.indirect_jump_resolvers = [ ]
         if not indirect_jump_resolvers:
-            indirect_jump_resolvers = default_indirect_jump_resolvers(self._binary, self.project)
+            indirect_jump_resolvers = default_indirect_jump_resolvers(self._binary, self.project,
+                                                                      jumptable_cache=jumptable_cache)
         if self._resolve_indirect_jumps and indirect_jump_resolvers:
             # split them into different groups for the sake of speed
             for ijr in indirect_jump_resolvers:
@@ -228,6 +277,9 @@ class CFGBase(Analysis):
                 if not self.project.is_hooked(f.addr):
                     f.normalize()
 
+        if self._jumptable_cache is not None and self._jumptable_cache.path is not None:
+            self._jumptable_cache.save()
+
     def make_copy(self, copy_to):
         """
         Copy self attributes to the new object.
@@ -2189,27 +2241,91 @@ class CFGBase(Analysis):
 
         l.info("%d indirect jumps to resolve.", len(self._indirect_jumps_to_resolve))
 
-        all_targets = set()
-        for idx, jump in enumerate(self._indirect_jumps_to_resolve):  # type:int,IndirectJump
-            if self._low_priority:
-                self._release_gil(idx, 20, 0.0001)
-            all_targets |= self._process_one_indirect_jump(jump)
+        if self._should_resolve_indirect_jumps_in_parallel():
+            all_targets = self._process_unresolved_indirect_jumps_in_parallel()
+        else:
+            all_targets = set()
+            for idx, jump in enumerate(self._indirect_jumps_to_resolve):  # type:int,IndirectJump
+                if self._low_priority:
+                    self._release_gil(idx, 20, 0.0001)
+                all_targets |= self._process_one_indirect_jump(jump)
 
         self._indirect_jumps_to_resolve.clear()
 
         return all_targets
 
-    def _process_one_indirect_jump(self, jump):
+    def _should_resolve_indirect_jumps_in_parallel(self):
         """
-        Resolve a given indirect jump.
+        Check if pending indirect jumps should be resolved in worker processes.
 
-        :param IndirectJump jump:  The IndirectJump instance.
-        :return:        A set of resolved indirect jump targets (ints).
+        :return:    True if they should be resolved in parallel, False otherwise.
+        :rtype:     bool
         """
 
-        resolved = False
-        resolved_by = None
-        targets = None
+        workers = self._indirect_jump_resolution_workers
+        if workers is None or workers < 2:
+            return False
+        # forking is only worth it when there are enough indirect jumps to keep all workers busy
+        if len(self._indirect_jumps_to_resolve) < workers:
+            return False
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            l.warning("Resolving indirect jumps in parallel requires the fork start method, which is not supported on "
+                      "this platform. Fall back to resolving them one by one.")
+            self._indirect_jump_resolution_workers = None
+            return False
+        return True
+
+    def _process_unresolved_indirect_jumps_in_parallel(self):
+        """
+        Resolve all unresolved indirect jumps in a pool of forked worker processes. Each worker resolves indirect jumps
+        against a snapshot of the CFG recovered so far. Results are applied in the main process in the same order as
+        they would have been applied if indirect jumps were resolved one by one. Entries that the workers store in the
+        jump table cache are merged into the jump table cache of the main process.
+
+        :return:    A set of concrete indirect jump targets (ints).
+        :rtype:     set
+        """
+
+        global _parallel_resolution_cfg  # pylint:disable=global-statement
+
+        jumps = list(self._indirect_jumps_to_resolve)
+        workers = min(self._indirect_jump_resolution_workers, len(jumps))
+
+        _parallel_resolution_cfg = self
+        try:
+            with multiprocessing.get_context('fork').Pool(processes=workers) as pool:
+                results = pool.map(_resolve_indirect_jump_in_worker, [ jump.addr for jump in jumps ],
+                                   chunksize=max(1, len(jumps) // (workers * 4)))
+        finally:
+            _parallel_resolution_cfg = None
+
+        all_targets = set()
+        for jump, (_, resolver_idx, targets, jumptable_info, cache_entries) in zip(jumps, results):
+            # the jump table cache of each worker is discarded with the worker
+            if cache_entries:
+                for key, entry in cache_entries:
+                    self._jumptable_cache.store(key, entry)
+
+            if resolver_idx is None:
+                self._indirect_jump_unresolved(jump)
+                continue
+
+            jump.jumptable, jump.jumptable_addr, jump.jumptable_size, jump.jumptable_entry_size, \
+                jump.jumptable_entries, jump.resolved_targets = jumptable_info
+            self._indirect_jump_resolved(jump, jump.addr, self.indirect_jump_resolvers[resolver_idx], targets)
+            all_targets |= set(targets)
+
+        return all_targets
+
+    def _resolve_one_indirect_jump(self, jump):
+        """
+        Try to resolve a given indirect jump with all indirect jump resolvers.
+
+        :param IndirectJump jump:   The IndirectJump instance.
+        :return:                    A tuple of the resolver that resolves this indirect jump (or None if it is not
+                                    resolved), and a list of resolved targets (or None).
+        :rtype:                     tuple
+        """
 
         block = self._lift(jump.addr, opt_level=1)
 
@@ -2221,10 +2337,21 @@ class CFGBase(Analysis):
 
             resolved, targets = resolver.resolve(self, jump.addr, jump.func_addr, block, jump.jumpkind)
             if resolved:
-                resolved_by = resolver
-                break
+                return resolver, targets
 
-        if resolved:
+        return None, None
+
+    def _process_one_indirect_jump(self, jump):
+        """
+        Resolve a given indirect jump.
+
+        :param IndirectJump jump:  The IndirectJump instance.
+        :return:        A set of resolved indirect jump targets (ints).
+        """
+
+        resolved_by, targets = self._resolve_one_indirect_jump(jump)
+
+        if resolved_by is not None:
             self._indirect_jump_resolved(jump, jump.addr, resolved_by, targets)
         else:
             self._indirect_jump_unresolved(jump)
@@ -289,6 +289,8 @@ class CFGEmulated(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
 
         # Counting how many times a basic block is traced into
         self._traced_addrs = defaultdict(lambda: defaultdict(int))
+        # Jobs whose successors have not been traced because of max_steps, by block ID
+        self._step_limited_jobs = { }
 
         # A dict that collects essential parameters to properly reconstruct initial state for a block
         self._block_artifacts = {}
@@ -320,6 +322,7 @@ class CFGEmulated(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
         new_cfg.errors = list(self.errors)
         new_cfg._fail_fast = self._fail_fast
         new_cfg._max_steps = self._max_steps
+        new_cfg._step_limited_jobs = { }
         new_cfg.project = self.project
 
         # Intelligently (or stupidly... you tell me) fill it up
@@ -333,7 +336,7 @@ class CFGEmulated(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
 
         return new_cfg
 
-    def resume(self, starts=None, max_steps=None):
+    def resume(self, starts=None, max_steps=None, extend=None):
         """
         Resume a paused or terminated control flow graph recovery.
 
@@ -341,6 +344,9 @@ class CFGEmulated(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
                                 recovery from where it was paused before.
         :param int max_steps:   The maximum number of blocks on the longest path starting from each start before pausing
                                 the recovery.
+        :param dict extend:     Block IDs of nodes in paused_block_ids to continue the recovery from, mapped to the depth
+                                that each node is considered to be at. The recovery continues from each node for
+                                max_steps minus its depth blocks.
         :return: None
         """
 
@@ -355,8 +361,28 @@ class CFGEmulated(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
         if self._starts:
             self._sanitize_starts()
 
+        if extend:
+            for block_id, depth in extend.items():
+                job = self._step_limited_jobs.pop(block_id, None)
+                if job is None:
+                    continue
+                job.cfg_node.depth = depth
+                # the block has been traced, but its successors have not
+                self._traced_addrs[job.call_stack_suffix][job.addr] -= 1
+                self._insert_job(job)
+                self._register_analysis_job(job.func_addr, job)
+
         self._analyze()
 
+    @property
+    def paused_block_ids(self):
+        """
+        Block IDs of all nodes whose successors have not been recovered because of max_steps. The recovery can be
+        continued from those nodes with resume().
+        """
+
+        return self._step_limited_jobs.keys()
+
     def remove_cycles(self):
         """
         Forces graph to become acyclic, removes all loop back edges and edges between overlapped loop headers and their
@@ -723,6 +749,7 @@ class CFGEmulated(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
         self._executable_address_ranges = s['_executable_address_ranges']
         self._iropt_level = s['_iropt_level']
         self._model = s['_model']
+        self._step_limited_jobs = { }
 
     def __getstate__(self):
         s = {
@@ -1278,6 +1305,7 @@ class CFGEmulated(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
         if self._max_steps is not None:
             depth = cfg_node.depth
             if depth >= self._max_steps:
+                self._step_limited_jobs[job.block_id] = job
                 return [ ]
 
         successors = [ ]
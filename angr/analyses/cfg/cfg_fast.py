@@ -3,6 +3,7 @@ import logging
 import math
 import re
 import string
+from array import array
 from collections import defaultdict, OrderedDict
 
 from sortedcontainers import SortedDict
@@ -63,6 +64,69 @@ class FunctionReturn:
         return hash((self.callee_func_addr, self.caller_func_addr, self.call_site_addr, self.return_to))
 
 
+class DataRefsBuffer:
+    """
+    A column-oriented buffer of data references collected during CFG recovery. References reported by pyvex are appended
+    to typed arrays while blocks are being scanned, and are later processed in bulk instead of being added to the memory
+    data dict one by one.
+    """
+
+    __slots__ = ('irsb_addrs', 'stmt_idxs', 'ins_addrs', 'data_addrs', 'data_sizes', 'data_types', '_types',
+                 '_type_to_idx', )
+
+    def __init__(self):
+        self.irsb_addrs = array('Q')
+        self.stmt_idxs = array('q')
+        self.ins_addrs = array('Q')
+        self.data_addrs = array('Q')
+        self.data_sizes = array('Q')  # 0 stands for "unknown size"
+        self.data_types = array('B')  # indices into self._types
+        self._types = [ None ]
+        self._type_to_idx = { None: 0 }
+
+    def __len__(self):
+        return len(self.data_addrs)
+
+    def add(self, irsb_addr, stmt_idx, ins_addr, data_addr, data_size=None, data_type=None):
+        """
+        Append a data reference to the buffer.
+
+        :param int irsb_addr:   Address of the block where the reference is.
+        :param int stmt_idx:    ID of the statement where the reference is.
+        :param int ins_addr:    Address of the instruction where the reference is.
+        :param int data_addr:   Address of the referenced data.
+        :param int data_size:   Size of the referenced data, or None if it is unknown.
+        :param str data_type:   Type of the referenced data, or None if it is unknown.
+        :return:                None
+        """
+
+        try:
+            type_idx = self._type_to_idx[data_type]
+        except KeyError:
+            type_idx = len(self._types)
+            self._types.append(data_type)
+            self._type_to_idx[data_type] = type_idx
+
+        self.irsb_addrs.append(irsb_addr)
+        self.stmt_idxs.append(stmt_idx)
+        self.ins_addrs.append(ins_addr)
+        self.data_addrs.append(data_addr)
+        self.data_sizes.append(data_size if data_size else 0)
+        self.data_types.append(type_idx)
+
+    def data_size(self, idx):
+        size = self.data_sizes[idx]
+        return size if size else None
+
+    def data_type(self, idx):
+        return self._types[self.data_types[idx]]
+
+    def clear(self):
+        for attr in ('irsb_addrs', 'stmt_idxs', 'ins_addrs', 'data_addrs', 'data_sizes', 'data_types'):
+            arr = getattr(self, attr)
+            del arr[:]
+
+
 class PendingJobs:
     """
     A collection of pending jobs during CFG recovery.
@@ -445,6 +509,8 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                  cfb=None,
                  model=None,
                  use_patches=False,
+                 indirect_jump_resolution_workers=None,
+                 jumptable_cache=None,
                  start=None,  # deprecated
                  end=None,  # deprecated
                  collect_data_references=None, # deprecated
@@ -488,6 +554,12 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                                              types will be loaded.
         :param base_state:              A state to use as a backer for all memory loads
         :param bool detect_tail_calls:  Enable aggressive tail-call optimization detection.
+        :param int indirect_jump_resolution_workers: Number of worker processes used to resolve pending indirect jumps
+                                        in batches. Each batch is resolved against the CFG recovered so far. Indirect
+                                        jumps are resolved one by one in the current process if it is None or 1.
+        :param jumptable_cache:         A JumpTableCache instance, or the path of a file to load a JumpTableCache from,
+                                        that the default jump table resolver uses to skip resolving jump tables that it
+                                        has seen before. A cache with a path is saved after CFG recovery completes.
         :param int start:               (Deprecated) The beginning address of CFG recovery.
         :param int end:                 (Deprecated) The end address of CFG recovery.
         :param CFGArchOptions arch_options: Architecture-specific options.
@@ -518,6 +590,8 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
             detect_tail_calls=detect_tail_calls,
             low_priority=low_priority,
             model=model,
+            indirect_jump_resolution_workers=indirect_jump_resolution_workers,
+            jumptable_cache=jumptable_cache,
         )
 
         # necessary warnings
@@ -632,6 +706,7 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
         self._traced_addresses = None
         self._function_returns = None
         self._function_exits = None
+        self._data_refs = None
 
         # A mapping between address and the actual data in memory
         # self._memory_data = { }
@@ -960,6 +1035,9 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
         # phase.
         self._function_exits = defaultdict(set)
 
+        # Data references are buffered during scanning and processed all at once in _post_analysis()
+        self._data_refs = DataRefsBuffer()
+
         # Create an initial state. Store it to self so we can use it globally.
         self._initial_state = self.project.factory.blank_state(mode="fastpath")
         initial_options = self._initial_state.options - {o.TRACK_CONSTRAINTS} - o.refs
@@ -1233,6 +1311,10 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
         # make return edges
         self._make_return_edges()
 
+        # Add all data references that are collected during scanning. This must happen before the section starts get
+        # their placeholder entries, so that references to section starts keep their sizes, types, and xrefs
+        self._process_collected_data_refs()
+
         if self.project.arch.name != 'Soot':
             if self.project.loader.main_object.sections:
                 # this binary has sections
@@ -1907,10 +1989,11 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
     # Data reference processing
 
-    def _collect_data_references(self, irsb, irsb_addr):
+    def _collect_data_references(self, irsb, irsb_addr):  # pylint:disable=unused-argument
         """
-        Unoptimizes IRSB and _add_data_reference's for individual statements or
-        for parts of statements (e.g. Store)
+        Record data references of a block in the data reference buffer. References are collected by pyvex on the C
+        side: all blocks are lifted with data reference collection enabled, so a block without data references does not
+        reference any data, and it is not lifted again.
 
         :param pyvex.IRSB irsb: Block to scan for data references
         :param int irsb_addr: Address of block
@@ -1919,17 +2002,13 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
         if irsb.data_refs:
             self._process_irsb_data_refs(irsb)
-        elif irsb.statements:
-            irsb = self._unoptimize_irsb(irsb)
-            # for each statement, collect all constants that are referenced or used.
-            self._collect_data_references_by_scanning_stmts(irsb, irsb_addr)
 
     def _process_irsb_data_refs(self, irsb):
         for ref in irsb.data_refs:
             if ref.data_size:
                 self._seg_list.occupy(ref.data_addr, ref.data_size, "unknown")
 
-            self._add_data_reference(
+            self._data_refs.add(
                     irsb.addr,
                     ref.stmt_idx,
                     ref.ins_addr,
@@ -1938,118 +2017,67 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                     data_type=ref.data_type_str
             )
 
-    def _unoptimize_irsb(self, irsb):
-        if self.project.arch.name in ('X86', 'AMD64'):
-            # first pass to see if there are any cross-statement optimizations. if so, we relift the basic block with
-            # optimization level 0 to preserve as much constant references as possible
-            empty_insn = False
-            all_statements = len(irsb.statements)
-            for i, stmt in enumerate(irsb.statements[:-1]):
-                if isinstance(stmt, pyvex.IRStmt.IMark) and (
-                        isinstance(irsb.statements[i + 1], pyvex.IRStmt.IMark) or
-                        (i + 2 < all_statements and isinstance(irsb.statements[i + 2], pyvex.IRStmt.IMark))
-                ):
-                    # this is a very bad check...
-                    # the correct way to do it is to disable cross-instruction optimization in VEX
-                    empty_insn = True
-                    break
+    def _process_collected_data_refs(self):
+        """
+        Add all buffered data references to the memory data dict and the XRefs knowledge base in a single pass, in the
+        order they were collected. This is equivalent to calling _add_data_reference() for each reference, but segment
+        lookups are cached and XRefs are added in bulk.
 
-            if empty_insn:
-                # make sure opt_level is 0
-                irsb = self._lift(addr=irsb.addr, size=irsb.size, opt_level=0, collect_data_refs=True).vex
-        return irsb
-
-    def _collect_data_references_by_scanning_stmts(self, irsb, irsb_addr):
-
-        # helper methods
-        def _process(stmt_idx_, data_, insn_addr, next_insn_addr, data_size=None, data_type=None):
-            """
-            Helper method used for calling _add_data_reference after checking
-            for manipulation of constants
-
-            :param pyvex.IRSB irsb_: Edited block (as might be de-optimised)
-            :param pyvex.IRStmt.* stmt_: Statement
-            :param int stmt_idx_: Statement ID
-            :param data_: data manipulated by statement
-            :param int insn_addr: instruction address
-            :param int next_insn_addr: next instruction address
-            :param data_size: Size of the data being manipulated
-            :param str data_type: Type of the data being manipulated
-            :return: None
-            """
-            if type(data_) is pyvex.expr.Const:  # pylint: disable=unidiomatic-typecheck
-                val = data_.con.value
-            elif type(data_) is int:
-                val = data_
-            else:
-                return
+        :return: None
+        """
 
-            if val != next_insn_addr:
-                if data_size:
-                    # Mark the region as unknown so we won't try to create a code block covering this region in the
-                    # future.
-                    self._seg_list.occupy(val, data_size, "unknown")
-                self._add_data_reference(irsb_addr, stmt_idx_, insn_addr, val, data_size=data_size, data_type=data_type)
-
-        # get all instruction addresses
-        instr_addrs = irsb.instruction_addresses
-
-        # for each statement, collect all constants that are referenced or used.
-        instr_addr = None
-        next_instr_addr = None
-        for stmt_idx, stmt in enumerate(irsb.statements):
-            if type(stmt) is pyvex.IRStmt.IMark:  # pylint: disable=unidiomatic-typecheck
-                instr_addr = stmt.addr + stmt.delta
-                # there can be weird cases sometimes... I've seen two IMarks with the exact same address showing up one
-                # after the other.
-                if instr_addrs and instr_addr == instr_addrs[0]:
-                    instr_addr = instr_addrs[0]
-                    instr_addrs = instr_addrs[1 : ]
-                    next_instr_addr = instr_addrs[0] if instr_addrs else None
-
-            elif type(stmt) is pyvex.IRStmt.WrTmp:  # pylint: disable=unidiomatic-typecheck
-                if type(stmt.data) is pyvex.IRExpr.Load:  # pylint: disable=unidiomatic-typecheck
-                    # load
-                    # e.g. t7 = LDle:I64(0x0000000000600ff8)
-                    size = stmt.data.result_size(irsb.tyenv) // 8 # convert to bytes
-                    _process(stmt_idx, stmt.data.addr, instr_addr, next_instr_addr, data_size=size, data_type='integer')
-
-                elif type(stmt.data) in (pyvex.IRExpr.Binop, ):  # pylint: disable=unidiomatic-typecheck
-
-                    # rip-related addressing
-                    if stmt.data.op in ('Iop_Add32', 'Iop_Add64') and \
-                            all(type(arg) is pyvex.expr.Const for arg in stmt.data.args):
-                        # perform the addition
-                        loc = stmt.data.args[0].con.value + stmt.data.args[1].con.value
-                        _process(stmt_idx, loc, instr_addr, next_instr_addr)
+        refs = self._data_refs
+        if not refs:
+            return
 
+        memory_data = self._memory_data
+        insn_addr_to_memory_data = self.insn_addr_to_memory_data
+        segment_ends = None
+        xrefs = [ ]
+
+        seg_start, seg_end = None, None
+        last_data_addr, last_in_segment = None, False
+        for i, data_addr in enumerate(refs.data_addrs):
+            if data_addr != last_data_addr:
+                last_data_addr = data_addr
+                if seg_start is not None and seg_start <= data_addr < seg_end:
+                    last_in_segment = True
+                else:
+                    segment = self.project.loader.find_segment_containing(data_addr)
+                    if segment is not None:
+                        seg_start, seg_end = segment.vaddr, segment.vaddr + segment.memsize
+                        last_in_segment = True
                     else:
-                        # binary operation
-                        for arg in stmt.data.args:
-                            _process(stmt_idx, arg, instr_addr, next_instr_addr)
-
-                elif type(stmt.data) is pyvex.IRExpr.Const:  # pylint: disable=unidiomatic-typecheck
-                    _process(stmt_idx, stmt.data, instr_addr, next_instr_addr)
-
-                elif type(stmt.data) is pyvex.IRExpr.ITE:
-                    for child_expr in stmt.data.child_expressions:
-                        _process(stmt_idx, child_expr, instr_addr, next_instr_addr)
-
-            elif type(stmt) is pyvex.IRStmt.Put:  # pylint: disable=unidiomatic-typecheck
-                # put
-                # e.g. PUT(rdi) = 0x0000000000400714
-                if stmt.offset not in (self._initial_state.arch.ip_offset, ):
-                    _process(stmt_idx, stmt.data, instr_addr, next_instr_addr)
-
-            elif type(stmt) is pyvex.IRStmt.Store:  # pylint: disable=unidiomatic-typecheck
-                # store addr
-                _process(stmt_idx, stmt.addr, instr_addr, next_instr_addr)
-                # store data
-                _process(stmt_idx, stmt.data, instr_addr, next_instr_addr)
+                        last_in_segment = False
+
+            data = memory_data.get(data_addr, None)
+            new_data = data is None
+            if last_in_segment:
+                if new_data:
+                    data_size, data_type = refs.data_size(i), refs.data_type(i)
+                    if data_type is not None and data_size is not None:
+                        data = MemoryData(data_addr, data_size, data_type, max_size=data_size)
+                    else:
+                        data = MemoryData(data_addr, 0, MemoryDataSort.Unknown)
+                    memory_data[data_addr] = data
+                insn_addr_to_memory_data[refs.ins_addrs[i]] = data
+            else:
+                # data might be at the end of some segment
+                if segment_ends is None:
+                    segment_ends = { seg.vaddr + seg.memsize for seg in self.project.loader.main_object.segments }
+                if data_addr not in segment_ends:
+                    continue
+                if new_data:
+                    data = MemoryData(data_addr, 0, MemoryDataSort.SegmentBoundary)
+                    memory_data[data_addr] = data
 
-            elif type(stmt) is pyvex.IRStmt.Dirty:
+            if new_data or self._cross_references:
+                xrefs.append(XRef(ins_addr=refs.ins_addrs[i], block_addr=refs.irsb_addrs[i],
+                                  stmt_idx=refs.stmt_idxs[i], memory_data=data, xref_type=XRefType.Offset,
+                                  ))
 
-                _process(stmt_idx, stmt.mAddr, instr_addr, next_instr_addr, data_size=stmt.mSize, data_type='fp')
+        self.kb.xrefs.add_xrefs(xrefs)
+        refs.clear()
 
     def _add_data_reference(self, irsb_addr, stmt_idx, insn_addr, data_addr,  # pylint: disable=unused-argument
                             data_size=None, data_type=None):
@@ -2116,6 +2144,8 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
         # Make sure all memory data entries cover all data sections
         keys = sorted(self._memory_data.keys())
+        # keys are sorted, so consecutive entries usually fall into the same section. cache the last section we saw.
+        last_sec, last_sec_end = None, None
         for i, data_addr in enumerate(keys):
             data = self._memory_data[data_addr]
             if self._addr_in_exec_memory_regions(data.address):
@@ -2130,7 +2160,12 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                 # goes until the end of the section/segment
                 # TODO: the logic needs more testing
 
-                sec = self.project.loader.find_section_containing(data_addr)
+                if last_sec is not None and last_sec.vaddr <= data_addr < last_sec_end:
+                    sec = last_sec
+                else:
+                    sec = self.project.loader.find_section_containing(data_addr)
+                    if sec is not None:
+                        last_sec, last_sec_end = sec, sec.vaddr + sec.memsize
                 next_sec_addr = None
                 if sec is not None:
                     last_addr = sec.vaddr + sec.memsize
@@ -2167,7 +2202,7 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                 if data.max_size is None:
                     print('wtf')
 
-        keys = sorted(self._memory_data.keys())
+        # no new entries are added in the loop above, so keys are still sorted and complete
 
         new_data_found = False
 
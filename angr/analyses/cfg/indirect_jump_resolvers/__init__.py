@@ -2,5 +2,6 @@
 from .mips_elf_fast import MipsElfFastResolver
 from .x86_elf_pic_plt import X86ElfPicPltResolver
 from .jumptable import JumpTableResolver
+from .jumptable_cache import JumpTableCache, JumpTableCacheEntry
 from .x86_pe_iat import X86PeIatResolver
 from .amd64_elf_got import AMD64ElfGotResolver
@@ -26,7 +26,7 @@ DEFAULT_RESOLVERS = {
 }
 
 
-def default_indirect_jump_resolvers(obj, project):
+def default_indirect_jump_resolvers(obj, project, jumptable_cache=None):
     arch_specific = DEFAULT_RESOLVERS.get(project.arch.name, { })
     resolvers = [ ]
     for k, lst in arch_specific.items():
@@ -36,4 +36,4 @@ def default_indirect_jump_resolvers(obj, project):
 
     resolvers += DEFAULT_RESOLVERS['ALL']
 
-    return [ r(project) for r in resolvers ]
+    return [ r(project, cache=jumptable_cache) if r is JumpTableResolver else r(project) for r in resolvers ]
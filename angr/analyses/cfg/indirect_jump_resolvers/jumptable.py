@@ -1,9 +1,12 @@
 
 import logging
+import struct
+import hashlib
+from bisect import bisect_left
 from collections import defaultdict, OrderedDict
 
 import pyvex
-from archinfo.arch_arm import is_arm_arch
+from archinfo.arch_arm import is_arm_arch, get_real_address_if_arm
 
 from angr.engines.vex.claripy import ccall
 from ....engines.light import SimEngineLightVEXMixin, SimEngineLight, SpOffset, RegisterOffset
@@ -16,6 +19,7 @@ from ....exploration_techniques.slicecutor import Slicecutor
 from ....exploration_techniques.explorer import Explorer
 from ....utils.constants import DEFAULT_STATEMENT
 from .resolver import IndirectJumpResolver
+from .jumptable_cache import JumpTableCacheEntry
 
 
 l = logging.getLogger(name=__name__)
@@ -403,10 +407,20 @@ class JumpTableResolver(IndirectJumpResolver):
         - The final jump target comes from the memory.
         - The final jump target must be directly read out of the memory, without any further modification or altering.
 
+    Resolution results can be cached in a JumpTableCache, which is keyed by the bytes of the blocks that the backward
+    slice may cover. Cached jump tables are reused only if the content of the jump table is unchanged.
     """
-    def __init__(self, project):
+    def __init__(self, project, cache=None):
+        """
+        :param project:                 The angr project.
+        :param JumpTableCache cache:    A cache of resolution results, or None to disable caching.
+        """
         super(JumpTableResolver, self).__init__(project, timeless=False)
 
+        self._cache = cache
+        # sorted addresses of all relocations. Will be initialized on demand.
+        self._reloc_addrs = None
+
         self._bss_regions = None
         # the maximum number of resolved targets. Will be initialized from CFG.
         self._max_targets = None
@@ -445,6 +459,25 @@ class JumpTableResolver(IndirectJumpResolver):
         self._max_targets = cfg._indirect_jump_target_limit
 
         for slice_steps in range(2, 4):
+            cache_key, slice_blocks = None, None
+            if self._cache is not None:
+                slice_blocks = self._slice_blocks(cfg, addr, slice_steps)
+                if slice_blocks is not None:
+                    cache_key = self._cache_key(addr, slice_steps, slice_blocks)
+                    entry = self._cache.get(cache_key)
+                    if entry is not None and not entry.resolved:
+                        # the key does not cover the jump table, so failures are only reused at the same address. a
+                        # copy of the code elsewhere may refer to a different table that can be resolved
+                        if entry.addr == addr:
+                            l.debug("Indirect jump %#x with a %d-level backward slice is a known failure.",
+                                    addr, slice_steps)
+                            continue
+                    elif entry is not None:
+                        targets = self._apply_cache_entry(cfg, addr, entry, slice_blocks)
+                        if targets is not None:
+                            l.info("Resolved %d targets from %#x using the jump table cache.", len(targets), addr)
+                            return True, targets
+
             # Perform a backward slicing from the jump target
             # Important: Do not go across function call boundaries
             b = Blade(cfg.graph, addr, -1,
@@ -453,17 +486,20 @@ class JumpTableResolver(IndirectJumpResolver):
                 max_level=slice_steps, base_state=self.base_state, stop_at_calls=True)
 
             l.debug("Try resolving %#x with a %d-level backward slice...", addr, slice_steps)
-            r, targets = self._resolve(cfg, addr, func_addr, b)
+            r, targets = self._resolve(cfg, addr, func_addr, b, cache_key=cache_key, slice_blocks=slice_blocks)
             if r:
                 return r, targets
 
+            if cache_key is not None:
+                self._cache.store(cache_key, JumpTableCacheEntry(False, addr=addr))
+
         return False, None
 
     #
     # Private methods
     #
 
-    def _resolve(self, cfg, addr, func_addr, b):
+    def _resolve(self, cfg, addr, func_addr, b, cache_key=None, slice_blocks=None):
         """
         Internal method for resolving jump tables.
 
@@ -471,6 +507,8 @@ class JumpTableResolver(IndirectJumpResolver):
         :param int addr:        Address of the block where the indirect jump is.
         :param int func_addr:   Address of the function.
         :param Blade b:         The generated backward slice.
+        :param bytes cache_key: Key to store the resolved jump table in the cache, or None to skip caching.
+        :param list slice_blocks: Addresses and bytes of the blocks that the cache key is generated from.
         :return:                A bool indicating whether the indirect jump is resolved successfully, and a list of
                                 resolved targets.
         :rtype:                 tuple
@@ -593,11 +631,188 @@ class JumpTableResolver(IndirectJumpResolver):
                     ij.jumptable = False
                     ij.resolved_targets = set(jump_table)
 
+                if cache_key is not None:
+                    self._store_cache_entry(cfg, cache_key, slice_blocks, addr, jump_table, jumptable_addr,
+                                            entry_size, jumptable_size, all_targets, bool(stmts_adding_base_addr))
+
                 return True, all_targets
 
         l.info("Could not resolve indirect jump %#x in function %#x.", addr, func_addr)
         return False, None
 
+    def _slice_blocks(self, cfg, addr, slice_steps):
+        """
+        Collect all blocks that a backward slice of a specific level may go through, in the same way as Blade does.
+
+        :param cfg:             A CFG instance.
+        :param int addr:        Address of the block where the indirect jump is.
+        :param int slice_steps: The maximum level of the backward slice.
+        :return:                A list of block addresses and block bytes sorted by address, or None if the result of
+                                this indirect jump should not be cached.
+        :rtype:                 list or None
+        """
+
+        if self.base_state is not None:
+            # memory content may come from the base state, which we cannot verify later
+            return None
+
+        node = cfg.get_any_node(addr)
+        if node is None:
+            return None
+
+        blocks = { node.addr: node }
+        frontier = [ node ]
+        for _ in range(slice_steps - 1):
+            new_frontier = [ ]
+            for n in frontier:
+                for pred, _, data in cfg.graph.in_edges(n, data=True):
+                    if data.get('jumpkind', None) in ('Ijk_FakeRet', 'Ijk_Call'):
+                        continue
+                    if self.project.is_hooked(pred.addr) or pred.addr in blocks:
+                        continue
+                    blocks[pred.addr] = pred
+                    new_frontier.append(pred)
+            frontier = new_frontier
+
+        slice_blocks = [ ]
+        for block_addr in sorted(blocks):
+            block = blocks[block_addr]
+            if block.size is None:
+                return None
+            data = block.byte_string
+            if data is None:
+                data = cfg._fast_memory_load_bytes(get_real_address_if_arm(self.project.arch, block_addr), block.size)
+                if data is None:
+                    return None
+            slice_blocks.append((block_addr, data))
+        return slice_blocks
+
+    def _cache_key(self, addr, slice_steps, slice_blocks):
+        """
+        Generate the cache key for resolving an indirect jump with a backward slice of a specific level. The key covers
+        all blocks that the backward slice may go through, identified by their offsets to the indirect jump and their
+        bytes. Bytes that are touched by relocations are masked out.
+
+        :param int addr:            Address of the block where the indirect jump is.
+        :param int slice_steps:     The maximum level of the backward slice.
+        :param list slice_blocks:   Addresses and bytes of the blocks, as returned by _slice_blocks().
+        :return:                    The cache key.
+        :rtype:                     bytes
+        """
+
+        h = hashlib.sha1()
+        h.update(("%s:%d:%s" % (self.project.arch.name, slice_steps, self._max_targets)).encode("ascii"))
+        for block_addr, data in slice_blocks:
+            h.update(struct.pack("<qI", block_addr - addr, len(data)))
+            h.update(self._mask_relocations(get_real_address_if_arm(self.project.arch, block_addr), data))
+        return h.digest()
+
+    def _encodes_addr(self, slice_blocks, value):
+        """
+        Check if the bytes of any block encode an address as an absolute 32-bit value, which is how instructions refer
+        to jump tables that are not addressed relative to the program counter.
+
+        :param list slice_blocks:   Addresses and bytes of the blocks.
+        :param int value:           The address.
+        :return:                    True if the address is encoded in any block, False otherwise.
+        :rtype:                     bool
+        """
+
+        fmt = "<I" if self.project.arch.memory_endness == 'Iend_LE' else ">I"
+        encoded = struct.pack(fmt, value & 0xffffffff)
+        return any(encoded in data for _, data in slice_blocks)
+
+    def _mask_relocations(self, addr, data):
+        """
+        Zero out all bytes in data that are touched by relocations.
+
+        :param int addr:    Address of data.
+        :param bytes data:  The data.
+        :return:            The masked data.
+        :rtype:             bytes
+        """
+
+        if self._reloc_addrs is None:
+            self._reloc_addrs = sorted(reloc.rebased_addr for obj in self.project.loader.all_objects
+                                       for reloc in obj.relocs)
+
+        word_size = self.project.arch.bytes
+        idx = bisect_left(self._reloc_addrs, addr - word_size + 1)
+        if idx >= len(self._reloc_addrs) or self._reloc_addrs[idx] >= addr + len(data):
+            return data
+
+        masked = bytearray(data)
+        while idx < len(self._reloc_addrs) and self._reloc_addrs[idx] < addr + len(data):
+            start = max(self._reloc_addrs[idx] - addr, 0)
+            end = min(self._reloc_addrs[idx] - addr + word_size, len(data))
+            masked[start:end] = bytes(end - start)
+            idx += 1
+        return bytes(masked)
+
+    def _store_cache_entry(self, cfg, cache_key, slice_blocks, addr, jump_table, jumptable_addr, entry_size,
+                           jumptable_size, all_targets, relative_entries):
+        """
+        Store a resolved jump table in the cache.
+        """
+
+        table = cfg._fast_memory_load_bytes(jumptable_addr, jumptable_size)
+        if table is None:
+            return
+        entry = JumpTableCacheEntry(True, addr=addr, jumptable_addr=jumptable_addr, jumptable_size=jumptable_size,
+                                    entry_size=entry_size, entries=list(jump_table), targets=list(all_targets),
+                                    table_hash=self._cache.hash_bytes(table), relative_entries=relative_entries,
+                                    absolute_addressing=self._encodes_addr(slice_blocks, jumptable_addr))
+        self._cache.store(cache_key, entry)
+
+    def _apply_cache_entry(self, cfg, addr, entry, slice_blocks):
+        """
+        Verify a cached jump table against the memory, and update the IndirectJump object in CFG if the jump table is
+        unchanged.
+
+        The cache key does not depend on where the indirect jump is, so the same entry is found for every copy of a
+        switch construct. A jump table that the code refers to by its absolute address is looked for at its original
+        address, and only if the code of this indirect jump encodes that address as well. Any other jump table is
+        looked for at the same offset relative to the indirect jump as in the original.
+
+        :param cfg:                         A CFG instance.
+        :param int addr:                    Address of the block where the indirect jump is.
+        :param JumpTableCacheEntry entry:   The cached entry.
+        :param list slice_blocks:           Addresses and bytes of the blocks that the cache key is generated from.
+        :return:                            A list of resolved targets, or None if the cached entry does not apply.
+        :rtype:                             list or None
+        """
+
+        mask = (2 ** self.project.arch.bits) - 1
+        if entry.absolute_addressing:
+            if not self._encodes_addr(slice_blocks, entry.jumptable_addr):
+                return None
+            delta = 0
+        else:
+            delta = addr - entry.addr
+
+        jumptable_addr = (entry.jumptable_addr + delta) & mask
+        table = cfg._fast_memory_load_bytes(jumptable_addr, entry.jumptable_size)
+        if table is None or self._cache.hash_bytes(table) != entry.table_hash:
+            return None
+
+        # absolute entries point to the same targets no matter where the table is
+        target_delta = delta if entry.relative_entries else 0
+        jump_table = [ (t + target_delta) & mask for t in entry.entries ]
+        all_targets = [ (t + target_delta) & mask for t in entry.targets ]
+
+        ij = cfg.indirect_jumps[addr]
+        if len(all_targets) > 1:
+            ij.jumptable = True
+            ij.jumptable_addr = jumptable_addr
+            ij.jumptable_size = entry.jumptable_size
+            ij.jumptable_entry_size = entry.entry_size
+            ij.resolved_targets = set(jump_table)
+            ij.jumptable_entries = jump_table
+        else:
+            ij.jumptable = False
+            ij.resolved_targets = set(jump_table)
+        return all_targets
+
     def _find_load_statement(self, b, stmt_loc):
         """
         Find the location of the final Load statement that loads indirect jump targets from the jump table.
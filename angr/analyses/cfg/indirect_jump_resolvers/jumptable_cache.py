@@ -0,0 +1,189 @@
+import os
+import pickle
+import hashlib
+import logging
+from collections import OrderedDict
+
+
+l = logging.getLogger(name=__name__)
+
+
+class JumpTableCacheEntry:
+    """
+    Describes the outcome of resolving an indirect jump with JumpTableResolver.
+
+    Addresses are stored as they were when the entry was created. A cached jump table is only reused if the content of
+    the jump table is the same as when the entry was created. The jump table is looked for at the same address if the
+    code refers to it by its absolute address (absolute_addressing), and at the same address relative to the indirect
+    jump otherwise. Targets are moved along with the jump table if its entries are relative (relative_entries).
+    Failures are only reused for the indirect jump at the same address (addr).
+    """
+
+    __slots__ = ('resolved', 'addr', 'jumptable_addr', 'jumptable_size', 'entry_size', 'entries', 'targets',
+                 'table_hash', 'relative_entries', 'absolute_addressing', )
+
+    def __init__(self, resolved, addr=None, jumptable_addr=None, jumptable_size=None, entry_size=None, entries=None,
+                 targets=None, table_hash=None, relative_entries=False, absolute_addressing=False):
+        self.resolved = resolved
+        self.addr = addr
+        self.jumptable_addr = jumptable_addr
+        self.jumptable_size = jumptable_size
+        self.entry_size = entry_size
+        self.entries = entries
+        self.targets = targets
+        self.table_hash = table_hash
+        self.relative_entries = relative_entries
+        self.absolute_addressing = absolute_addressing
+
+    def __getstate__(self):
+        return tuple(getattr(self, k) for k in self.__slots__)
+
+    def __setstate__(self, state):
+        for k, v in zip(self.__slots__, state):
+            setattr(self, k, v)
+
+    def __repr__(self):
+        if not self.resolved:
+            return "<JumpTableCacheEntry: unresolved>"
+        return "<JumpTableCacheEntry: jump table %#x with %d targets>" % (self.jumptable_addr, len(self.targets))
+
+
+class JumpTableCache:
+    """
+    A cache of jump table resolution results, keyed by the (relocation-masked) bytes of the blocks that the jump table
+    resolver slices through. Both successes and failures are cached. The cache can be persisted to disk and shared
+    between runs, so that duplicated switch constructs (in the same binary or across builds) are resolved without
+    running the backward slicer and symbolic execution again.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path=None, max_entries=100000):
+        """
+        :param str path:        Path of the file to load the cache from and save the cache to. The cache is only kept
+                                in memory if path is None.
+        :param int max_entries: The maximum number of entries to keep. Least recently used entries are evicted first.
+        """
+
+        self.path = path
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # (key, entry) of all stored entries since start_recording() was called, or None if not recording
+        self._recorded = None
+
+        if path is not None and os.path.isfile(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @staticmethod
+    def hash_bytes(data):
+        return hashlib.sha1(data).digest()
+
+    def get(self, key):
+        """
+        Get the cached entry of a key.
+
+        :param bytes key:   The cache key.
+        :return:            The cached entry, or None if there is no entry for this key.
+        :rtype:             JumpTableCacheEntry or None
+        """
+
+        entry = self._entries.get(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, key, entry):
+        """
+        Store an entry in the cache, and evict the least recently used entries if the cache is full.
+
+        :param bytes key:                   The cache key.
+        :param JumpTableCacheEntry entry:   The entry to store.
+        :return:                            None
+        """
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self._recorded is not None:
+            self._recorded.append((key, entry))
+
+    def start_recording(self):
+        """
+        Start recording all entries that are stored in the cache, e.g., in a worker process whose cache has to be
+        merged back into the cache of the main process.
+
+        :return:    None
+        """
+
+        self._recorded = [ ]
+
+    def stop_recording(self):
+        """
+        Stop recording stored entries.
+
+        :return:    A list of (key, entry) of all entries that have been stored since start_recording() was called, in
+                    the order they were stored.
+        :rtype:     list
+        """
+
+        recorded, self._recorded = self._recorded, None
+        return recorded if recorded is not None else [ ]
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path=None):
+        """
+        Load cached entries from a file. Existing entries are kept unless they are overwritten by the loaded entries.
+
+        :param str path:    Path of the file. Default to self.path.
+        :return:            None
+        """
+
+        path = self.path if path is None else path
+        try:
+            with open(path, "rb") as f:
+                version, entries = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            l.warning("Failed to load jump table cache from %s.", path, exc_info=True)
+            return
+
+        if version != self.VERSION:
+            l.warning("Jump table cache %s has an incompatible version %s. Ignored.", path, version)
+            return
+
+        for key, entry in entries:
+            self.store(key, entry)
+
+    def save(self, path=None):
+        """
+        Save all cached entries to a file.
+
+        :param str path:    Path of the file. Default to self.path.
+        :return:            None
+        """
+
+        path = self.path if path is None else path
+        if path is None:
+            raise ValueError("No path is specified for saving the jump table cache.")
+
+        # write to a temporary file first so that an interrupted save does not destroy the existing cache
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((self.VERSION, list(self._entries.items())), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
@@ -2,6 +2,7 @@ import networkx
 
 from functools import reduce
 
+from ...misc.profiling import get_profiler
 from ...errors import AngrForwardAnalysisError
 from ...errors import AngrSkipJobNotice, AngrDelayJobNotice, AngrJobMergingFailureNotice, AngrJobWideningFailureNotice
 
@@ -199,6 +200,16 @@ class ForwardAnalysis:
     # Private methods
     #
 
+    # Methods whose running time is recorded when profiling is enabled
+    _PROFILED_PHASES = ('_pre_analysis', '_intra_analysis', '_post_analysis', '_job_queue_empty', '_pre_job_handling',
+                        '_get_successors', '_handle_successor', '_post_job_handling', '_run_on_node', '_merge_states',
+                        '_widen_states', '_merge_jobs', '_widen_jobs',
+                        )
+    # Methods whose first argument is a job (or a node), and whose running time is recorded for each job
+    _PROFILED_JOB_PHASES = ('_pre_job_handling', '_get_successors', '_handle_successor', '_post_job_handling',
+                            '_run_on_node',
+                            )
+
     def _analyze(self):
         """
         The main analysis routine.
@@ -206,6 +217,25 @@ class ForwardAnalysis:
         :return: None
         """
 
+        profiler = get_profiler()
+        if profiler is None:
+            self._analyze_core()
+        else:
+            with profiler.instrument(self, self._PROFILED_PHASES, job_phases=self._PROFILED_JOB_PHASES,
+                                     job_key=self._profiled_job_key):
+                self._analyze_core()
+
+    def _profiled_job_key(self, job):
+        """
+        Get the key of a job (or a node in graph-traversal mode) that profiling results are attributed to.
+        """
+
+        if self._graph_visitor is not None:
+            return getattr(job, 'addr', job)
+        return self._job_key(job)
+
+    def _analyze_core(self):
+
         self._pre_analysis()
 
         if self._graph_visitor is None:
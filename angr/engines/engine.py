@@ -137,8 +137,11 @@ class SuccessorsMixin(SimEngine):
 
         self.successors = SimSuccessors(addr, old_state)
 
-        new_state._inspect('engine_process', when=BP_BEFORE, sim_engine=self, sim_successors=self.successors, address=addr)
-        self.successors = new_state._inspect_getattr('sim_successors', self.successors)
+        inspect_process = new_state._inspect_mask & event_type_bits['engine_process']
+        if inspect_process:
+            new_state._inspect('engine_process', when=BP_BEFORE, sim_engine=self, sim_successors=self.successors,
+                               address=addr)
+            self.successors = new_state._inspect_getattr('sim_successors', self.successors)
         try:
             self.process_successors(self.successors, **kwargs)
         except SimException:
@@ -146,8 +149,9 @@ class SuccessorsMixin(SimEngine):
                 raise
             old_state.project.simos.handle_exception(self, *sys.exc_info())
 
-        new_state._inspect('engine_process', when=BP_AFTER, sim_successors=self.successors, address=addr)
-        self.successors = new_state._inspect_getattr('sim_successors', self.successors)
+        if inspect_process:
+            new_state._inspect('engine_process', when=BP_AFTER, sim_successors=self.successors, address=addr)
+            self.successors = new_state._inspect_getattr('sim_successors', self.successors)
 
         # downsizing
         if new_state.supports_inspect:
@@ -187,6 +191,6 @@ class SuccessorsMixin(SimEngine):
 
 
 from .. import sim_options as o
-from ..state_plugins.inspect import BP_BEFORE, BP_AFTER
+from ..state_plugins.inspect import BP_BEFORE, BP_AFTER, event_type_bits
 from .successors import SimSuccessors
 from ..errors import SimException
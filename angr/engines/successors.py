@@ -5,6 +5,26 @@ from archinfo.arch_soot import ArchSoot
 import logging
 l = logging.getLogger(name=__name__)
 
+
+class LazyExit:
+    """
+    Describes an exit that has been recorded but not turned into a successor state yet.
+    """
+
+    __slots__ = ('target', 'guard', 'jumpkind', 'exit_stmt_idx', 'exit_ins_addr', 'insn_count', )
+
+    def __init__(self, target, guard, jumpkind, exit_stmt_idx, exit_ins_addr, insn_count):
+        self.target = target
+        self.guard = guard
+        self.jumpkind = jumpkind
+        self.exit_stmt_idx = exit_stmt_idx
+        self.exit_ins_addr = exit_ins_addr
+        self.insn_count = insn_count
+
+    def __repr__(self):
+        return "<LazyExit %s to %s>" % (self.jumpkind, self.target)
+
+
 class SimSuccessors:
     """
     This class serves as a categorization of all the kinds of result states that can come from a
@@ -41,6 +61,8 @@ class SimSuccessors:
         self.flat_successors = [ ]
         self.unsat_successors = [ ]
         self.unconstrained_successors = [ ]
+        # exits that are recorded with LAZY_SUCCESSORS and have not been materialized yet
+        self.lazy_exits = [ ]
 
         # the engine that should process or did process this request
         self.engine = None
@@ -105,10 +127,16 @@ class SimSuccessors:
         """
 
         # First, trigger the SimInspect breakpoint
-        state._inspect('exit', BP_BEFORE, exit_target=target, exit_guard=guard, exit_jumpkind=jumpkind)
-        state.scratch.target = state._inspect_getattr("exit_target", target)
-        state.scratch.guard = state._inspect_getattr("exit_guard", guard)
-        state.history.jumpkind = state._inspect_getattr("exit_jumpkind", jumpkind)
+        inspect_exit = state._inspect_mask & event_type_bits['exit']
+        if inspect_exit:
+            state._inspect('exit', BP_BEFORE, exit_target=target, exit_guard=guard, exit_jumpkind=jumpkind)
+            state.scratch.target = state._inspect_getattr("exit_target", target)
+            state.scratch.guard = state._inspect_getattr("exit_guard", guard)
+            state.history.jumpkind = state._inspect_getattr("exit_jumpkind", jumpkind)
+        else:
+            state.scratch.target = target
+            state.scratch.guard = guard
+            state.history.jumpkind = jumpkind
         state.history.jump_target = state.scratch.target
         state.history.jump_guard = state.scratch.guard
 
@@ -123,10 +151,77 @@ class SimSuccessors:
             return
 
         self._categorize_successor(state)
-        state._inspect('exit', BP_AFTER, exit_target=target, exit_guard=guard, exit_jumpkind=jumpkind)
+        if inspect_exit:
+            state._inspect('exit', BP_AFTER, exit_target=target, exit_guard=guard, exit_jumpkind=jumpkind)
         if state.supports_inspect:
             state.inspect.downsize()
 
+    def add_lazy_exit(self, target, guard, jumpkind, exit_stmt_idx=None, exit_ins_addr=None, insn_count=None):
+        """
+        Record an exit without creating a successor state for it. Recorded exits must be materialized with
+        materialize_lazy_exits() before any other successor is added.
+
+        :param target:              The target of the exit.
+        :param guard:               The guard expression, including the guards of the exits that are not taken.
+        :param str jumpkind:        The jumpkind.
+        :param int exit_stmt_idx:   The ID of the exit statement.
+        :param int exit_ins_addr:   The instruction pointer of this exit.
+        :param int insn_count:      The number of instructions executed in the block up to this exit.
+        :return:                    None
+        """
+
+        self.lazy_exits.append(LazyExit(target, guard, jumpkind, exit_stmt_idx, exit_ins_addr, insn_count))
+
+    def materialize_lazy_exits(self, state):
+        """
+        Check the guards of all recorded exits and the accumulated guard of the given state at once, and add a
+        successor for each of the feasible exits. Infeasible exits are dropped, just like the engine drops exits whose
+        guards are unsatisfiable.
+
+        The successors are copies of the given state, except when execution cannot continue past the exits. Then the
+        last feasible exit takes the state itself, and the state must not be used any further.
+
+        :param SimState state:  The state to create successors from. It must not differ from the states at the recorded
+                                exits in anything but the instruction pointer, the temps, the instruction count, and
+                                the accumulated guard.
+        :return:                False if the state has been taken by an exit, True otherwise.
+        :rtype:                 bool
+        """
+
+        if not self.lazy_exits:
+            return True
+
+        exits, self.lazy_exits = self.lazy_exits, [ ]
+
+        feasible = { }
+
+        def _is_feasible(guard):
+            if guard.cache_key not in feasible:
+                if guard.is_true():
+                    feasible[guard.cache_key] = True
+                elif guard.is_false():
+                    feasible[guard.cache_key] = False
+                else:
+                    feasible[guard.cache_key] = o.LAZY_SOLVES in state.options or \
+                                                state.solver.satisfiable(extra_constraints=(guard,))
+            return feasible[guard.cache_key]
+
+        feasible_exits = [ ex for ex in exits if _is_feasible(ex.guard) ]
+        # if no exit is feasible, the state is unsat anyway, and it goes on to become an unsat successor
+        continues = not feasible_exits or _is_feasible(state.scratch.guard)
+
+        for i, ex in enumerate(feasible_exits):
+            if not continues and i == len(feasible_exits) - 1:
+                exit_state = state
+            else:
+                exit_state = state.copy()
+            if ex.insn_count is not None:
+                exit_state.history.recent_instruction_count = ex.insn_count
+            self.add_successor(exit_state, ex.target, ex.guard, ex.jumpkind, exit_stmt_idx=ex.exit_stmt_idx,
+                               exit_ins_addr=ex.exit_ins_addr)
+
+        return continues
+
     #
     # Successor management
     #
@@ -161,7 +256,7 @@ class SimSuccessors:
         if self.initial_state.arch.sp_offset is not None and not isinstance(state.arch, ArchSoot):
             self._manage_callstack(state)
 
-        if len(self.successors) != 0:
+        if len(self.successors) != 0 and state._inspect_mask & event_type_bits['fork']:
             # This is a fork!
             state._inspect('fork', BP_AFTER)
 
@@ -173,11 +268,14 @@ class SimSuccessors:
     def _manage_callstack(state):
         # condition for call = Ijk_Call
         # condition for ret = stack pointer drops below call point
+        inspect_call = state._inspect_mask & event_type_bits['call']
+        inspect_return = state._inspect_mask & event_type_bits['return']
         if state.history.jumpkind == 'Ijk_Call':
-            state._inspect('call', BP_BEFORE, function_address=state.regs._ip)
-            new_func_addr = state._inspect_getattr('function_address', None)
-            if new_func_addr is not None and not claripy.is_true(new_func_addr == state.regs._ip):
-                state.regs._ip = new_func_addr
+            if inspect_call:
+                state._inspect('call', BP_BEFORE, function_address=state.regs._ip)
+                new_func_addr = state._inspect_getattr('function_address', None)
+                if new_func_addr is not None and not claripy.is_true(new_func_addr == state.regs._ip):
+                    state.regs._ip = new_func_addr
 
             try:
                 if state.arch.call_pushes_ret:
@@ -206,15 +304,18 @@ class SimSuccessors:
                     jumpkind='Ijk_Call')
             state.callstack.push(new_frame)
 
-            state._inspect('call', BP_AFTER)
+            if inspect_call:
+                state._inspect('call', BP_AFTER)
         else:
             while True:
                 cur_sp = state.solver.max(state.regs._sp) if state.has_plugin('symbolizer') else state.regs._sp
                 if not state.solver.is_true(cur_sp > state.callstack.top.stack_ptr):
                     break
-                state._inspect('return', BP_BEFORE, function_address=state.callstack.top.func_addr)
+                if inspect_return:
+                    state._inspect('return', BP_BEFORE, function_address=state.callstack.top.func_addr)
                 state.callstack.pop()
-                state._inspect('return', BP_AFTER)
+                if inspect_return:
+                    state._inspect('return', BP_AFTER)
 
             if not state.arch.call_pushes_ret and \
                     claripy.is_true(state.regs._ip == state.callstack.ret_addr) and \
@@ -224,9 +325,11 @@ class SimSuccessors:
                 # before and after the call. therefore we have to check for equality with the marker
                 # along with this other check with the instruction pointer to guess whether it's time
                 # to pop a callframe. Still better than relying on Ijk_Ret.
-                state._inspect('return', BP_BEFORE, function_address=state.callstack.top.func_addr)
+                if inspect_return:
+                    state._inspect('return', BP_BEFORE, function_address=state.callstack.top.func_addr)
                 state.callstack.pop()
-                state._inspect('return', BP_AFTER)
+                if inspect_return:
+                    state._inspect('return', BP_AFTER)
 
 
     def _categorize_successor(self, state):
@@ -513,7 +616,7 @@ class SimSuccessors:
         return [ (ip == addr, addr) for addr in addrs ]
 
 
-from ..state_plugins.inspect import BP_BEFORE, BP_AFTER
+from ..state_plugins.inspect import BP_BEFORE, BP_AFTER, event_type_bits
 from ..errors import SimSolverModeError, AngrUnsupportedSyscallError, AngrSyscallError, SimValueError
 from ..calling_conventions import SYSCALL_CC
 from ..state_plugins.sim_action_object import _raw_ast
@@ -3,6 +3,7 @@ import pyvex
 from .heavy import HeavyVEXMixin
 
 from angr.state_plugins.sim_action import SimActionObject, SimActionData, SimActionExit, SimActionOperation
+from angr.state_plugins.action_log import SimActionLog
 from angr import sim_options as o
 
 class TrackActionsMixin(HeavyVEXMixin):
@@ -80,7 +81,10 @@ class TrackActionsMixin(HeavyVEXMixin):
         offset, offset_deps = offset_bundle
         result = super()._perform_vex_expr_Get(offset, ty, **kwargs)
 
-        if o.TRACK_REGISTER_ACTIONS in self.state.options:
+        if o.TRACK_REGISTER_ACTIONS in self.state.options and o.COLUMNAR_ACTIONS in self.state.options:
+            self.state.history.log_action(SimActionLog.REG_READ, offset, pyvex.get_type_size(ty), result)
+            a = ()
+        elif o.TRACK_REGISTER_ACTIONS in self.state.options:
             offset_ao = SimActionObject(offset, deps=offset_deps, state=self.state)
             r = SimActionData(self.state, self.state.registers.id, SimActionData.READ, addr=offset_ao,
                               size=pyvex.get_type_size(ty), data=result
@@ -95,7 +99,10 @@ class TrackActionsMixin(HeavyVEXMixin):
         addr, addr_deps = addr_bundle
         result = super()._perform_vex_expr_Load(addr, ty, end, **kwargs)
 
-        if o.TRACK_MEMORY_ACTIONS in self.state.options:
+        if o.TRACK_MEMORY_ACTIONS in self.state.options and o.COLUMNAR_ACTIONS in self.state.options:
+            self.state.history.log_action(SimActionLog.MEM_READ, addr, pyvex.get_type_size(ty), result)
+            a = ()
+        elif o.TRACK_MEMORY_ACTIONS in self.state.options:
             addr_ao = SimActionObject(addr, deps=addr_deps, state=self.state)
             r = SimActionData(self.state, self.state.memory.id, SimActionData.READ, addr=addr_ao, size=pyvex.get_type_size(ty), data=result)
             self.state.history.add_action(r)
@@ -117,7 +124,10 @@ class TrackActionsMixin(HeavyVEXMixin):
         offset, offset_deps = offset_bundle
         data, data_deps = data_bundle
         # track the put
-        if o.TRACK_REGISTER_ACTIONS in self.state.options:
+        if o.TRACK_REGISTER_ACTIONS in self.state.options and o.COLUMNAR_ACTIONS in self.state.options:
+            self.state.history.log_action(SimActionLog.REG_WRITE, offset, len(data), data)
+            a = None
+        elif o.TRACK_REGISTER_ACTIONS in self.state.options:
             data_ao = SimActionObject(data, deps=data_deps, state=self.state)
             size_ao = SimActionObject(len(data))
             a = SimActionData(self.state, SimActionData.REG, SimActionData.WRITE, addr=offset, data=data_ao, size=size_ao)
@@ -137,7 +147,10 @@ class TrackActionsMixin(HeavyVEXMixin):
             condition_deps = None
 
         # track the write
-        if o.TRACK_MEMORY_ACTIONS in self.state.options and addr_deps is not None:
+        if o.TRACK_MEMORY_ACTIONS in self.state.options and o.COLUMNAR_ACTIONS in self.state.options:
+            self.state.history.log_action(SimActionLog.MEM_WRITE, addr, len(data), data, condition=condition)
+            a = None
+        elif o.TRACK_MEMORY_ACTIONS in self.state.options and addr_deps is not None:
             data_ao = SimActionObject(data, deps=data_deps, state=self.state)
             addr_ao = SimActionObject(addr, deps=addr_deps, state=self.state)
             size_ao = SimActionObject(len(data))
@@ -153,7 +166,9 @@ class TrackActionsMixin(HeavyVEXMixin):
         guard, guard_deps = guard_bundle
         target, target_deps = target_bundle
 
-        if o.TRACK_JMP_ACTIONS in self.state.options:
+        if o.TRACK_JMP_ACTIONS in self.state.options and o.COLUMNAR_ACTIONS in self.state.options:
+            self.state.history.log_action(SimActionLog.EXIT_CONDITIONAL, None, len(target), target, condition=guard)
+        elif o.TRACK_JMP_ACTIONS in self.state.options:
             guard_ao = SimActionObject(guard, deps=guard_deps, state=self.state)
             target_ao = SimActionObject(target, deps=target_deps, state=self.state)
             self.state.history.add_action(SimActionExit(self.state, target=target_ao, condition=guard_ao, exit_type=SimActionExit.CONDITIONAL))
@@ -164,7 +179,9 @@ class TrackActionsMixin(HeavyVEXMixin):
         if target_bundle is not None:
             target, target_deps = target_bundle
 
-            if o.TRACK_JMP_ACTIONS in self.state.options:
+            if o.TRACK_JMP_ACTIONS in self.state.options and o.COLUMNAR_ACTIONS in self.state.options:
+                self.state.history.log_action(SimActionLog.EXIT_DEFAULT, None, len(target), target)
+            elif o.TRACK_JMP_ACTIONS in self.state.options:
                 target_ao = SimActionObject(target, deps=target_deps, state=self.state)
                 self.state.history.add_action(SimActionExit(self.state, target_ao, exit_type=SimActionExit.DEFAULT))
         else:
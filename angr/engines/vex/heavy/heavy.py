@@ -9,6 +9,7 @@ from ..claripy.datalayer import ClaripyDataMixin, symbol
 from ....utils.constants import DEFAULT_STATEMENT
 from .... import sim_options as o
 from .... import errors
+from ....state_plugins.symbolic_memory import SimSymbolicMemory
 from . import dirty
 
 l = logging.getLogger(__name__)
@@ -18,7 +19,41 @@ class VEXEarlyExit(Exception):
 
 
 class SimStateStorageMixin(VEXMixin):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._register_file = None
+
+    __tls = ('_register_file',)
+
+    # register accesses go through state.register_file while a block is executed, unless they have to be visible to
+    # breakpoints or actions
+
+    def _can_cache_registers(self):
+        state = self.state
+        return not state._inspect_mask and \
+               o.TRACK_REGISTER_ACTIONS not in state.options and \
+               o.AUTO_REFS not in state.options and \
+               o.ABSTRACT_MEMORY not in state.options and \
+               isinstance(state.registers, SimSymbolicMemory)
+
+    def _release_register_file(self):
+        if self._register_file is not None:
+            self._register_file.end()
+            self._register_file = None
+
+    def handle_vex_block(self, irsb):
+        self._register_file = None
+        if self._can_cache_registers():
+            self._register_file = self.state.register_file
+            self._register_file.begin()
+        try:
+            super().handle_vex_block(irsb)
+        finally:
+            self._release_register_file()
+
     def _perform_vex_expr_Get(self, offset, ty, action=None, inspect=True):
+        if self._register_file is not None:
+            return self._register_file.load(offset, self._ty_to_bytes(ty))
         return self.state.registers.load(offset, self._ty_to_bytes(ty), action=action, inspect=inspect)
 
     def _perform_vex_expr_RdTmp(self, tmp):
@@ -28,6 +63,9 @@ class SimStateStorageMixin(VEXMixin):
         return self.state.memory.load(addr, self._ty_to_bytes(ty), endness=endness, action=action, inspect=inspect)
 
     def _perform_vex_stmt_Put(self, offset, data, action=None, inspect=True):
+        if self._register_file is not None:
+            self._register_file.store(offset, data)
+            return
         self.state.registers.store(offset, data, action=action, inspect=inspect)
 
     def _perform_vex_stmt_Store(self, addr, data, endness, action=None, inspect=True, condition=None):
@@ -217,6 +255,26 @@ class HeavyVEXMixin(SuccessorsMixin, ClaripyDataMixin, SimStateStorageMixin, VEX
         cont_state = None
         exit_state = None
         guard = guard != 0
+        # the exit state is a copy of the state, or the state itself
+        if self._register_file is not None:
+            self._register_file.flush()
+
+        if o.LAZY_SUCCESSORS in self.state.options and self._can_defer_exit(guard):
+            # the state at the end of the block is the state at this exit, except for the instruction pointer, the
+            # temps, and the instruction count. the constraints of earlier deferred exits are only in the accumulated
+            # guard, so they are part of the guard of this exit
+            self.successors.add_lazy_exit(target, claripy.And(self.state.scratch.guard, guard), jumpkind,
+                                          exit_stmt_idx=self.stmt_idx, exit_ins_addr=self.state.scratch.ins_addr,
+                                          insn_count=self.state.history.recent_instruction_count)
+            self.state.scratch.guard = claripy.And(self.state.scratch.guard, ~guard)
+            return
+
+        if self.successors.lazy_exits:
+            if not self.successors.materialize_lazy_exits(self.state):
+                # the state has been taken by a deferred exit
+                raise VEXEarlyExit
+            # the successors of this exit and of the rest of the block are constrained by the deferred exits
+            self.state.add_constraints(self.state.scratch.guard)
 
         if o.COPY_STATES not in self.state.options:
             # very special logic to try to minimize copies
@@ -250,12 +308,43 @@ class HeavyVEXMixin(SuccessorsMixin, ClaripyDataMixin, SimStateStorageMixin, VEX
         cont_state.add_constraints(cont_condition)
         cont_state.scratch.guard = claripy.And(cont_state.scratch.guard, cont_condition)
 
+    def _can_defer_exit(self, guard):
+        """
+        Check if an exit can be recorded as a LazyExit, which requires that the rest of the block does not change the
+        state in anything but the instruction pointer, the temps, and the instruction count. Further exits of the rest
+        of the block are deferred as well, and their guards are checked together.
+        """
+
+        if guard.is_true() or guard.is_false() or o.COPY_STATES in self.state.options:
+            return False
+        if any(opt in self.state.options for opt in o.refs) or o.CONCRETIZE in self.state.options or \
+                self.state._inspect_mask:
+            # actions, concretizations, and breakpoints of the rest of the block would show up in the exit state
+            return False
+
+        ip_offset = self.state.arch.ip_offset
+        for stmt in self.irsb.statements[self.stmt_idx + 1:]:
+            if type(stmt) is pyvex.IRStmt.Put and stmt.offset == ip_offset:
+                continue
+            if type(stmt) in (pyvex.IRStmt.WrTmp, pyvex.IRStmt.Exit):
+                # loads may initialize memory, and ccalls may add constraints
+                if any(type(expr) in (pyvex.IRExpr.Load, pyvex.IRExpr.CCall) for expr in stmt.expressions):
+                    return False
+                continue
+            if type(stmt) in (pyvex.IRStmt.IMark, pyvex.IRStmt.NoOp, pyvex.IRStmt.AbiHint, pyvex.IRStmt.MBE):
+                continue
+            return False
+        return True
+
     def _perform_vex_stmt_Dirty_call(self, func_name, ty, args, func=None):
         if func is None:
             try:
                  func = getattr(dirty, func_name)
             except AttributeError as e:
                 raise errors.UnsupportedDirtyError("Unsupported dirty helper %s" % func_name) from e
+        # dirty helpers read and write registers through the state
+        if self._register_file is not None:
+            self._register_file.clear()
         retval, retval_constraints = func(self.state, *args)
         self.state.add_constraints(*retval_constraints)
         return retval
@@ -284,6 +373,9 @@ class HeavyVEXMixin(SuccessorsMixin, ClaripyDataMixin, SimStateStorageMixin, VEX
     def _perform_vex_expr_CCall(self, func_name, ty, args, func=None):
         if o.DO_CCALLS not in self.state.options:
             return symbol(ty, 'ccall_ret')
+        # some ccalls look at the registers of the state
+        if self._register_file is not None:
+            self._register_file.flush()
         return super()._perform_vex_expr_CCall(func_name, ty, args, func=None)
 
     def _analyze_vex_defaultexit(self, expr):
@@ -291,7 +383,11 @@ class HeavyVEXMixin(SuccessorsMixin, ClaripyDataMixin, SimStateStorageMixin, VEX
         return super()._analyze_vex_defaultexit(expr)
 
     def _perform_vex_defaultexit(self, expr, jumpkind):
+        self._release_register_file()
         if expr is None:
             expr = self.state.regs.ip
+        if not self.successors.materialize_lazy_exits(self.state):
+            # the state has been taken by a deferred exit
+            return
         self.successors.add_successor(self.state, expr, self.state.scratch.guard, jumpkind,
                                  exit_stmt_idx=DEFAULT_STATEMENT, exit_ins_addr=self.state.scratch.ins_addr)
@@ -174,7 +174,7 @@ from .loop_seer import LoopSeer
 from .tracer import Tracer
 from .explorer import Explorer
 from .threading import Threading
-from .dfs import DFS
+from .dfs import DFS, CheckpointDFS
 from .lengthlimiter import LengthLimiter
 from .veritesting import Veritesting
 from .oppologist import Oppologist
@@ -187,3 +187,6 @@ from .unique import UniqueSearch
 from .symbion import Symbion
 from ..errors import AngrError, AngrExplorationTechniqueError
 from .memory_watcher import MemoryWatcher
+from .memory_budget import MemoryBudget
+from .distributed import Distributed, DistributedBroker, run_worker
+from .block_profiler import BlockProfiler
@@ -0,0 +1,290 @@
+import time
+import array
+from collections import defaultdict
+
+from . import ExplorationTechnique
+from ..state_plugins.solver import SolverClock, set_solver_clock
+
+
+class BlockProfiler(ExplorationTechnique):
+    """
+    Record where symbolic execution spends its time, per basic block and per SimProcedure.
+
+    For every address that is stepped, the number of executions, the cumulative time spent in the engine, the part of
+    it that is spent in solver queries, and the number of forks (additional satisfiable successors) are recorded.
+    Statistics are kept in flat arrays indexed by a per-address slot, so profiling long runs stays cheap. The results
+    can be summarized per function (using the functions in the knowledge base), or exported as folded stacks that
+    flame graph tools (flamegraph.pl, speedscope, etc.) understand.
+
+        profiler = BlockProfiler()
+        simgr.use_technique(profiler)
+        simgr.run()
+        print(profiler.format_report())
+        profiler.dump_flamegraph("run.folded")
+    """
+
+    BLOCK = 0
+    PROCEDURE = 1
+
+    def __init__(self, kb=None, record_stacks=True, max_stack_depth=32):
+        """
+        :param kb:                  The knowledge base whose functions are used to group blocks into functions. By
+                                    default, the knowledge base of the project is used.
+        :param bool record_stacks:  Record the engine time per call stack, which is required to export flame graphs.
+        :param int max_stack_depth: Only the innermost max_stack_depth frames of a call stack are recorded.
+        """
+
+        super(BlockProfiler, self).__init__()
+
+        self.kb = kb
+        self.record_stacks = record_stacks
+        self.max_stack_depth = max_stack_depth
+
+        # (address, kind) -> slot
+        self._slots = { }
+        # per-slot statistics
+        self._addrs = array.array('Q')
+        self._kinds = array.array('B')
+        self._counts = array.array('Q')
+        self._forks = array.array('Q')
+        self._engine_times = array.array('d')
+        self._solver_times = array.array('d')
+        # the function (from the call stack) in which each slot was first executed
+        self._funcs = array.array('Q')
+        # names of SimProcedures, slot -> name
+        self._procedure_names = { }
+        # (function addresses from the outermost to the innermost frame, slot) -> engine time
+        self._stacks = defaultdict(float)
+
+        self._clock = SolverClock()
+
+    def clear(self):
+        """
+        Discard all recorded statistics.
+        """
+
+        self._slots.clear()
+        for arr in (self._addrs, self._kinds, self._counts, self._forks, self._engine_times, self._solver_times,
+                    self._funcs):
+            del arr[:]
+        self._procedure_names.clear()
+        self._stacks.clear()
+
+    def setup(self, simgr):
+        if self.kb is None:
+            self.kb = self.project.kb
+
+    #
+    # Recording
+    #
+
+    def _slot(self, addr, kind, func_addr):
+        slot = self._slots.get((addr, kind), None)
+        if slot is None:
+            slot = len(self._addrs)
+            self._slots[(addr, kind)] = slot
+            self._addrs.append(addr)
+            self._kinds.append(kind)
+            self._counts.append(0)
+            self._forks.append(0)
+            self._engine_times.append(0.0)
+            self._solver_times.append(0.0)
+            self._funcs.append(func_addr)
+        return slot
+
+    def _stack_of(self, state):
+        frames = [ ]
+        for frame in state.callstack:
+            if len(frames) >= self.max_stack_depth:
+                break
+            frames.append(frame.func_addr)
+        frames.reverse()
+        return tuple(frames)
+
+    def successors(self, simgr, state, **kwargs):
+        addr = state.addr
+        clock = self._clock
+        previous_clock = set_solver_clock(clock)
+        solver_start = clock.total
+        start = time.perf_counter()
+        successors = None
+        try:
+            successors = simgr.successors(state, **kwargs)
+            return successors
+        finally:
+            elapsed = time.perf_counter() - start
+            set_solver_clock(previous_clock)
+            if previous_clock is not None:
+                # nested profilers all see the solver time
+                previous_clock.total += clock.total - solver_start
+            self._record(state, addr, successors, elapsed, clock.total - solver_start)
+
+    def _record(self, state, addr, successors, elapsed, solver_time):
+        if successors is not None and successors.sort == 'SimProcedure':
+            kind = self.PROCEDURE
+        else:
+            kind = self.BLOCK
+
+        func_addr = state.callstack.func_addr
+        slot = self._slot(addr, kind, func_addr if func_addr is not None else addr)
+        if kind == self.PROCEDURE and slot not in self._procedure_names:
+            self._procedure_names[slot] = successors.artifacts.get('name', None)
+
+        self._counts[slot] += 1
+        self._engine_times[slot] += elapsed
+        self._solver_times[slot] += solver_time
+        if successors is not None and len(successors.flat_successors) > 1:
+            self._forks[slot] += len(successors.flat_successors) - 1
+
+        if self.record_stacks:
+            self._stacks[(self._stack_of(state), slot)] += elapsed
+
+    #
+    # Reporting
+    #
+
+    def _name_of(self, addr):
+        if self.kb is not None and addr in self.kb.functions:
+            return self.kb.functions[addr].name
+        return "%#x" % addr
+
+    def _slot_name(self, slot):
+        addr = self._addrs[slot]
+        if self._kinds[slot] == self.PROCEDURE:
+            name = self._procedure_names.get(slot, None)
+            return "%s (%#x)" % (name, addr) if name else "SimProcedure %#x" % addr
+        return "block %#x" % addr
+
+    def _function_map(self):
+        """
+        Map block addresses to the functions that contain them in the knowledge base.
+        """
+
+        block_to_func = { }
+        if self.kb is None:
+            return block_to_func
+        for func in self.kb.functions.values():
+            for block_addr in func.block_addrs_set:
+                block_to_func.setdefault(block_addr, func.addr)
+        return block_to_func
+
+    def _slot_stats(self, slot):
+        return {
+            'addr': self._addrs[slot],
+            'kind': 'procedure' if self._kinds[slot] == self.PROCEDURE else 'block',
+            'name': self._slot_name(slot),
+            'count': self._counts[slot],
+            'engine_time': self._engine_times[slot],
+            'solver_time': self._solver_times[slot],
+            'forks': self._forks[slot],
+        }
+
+    def hot_blocks(self, n=20, key='engine_time'):
+        """
+        Get the most expensive blocks and SimProcedures.
+
+        :param int n:       Number of entries to return, or None to return all of them.
+        :param str key:     The statistic to sort by: 'engine_time', 'solver_time', 'count', or 'forks'.
+        :return:            A list of dicts with the statistics of each block or SimProcedure.
+        :rtype:             list
+        """
+
+        stats = [ self._slot_stats(slot) for slot in range(len(self._addrs)) ]
+        stats.sort(key=lambda s: s[key], reverse=True)
+        return stats if n is None else stats[:n]
+
+    def function_summary(self):
+        """
+        Aggregate the statistics of all blocks and SimProcedures per function. Blocks are attributed to the functions
+        that contain them in the knowledge base; blocks that are not part of any known function are attributed to the
+        function on top of the call stack when they were executed. SimProcedures are their own functions.
+
+        :return:    A dict that maps function addresses to their statistics.
+        :rtype:     dict
+        """
+
+        block_to_func = self._function_map()
+        summary = { }
+        for slot in range(len(self._addrs)):
+            addr = self._addrs[slot]
+            if self._kinds[slot] == self.PROCEDURE:
+                func_addr = addr
+            else:
+                func_addr = block_to_func.get(addr, self._funcs[slot])
+
+            s = summary.get(func_addr, None)
+            if s is None:
+                name = self._name_of(func_addr)
+                if self._kinds[slot] == self.PROCEDURE and self._procedure_names.get(slot, None):
+                    name = self._procedure_names[slot]
+                s = summary[func_addr] = {
+                    'name': name,
+                    'is_procedure': self._kinds[slot] == self.PROCEDURE,
+                    'blocks': 0,
+                    'count': 0,
+                    'engine_time': 0.0,
+                    'solver_time': 0.0,
+                    'forks': 0,
+                }
+            s['blocks'] += 1
+            s['count'] += self._counts[slot]
+            s['engine_time'] += self._engine_times[slot]
+            s['solver_time'] += self._solver_times[slot]
+            s['forks'] += self._forks[slot]
+        return summary
+
+    def format_report(self, n=10):
+        """
+        Generate a human-readable report of the most expensive functions and blocks.
+
+        :param int n:   Number of functions and blocks to show.
+        :return:        The report.
+        :rtype:         str
+        """
+
+        lines = [ "Functions:" ]
+        functions = sorted(self.function_summary().items(), key=lambda kv: kv[1]['engine_time'], reverse=True)
+        for func_addr, s in functions[:n]:
+            lines.append("    %-40s %10d steps %12.6f sec (solver %.6f sec) %8d forks" % (
+                "%s (%#x)" % (s['name'], func_addr), s['count'], s['engine_time'], s['solver_time'], s['forks']))
+        lines.append("Blocks:")
+        for s in self.hot_blocks(n=n):
+            lines.append("    %-40s %10d steps %12.6f sec (solver %.6f sec) %8d forks" % (
+                s['name'], s['count'], s['engine_time'], s['solver_time'], s['forks']))
+        return "\n".join(lines)
+
+    def folded_stacks(self):
+        """
+        Generate the recorded call stacks in the folded format, one "frame;frame;...;block microseconds" line per
+        stack, which can be turned into a flame graph by flamegraph.pl or loaded into speedscope.
+
+        :return:    The folded stacks.
+        :rtype:     str
+        """
+
+        if not self.record_stacks:
+            raise ValueError("Call stacks are not recorded. Create the profiler with record_stacks=True.")
+
+        lines = [ ]
+        names = { }
+        for (stack, slot), elapsed in sorted(self._stacks.items(), key=lambda kv: kv[1], reverse=True):
+            micro = int(elapsed * 1000000)
+            if micro == 0:
+                continue
+            frames = [ ]
+            for func_addr in stack:
+                if func_addr not in names:
+                    names[func_addr] = self._name_of(func_addr).replace(';', ':')
+                frames.append(names[func_addr])
+            frames.append(self._slot_name(slot).replace(';', ':'))
+            lines.append("%s %d" % (";".join(frames), micro))
+        return "\n".join(lines)
+
+    def dump_flamegraph(self, path):
+        """
+        Save the recorded call stacks in the folded format to a file.
+        """
+
+        with open(path, 'w') as f:
+            f.write(self.folded_stacks())
+            f.write("\n")
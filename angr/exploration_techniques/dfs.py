@@ -1,5 +1,10 @@
-from . import ExplorationTechnique
 import random
+import logging
+
+from . import ExplorationTechnique
+
+l = logging.getLogger(name=__name__)
+
 
 class DFS(ExplorationTechnique):
     """
@@ -31,3 +36,120 @@ class DFS(ExplorationTechnique):
             simgr.stashes[stash].append(simgr.stashes[self.deferred_stash].pop())
 
         return simgr
+
+
+class _DeferredBranch:
+    """
+    A deferred alternative of CheckpointDFS: the parent state that was stepped, and the index of the successor to pick
+    when the parent is stepped again. Alternatives that cannot be re-derived are kept as full states.
+    """
+
+    __slots__ = ('parent', 'index', 'addr', 'state', )
+
+    def __init__(self, parent=None, index=None, addr=None, state=None):
+        self.parent = parent
+        self.index = index
+        self.addr = addr
+        self.state = state
+
+
+class CheckpointDFS(ExplorationTechnique):
+    """
+    Depth-first search that does not keep deferred states around.
+
+    Like DFS, only one path is kept active at a time. Instead of stashing the other successors of a step, their parent
+    state (the checkpoint) is kept together with the index of each successor, and all alternatives of a step share the
+    same checkpoint. When we run out of active paths, the most recent alternative is re-derived by stepping its
+    checkpoint again. As a result, memory usage is proportional to the depth of the search instead of the number of
+    deferred alternatives, at the cost of re-executing one block per backtrack.
+
+    Successors are indexed by their position in the output of step_state(), before they are filtered or moved by the
+    rest of the stepping pipeline, and re-derivation relies on stepping being deterministic. Successors that cannot be
+    traced back to a stepped state (e.g., those created by other exploration techniques) are deferred as full states.
+    """
+
+    # arguments of SimulationManager.step() that are not passed to step_state()
+    _step_only_args = ('n', 'selector_func', 'step_func', 'until', 'filter_func', )
+
+    def __init__(self):
+        super(CheckpointDFS, self).__init__()
+        self._random = random.Random()
+        self._random.seed(10)
+        self._deferred = [ ]
+        # id of a successor -> (successor, parent, index of the successor in the output of step_state())
+        self._origins = { }
+        self.rederived_count = 0
+
+    @property
+    def deferred(self):
+        """
+        The number of deferred alternatives.
+        """
+        return len(self._deferred)
+
+    @property
+    def checkpoints(self):
+        """
+        The number of distinct checkpoints held by deferred alternatives.
+        """
+        return len(set(id(d.parent) for d in self._deferred if d.parent is not None))
+
+    def _origin(self, state):
+        origin = self._origins.get(id(state), None)
+        if origin is None or origin[0] is not state:
+            return None
+        return origin
+
+    def step_state(self, simgr, state, **kwargs):
+        stashes = simgr.step_state(state, **kwargs)
+        for i, s in enumerate(stashes.get(None, [ ])):
+            self._origins[id(s)] = (s, state, i)
+        return stashes
+
+    def step(self, simgr, stash='active', **kwargs):
+        self._origins.clear()
+        simgr = simgr.step(stash=stash, **kwargs)
+
+        states = simgr.stashes[stash]
+        if len(states) > 1:
+            states = list(states)
+            self._random.shuffle(states)
+            simgr.stashes[stash] = states[:1]
+            for s in reversed(states[1:]):
+                origin = self._origin(s)
+                if origin is None:
+                    self._deferred.append(_DeferredBranch(addr=s.addr, state=s))
+                else:
+                    self._deferred.append(_DeferredBranch(parent=origin[1], index=origin[2], addr=s.addr))
+        self._origins.clear()
+
+        while not simgr.stashes[stash] and self._deferred:
+            state = self._rederive(simgr, self._deferred.pop(), **kwargs)
+            if state is not None:
+                simgr.stashes[stash].append(state)
+
+        return simgr
+
+    def _rederive(self, simgr, branch, **kwargs):
+        if branch.state is not None:
+            return branch.state
+
+        run_args = { k: v for k, v in kwargs.items() if k not in self._step_only_args }
+        stashes = simgr.step_state(branch.parent, **run_args)
+        self.rederived_count += 1
+
+        # other techniques may have moved the successor after our step_state() indexed it
+        rederived = None
+        for successors in stashes.values():
+            for s in successors:
+                origin = self._origin(s)
+                if origin is not None and origin[1] is branch.parent and origin[2] == branch.index \
+                        and s.addr == branch.addr:
+                    rederived = s
+        self._origins.clear()
+        if rederived is not None:
+            return rederived
+
+        l.warning("Stepping %s again yields different successors. Dropping the deferred successor at %#x.",
+                  branch.parent, branch.addr)
+        return None
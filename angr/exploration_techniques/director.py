@@ -1,6 +1,6 @@
 
 import logging
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 import networkx
 
@@ -369,12 +369,22 @@ class Director(ExplorationTechnique):
     - Might reach the destination within the peek depth. Those states are prioritized.
     - Will not reach the destination within the peek depth. Those states are de-prioritized. However, there is a little
       chance for those states to be explored as well in order to prevent over-fitting.
+
+    Peeking and goal checking are cached per program point (the block address and the call stack suffix), and are shared
+    by all states at the same program point. The CFG is resumed from program points that are not in the CFG yet. For
+    program points that are in the CFG, the recovery is continued from the nodes within the peek depth where it has
+    been paused before, so that the CFG always covers the peek depth. Least recently used program points are evicted
+    from the caches when they grow over peek_cache_size.
     """
 
     def __init__(self, peek_blocks=100, peek_functions=5, goals=None, cfg_keep_states=False,
-                 goal_satisfied_callback=None, num_fallback_states=5):
+                 goal_satisfied_callback=None, num_fallback_states=5, cfg=None, peek_cache_size=10000):
         """
         Constructor.
+
+        :param cfg:                 An existing CFGEmulated instance (e.g., a project-level CFG) to use and refine,
+                                    instead of building a new one from the active states.
+        :param int peek_cache_size: The maximum number of program points to cache peek and goal checking results for.
         """
 
         super(Director, self).__init__()
@@ -386,8 +396,17 @@ class Director(ExplorationTechnique):
         self._goal_satisfied_callback = goal_satisfied_callback
         self._num_fallback_states = num_fallback_states
 
-        self._cfg = None
-        self._cfg_kb = None
+        self._cfg = cfg
+        self._cfg_kb = cfg.kb if cfg is not None else None
+
+        self._peek_cache_size = peek_cache_size
+        # program points that the CFG has been peeked from
+        self._peeked = OrderedDict()
+        # (goal, program point) -> result of goal.check()
+        self._goal_cache = OrderedDict()
+
+        self.peek_cache_hits = 0
+        self.peek_cache_misses = 0
 
     def step(self, simgr, stash='active', **kwargs):
         """
@@ -448,12 +467,121 @@ class Director(ExplorationTechnique):
             self._cfg = self.project.analyses.CFGEmulated(kb=self._cfg_kb, starts=starts, max_steps=self._peek_blocks,
                                                           keep_state=self._cfg_keep_states
                                                           )
+            for state in starts:
+                self._touch(self._peeked, self._program_point(state), None)
 
         else:
 
-            starts = list(simgr.active)
+            # only peek from program points that we have not peeked from before, once for each program point
+            starts = { }
+            # block IDs of paused nodes -> their smallest distance from a program point
+            extend = { }
+            for state in simgr.active:
+                point = self._program_point(state)
+                if point in self._peeked:
+                    self._peeked.move_to_end(point)
+                    self.peek_cache_hits += 1
+                    continue
+                if point in starts:
+                    continue
+
+                node = BaseGoal._get_cfg_node(self._cfg, state)
+                if node is None or (self._cfg.graph.out_degree(node) == 0 and
+                                    node.block_id not in self._cfg.paused_block_ids):
+                    starts[point] = state
+                    self.peek_cache_misses += 1
+                    continue
+
+                # the CFG (e.g., a project-level CFG, or one that was peeked from an earlier program point) already
+                # covers this program point, but it may not cover the peek depth
+                paused = self._paused_nodes(node)
+                if paused:
+                    for block_id, depth in paused.items():
+                        extend[block_id] = min(depth, extend.get(block_id, depth))
+                    self.peek_cache_misses += 1
+                else:
+                    self.peek_cache_hits += 1
+                self._touch(self._peeked, point, None)
+
+            if starts or extend:
+                self._cfg.resume(starts=list(starts.values()), max_steps=self._peek_blocks, extend=extend)
+                for point in starts:
+                    self._touch(self._peeked, point, None)
+
+                # the CFG only grows, so goals that were reachable are still reachable. all other results may change
+                for key in [ k for k, v in self._goal_cache.items() if not v ]:
+                    del self._goal_cache[key]
+
+    def _program_point(self, state):
+        """
+        Get the program point of a state, which is the key for all caches.
+
+        :param angr.SimState state: The state.
+        :return:                    A tuple of the block address, the call stack suffix, and whether it is a syscall.
+        :rtype:                     tuple
+        """
+
+        call_stack_suffix = state.callstack.stack_suffix(self._cfg.context_sensitivity_level)
+        is_syscall = state.history.jumpkind is not None and state.history.jumpkind.startswith('Ijk_Sys')
+        return state.addr, tuple(call_stack_suffix), is_syscall
+
+    def _paused_nodes(self, node):
+        """
+        Find the nodes within the peek depth from a node where the CFG recovery has been paused.
+
+        :param CFGNode node:    The node to start from.
+        :return:                A dict of block IDs of paused nodes to their distance from the node.
+        :rtype:                 dict
+        """
+
+        paused_block_ids = self._cfg.paused_block_ids
+        if not paused_block_ids:
+            return { }
+
+        paused = { }
+        seen = { node }
+        frontier = [ node ]
+        for depth in range(self._peek_blocks):
+            if not frontier:
+                break
+            next_frontier = [ ]
+            for n in frontier:
+                if n.block_id in paused_block_ids:
+                    paused[n.block_id] = depth
+                for succ in self._cfg.graph.successors(n):
+                    if succ not in seen:
+                        seen.add(succ)
+                        next_frontier.append(succ)
+            frontier = next_frontier
+        return paused
+
+    def _touch(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self._peek_cache_size:
+            cache.popitem(last=False)
+
+    def _check_goal_reachable(self, goal, state):
+        """
+        Check if a goal may be reached from a state within the peek depth, and cache the result for the program point
+        of the state.
+
+        :param BaseGoal goal:       The goal to check against.
+        :param angr.SimState state: The state to check.
+        :return:                    True if the goal may be reached, False otherwise.
+        :rtype:                     bool
+        """
+
+        key = goal, self._program_point(state)
+        try:
+            r = self._goal_cache[key]
+        except KeyError:
+            r = goal.check(self._cfg, state, peek_blocks=self._peek_blocks)
+            self._touch(self._goal_cache, key, r)
+            return r
 
-            self._cfg.resume(starts=starts, max_steps=self._peek_blocks)
+        self._goal_cache.move_to_end(key)
+        return r
 
     def _load_fallback_states(self, pg):
         """
@@ -491,9 +619,7 @@ class Director(ExplorationTechnique):
                         self._goal_satisfied_callback(goal, p, simgr)
 
         simgr.stash(
-            filter_func=lambda p: all(not goal.check(self._cfg, p, peek_blocks=self._peek_blocks) for goal in
-                                      self._goals
-                                      ),
+            filter_func=lambda p: all(not self._check_goal_reachable(goal, p) for goal in self._goals),
             from_stash='active',
             to_stash='deprioritized',
         )
@@ -0,0 +1,513 @@
+import io
+import os
+import time
+import queue
+import pickle
+import socket
+import logging
+import threading
+import multiprocessing
+from collections import defaultdict
+from multiprocessing.managers import BaseManager
+
+from . import ExplorationTechnique
+from ..errors import AngrError, SimError
+
+l = logging.getLogger(name=__name__)
+
+COORDINATOR_CHANNEL = 'coordinator'
+
+
+#
+# The broker
+#
+
+class _Channels:
+    """
+    Named message queues. A single instance lives in the broker process and is shared by the coordinator and all
+    workers.
+    """
+
+    def __init__(self):
+        self._queues = defaultdict(queue.Queue)
+        self._lock = threading.Lock()
+
+    def _queue(self, channel):
+        with self._lock:
+            return self._queues[channel]
+
+    def put(self, channel, item):
+        self._queue(channel).put(item)
+
+    def get(self, channel, timeout=None):
+        """
+        Get a message from a channel.
+
+        :param str channel:     Name of the channel.
+        :param float timeout:   Seconds to wait for a message. Do not wait at all if it is 0.
+        :return:                The message, or None if there is no message.
+        """
+        try:
+            if timeout == 0:
+                return self._queue(channel).get(block=False)
+            return self._queue(channel).get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+_channels = None
+
+
+def _get_channels():
+    global _channels  # pylint:disable=global-statement
+    if _channels is None:
+        _channels = _Channels()
+    return _channels
+
+
+class DistributedBroker(BaseManager):
+    """
+    A message broker for distributed exploration. It listens on a socket, so workers may run on the same host as the
+    coordinator or on other hosts.
+    """
+
+
+DistributedBroker.register('channels', callable=_get_channels)
+
+
+def connect_broker(address, authkey):
+    """
+    Connect to a running broker.
+
+    :param address:         Address of the broker, as a (host, port) tuple.
+    :param bytes authkey:   The authentication key of the broker.
+    :return:                A proxy to the channels of the broker.
+    """
+    broker = DistributedBroker(address=address, authkey=authkey)
+    broker.connect()
+    return broker.channels()
+
+
+#
+# Serialization
+#
+
+class _StatePickler(pickle.Pickler):
+    """
+    Pickle states without their project. Both ends of a connection have their own copy of the project.
+    """
+
+    def __init__(self, project, file):
+        super(_StatePickler, self).__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.project = project
+
+    def persistent_id(self, obj):
+        if obj is self.project:
+            return 'project'
+        return None
+
+
+class _StateUnpickler(pickle.Unpickler):
+    def __init__(self, project, file):
+        super(_StateUnpickler, self).__init__(file)
+        self.project = project
+
+    def persistent_load(self, pid):
+        if pid == 'project':
+            return self.project
+        raise pickle.UnpicklingError("Unknown persistent ID %s." % pid)
+
+
+def _dumps(project, obj):
+    f = io.BytesIO()
+    _StatePickler(project, f).dump(obj)
+    return f.getvalue()
+
+
+def _loads(project, data):
+    return _StateUnpickler(project, io.BytesIO(data)).load()
+
+
+def _dump_error(error):
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:  # pylint:disable=broad-except
+        return RuntimeError(repr(error))
+
+
+#
+# Workers
+#
+
+def run_worker(project, address, authkey, worker_id=None, worker_setup=None, poll_interval=1.0):
+    """
+    Run a worker for distributed exploration until the coordinator stops it. Call this function on each host that
+    should take part in the exploration.
+
+    :param project:             The project. It must be loaded from the same binary as the project of the coordinator.
+    :param address:             Address of the broker, as a (host, port) tuple.
+    :param bytes authkey:       The authentication key of the broker.
+    :param str worker_id:       A unique ID of this worker. Defaults to the host name and the PID.
+    :param func worker_setup:   A function that takes the simulation manager of each batch and installs exploration
+                                techniques on it (e.g., an Explorer with find and avoid addresses).
+    :param float poll_interval: Seconds between heartbeats.
+    :return:                    None
+    """
+
+    channels = connect_broker(address, authkey)
+    if worker_id is None:
+        worker_id = "%s-%d" % (socket.gethostname(), os.getpid())
+    channel = 'worker-' + worker_id
+    channels.put(COORDINATOR_CHANNEL, ('hello', worker_id))
+
+    while True:
+        msg = channels.get(channel, poll_interval)
+        if msg is None:
+            channels.put(COORDINATOR_CHANNEL, ('heartbeat', worker_id, 0))
+            continue
+        if msg[0] == 'stop':
+            break
+        if msg[0] != 'batch':
+            # a steal request that arrived after its batch was done
+            continue
+
+        _, batch_id, blobs, steps = msg
+        simgr = project.factory.simulation_manager([ _loads(project, b) for b in blobs ])
+        if worker_setup is not None:
+            worker_setup(simgr)
+
+        stop = False
+        last_heartbeat = time.time()
+        for _ in range(steps):
+            if not simgr.active:
+                break
+            simgr.step()
+
+            if time.time() - last_heartbeat >= poll_interval:
+                channels.put(COORDINATOR_CHANNEL, ('heartbeat', worker_id, len(simgr.active)))
+                last_heartbeat = time.time()
+            ctrl = channels.get(channel, 0)
+            if ctrl is not None:
+                # both a steal request and a stop request end the batch right away
+                stop = ctrl[0] == 'stop'
+                break
+
+        stashes = { name: [ _dumps(project, s) for s in states ] for name, states in simgr.stashes.items() if states }
+        errored = [ ]
+        for record in simgr.errored:
+            try:
+                errored.append((_dumps(project, record.state), _dump_error(record.error)))
+            except (AngrError, SimError, pickle.PicklingError, TypeError):
+                l.warning("Cannot serialize errored state %s.", record.state, exc_info=True)
+        channels.put(COORDINATOR_CHANNEL, ('done', worker_id, batch_id, stashes, errored))
+
+        if stop:
+            break
+
+
+#
+# The coordinator
+#
+
+class _WorkerInfo:
+    __slots__ = ('worker_id', 'process', 'last_seen', 'batch_id', 'active', 'stealing', )
+
+    def __init__(self, worker_id, process=None):
+        self.worker_id = worker_id
+        self.process = process
+        self.last_seen = time.time()
+        self.batch_id = None
+        self.active = 0
+        self.stealing = False
+
+
+class Distributed(ExplorationTechnique):
+    """
+    Explore states in multiple worker processes, on one host or on several hosts.
+
+    The coordinator (the simulation manager that uses this technique) hands out batches of states from the stepped
+    stash to idle workers through a broker. Each worker steps its batch for a number of steps, and then sends all
+    resulting stashes back, where they are merged into the stashes of the coordinator (the remaining active states go
+    back to the stepped stash). When a worker runs out of work and no states are waiting, the coordinator asks the
+    busiest worker to end its batch early and return its active states, which are then redistributed (work stealing).
+
+    States handed out to a worker are kept by the coordinator until the worker returns the batch. If a worker process
+    dies, or a worker stops sending heartbeats, its batch is given to another worker. The state of the coordinator can
+    be checkpointed to a file periodically, so that an interrupted job can be resumed.
+
+    Exploration techniques that act on individual states (e.g., Explorer) must be installed on the workers with
+    worker_setup. Additional workers can join from other hosts with run_worker().
+    """
+
+    def __init__(self, workers=None, batch_size=8, steps_per_batch=32, worker_setup=None, address=None,
+                 authkey=None, checkpoint=None, checkpoint_interval=60.0, heartbeat_timeout=60.0, poll_interval=0.5):
+        """
+        :param int workers:                 Number of local worker processes to start. Defaults to the number of CPUs.
+                                            Use 0 to rely on remote workers only.
+        :param int batch_size:              The maximum number of states in each batch.
+        :param int steps_per_batch:         The maximum number of steps that a worker takes on each batch.
+        :param func worker_setup:           A function that takes the simulation manager of each batch on a worker and
+                                            installs exploration techniques on it.
+        :param address:                     The (host, port) that the broker listens on. Defaults to a random port on
+                                            localhost.
+        :param bytes authkey:               The authentication key of the broker. Defaults to random bytes.
+        :param str checkpoint:              Path of the checkpoint file. If the file exists, the stashes of the
+                                            simulation manager are replaced by the checkpointed ones when the
+                                            technique is set up.
+        :param float checkpoint_interval:   Seconds between two checkpoints.
+        :param float heartbeat_timeout:     Seconds without any message after which a busy worker is considered dead.
+        :param float poll_interval:         Seconds to wait for messages from workers in each round.
+        """
+
+        super(Distributed, self).__init__()
+
+        self.workers = multiprocessing.cpu_count() if workers is None else workers
+        self.batch_size = batch_size
+        self.steps_per_batch = steps_per_batch
+        self.worker_setup = worker_setup
+        self.address = ('127.0.0.1', 0) if address is None else address
+        self.authkey = os.urandom(16) if authkey is None else authkey
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.poll_interval = poll_interval
+
+        self._broker = None
+        self._channels = None
+        self._workers = { }
+        # batch ID -> (worker ID, serialized states)
+        self._batches = { }
+        self._next_batch_id = 0
+        self._last_checkpoint = time.time()
+
+        self.batches_done = 0
+        self.batches_stolen = 0
+        self.batches_retried = 0
+
+    #
+    # Setup and teardown
+    #
+
+    def setup(self, simgr):
+        if self.checkpoint is not None and os.path.isfile(self.checkpoint):
+            self.restore_checkpoint(simgr, self.checkpoint)
+
+    def _start(self):
+        if self._broker is not None:
+            return
+
+        self._broker = DistributedBroker(address=self.address, authkey=self.authkey)
+        self._broker.start()
+        self.address = self._broker.address
+        self._channels = self._broker.channels()
+
+        ctx = multiprocessing.get_context('fork')
+        for i in range(self.workers):
+            worker_id = 'local-%d' % i
+            proc = ctx.Process(target=run_worker, args=(self.project, self.address, self.authkey),
+                               kwargs={'worker_id': worker_id, 'worker_setup': self.worker_setup,
+                                       'poll_interval': self.poll_interval},
+                               daemon=True)
+            proc.start()
+            self._workers[worker_id] = _WorkerInfo(worker_id, process=proc)
+
+    def shutdown(self):
+        """
+        Stop all workers and the broker.
+        """
+
+        if self._broker is None:
+            return
+
+        for worker in self._workers.values():
+            self._channels.put('worker-' + worker.worker_id, ('stop', ))
+        for worker in self._workers.values():
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        self._workers.clear()
+
+        self._channels = None
+        self._broker.shutdown()
+        self._broker = None
+
+    #
+    # Stepping
+    #
+
+    def step(self, simgr, stash='active', **kwargs):
+        self._start()
+
+        while True:
+            self._reap_workers(simgr, stash)
+            self._dispatch(simgr, stash)
+            if not self._batches and not simgr.stashes[stash]:
+                # everything is explored
+                break
+
+            self._handle_message(simgr, stash, self._channels.get(COORDINATOR_CHANNEL, self.poll_interval))
+            while True:
+                msg = self._channels.get(COORDINATOR_CHANNEL, 0)
+                if msg is None:
+                    break
+                self._handle_message(simgr, stash, msg)
+
+            self._steal()
+
+            if self.checkpoint is not None and time.time() - self._last_checkpoint >= self.checkpoint_interval:
+                self.save_checkpoint(simgr, self.checkpoint)
+
+            # results that only went to other stashes are not a reason to return: SimulationManager.run() stops as
+            # soon as the stash is empty, which would lose the batches that are still in flight
+            if simgr.stashes[stash] or not self._batches:
+                break
+
+        if not self._batches and not simgr.stashes[stash]:
+            if self.checkpoint is not None:
+                self.save_checkpoint(simgr, self.checkpoint)
+            self.shutdown()
+
+        return simgr
+
+    def _idle_workers(self):
+        return [ w for w in self._workers.values() if w.batch_id is None ]
+
+    def _dispatch(self, simgr, stash):
+        for worker in self._idle_workers():
+            states = simgr.stashes[stash]
+            if not states:
+                break
+            batch, simgr.stashes[stash] = states[:self.batch_size], states[self.batch_size:]
+
+            batch_id = self._next_batch_id
+            self._next_batch_id += 1
+            blobs = [ _dumps(self.project, s) for s in batch ]
+            self._batches[batch_id] = (worker.worker_id, blobs)
+            worker.batch_id = batch_id
+            worker.active = len(blobs)
+            worker.stealing = False
+            worker.last_seen = time.time()
+            self._channels.put('worker-' + worker.worker_id, ('batch', batch_id, blobs, self.steps_per_batch))
+
+    def _handle_message(self, simgr, stash, msg):
+        """
+        Handle a message from a worker.
+
+        :return:    True if the message carries results, False otherwise.
+        """
+
+        if msg is None:
+            return False
+
+        kind, worker_id = msg[0], msg[1]
+        worker = self._workers.get(worker_id, None)
+        if worker is None:
+            if kind not in ('hello', 'heartbeat'):
+                l.warning("Ignored a %s message from unknown worker %s.", kind, worker_id)
+                return False
+            l.info("Worker %s joined.", worker_id)
+            worker = self._workers[worker_id] = _WorkerInfo(worker_id)
+        worker.last_seen = time.time()
+
+        if kind == 'heartbeat':
+            worker.active = msg[2]
+            return False
+        if kind != 'done':
+            return False
+
+        _, _, batch_id, stashes, errored = msg
+        if self._batches.pop(batch_id, None) is None:
+            # the batch has been given to another worker, since this worker was considered dead
+            return False
+        if worker.stealing:
+            self.batches_stolen += 1
+        worker.batch_id = None
+        worker.active = 0
+        worker.stealing = False
+        self.batches_done += 1
+
+        for name, blobs in stashes.items():
+            states = [ _loads(self.project, b) for b in blobs ]
+            simgr.populate(stash if name == 'active' else name, states)
+        for blob, error in errored:
+            simgr.errored.append(ErrorRecord(_loads(self.project, blob), error, None))
+        return True
+
+    def _steal(self):
+        idle = len(self._idle_workers())
+        if not idle:
+            return
+        busy = sorted((w for w in self._workers.values() if w.batch_id is not None and not w.stealing and w.active > 1),
+                      key=lambda w: w.active, reverse=True)
+        for victim in busy[:idle]:
+            victim.stealing = True
+            self._channels.put('worker-' + victim.worker_id, ('steal', ))
+
+    def _reap_workers(self, simgr, stash):
+        now = time.time()
+        for worker_id, worker in list(self._workers.items()):
+            if worker.process is not None:
+                dead = not worker.process.is_alive()
+            else:
+                dead = worker.batch_id is not None and now - worker.last_seen > self.heartbeat_timeout
+            if not dead:
+                continue
+
+            l.warning("Worker %s is dead.", worker_id)
+            del self._workers[worker_id]
+            if worker.batch_id is not None:
+                _, blobs = self._batches.pop(worker.batch_id)
+                simgr.populate(stash, [ _loads(self.project, b) for b in blobs ])
+                self.batches_retried += 1
+
+    #
+    # Checkpointing
+    #
+
+    def save_checkpoint(self, simgr, path):
+        """
+        Save all stashes, errored states, and states that are being explored by workers to a file.
+
+        :param simgr:       The simulation manager.
+        :param str path:    Path of the checkpoint file.
+        :return:            None
+        """
+
+        stashes = { name: [ _dumps(self.project, s) for s in states ] for name, states in simgr.stashes.items() }
+        # states in unfinished batches go back to the stepped stash when the checkpoint is restored
+        in_flight = [ blob for _, blobs in self._batches.values() for blob in blobs ]
+        errored = [ (_dumps(self.project, r.state), _dump_error(r.error)) for r in simgr.errored ]
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({'stashes': stashes, 'in_flight': in_flight, 'errored': errored}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._last_checkpoint = time.time()
+
+    def restore_checkpoint(self, simgr, path, stash='active'):
+        """
+        Replace all stashes and errored states of a simulation manager with the ones in a checkpoint file.
+
+        :param simgr:       The simulation manager.
+        :param str path:    Path of the checkpoint file.
+        :param str stash:   The stash to put states that were being explored by workers in.
+        :return:            None
+        """
+
+        with open(path, "rb") as f:
+            checkpoint = pickle.load(f)
+
+        for states in simgr.stashes.values():
+            del states[:]
+        for name, blobs in checkpoint['stashes'].items():
+            simgr.populate(name, [ _loads(self.project, b) for b in blobs ])
+        simgr.populate(stash, [ _loads(self.project, b) for b in checkpoint['in_flight'] ])
+        del simgr.errored[:]
+        for blob, error in checkpoint['errored']:
+            simgr.errored.append(ErrorRecord(_loads(self.project, blob), error, None))
+
+
+from ..sim_manager import ErrorRecord
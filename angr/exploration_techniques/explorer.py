@@ -17,18 +17,23 @@ class Explorer(ExplorationTechnique):
 
     If an angr CFG is passed in as the "cfg" parameter and "find" is either a number or a list or a set, then
     any paths which cannot possibly reach a success state without going through a failure state will be
-    preemptively avoided.
+    preemptively moved into "prune_stash". Reachability is precomputed once from the CFG (and the callgraph, for
+    states that are not at the beginning of a known block), and the return addresses on the callstack of each state
+    are taken into account, so that states in callees that return to a useful caller are kept.
 
     If either the "find" or "avoid" parameter is a function returning a boolean, and a path triggers both conditions, it will be added to the find stash, unless "avoid_priority" is set to True.
     """
-    def __init__(self, find=None, avoid=None, find_stash='found', avoid_stash='avoid', cfg=None, num_find=1, avoid_priority=False):
+    def __init__(self, find=None, avoid=None, find_stash='found', avoid_stash='avoid', cfg=None, num_find=1, avoid_priority=False,
+                 prune_stash='pruned'):
         super(Explorer, self).__init__()
         self.find, static_find = condition_to_lambda(find)
         self.avoid, static_avoid = condition_to_lambda(avoid)
         self.find_stash = find_stash
         self.avoid_stash = avoid_stash
         self.cfg = cfg
-        self.ok_blocks = set()
+        self.ok_blocks = frozenset()
+        self.ok_functions = frozenset()
+        self.prune_stash = prune_stash
         self.num_find = num_find
         self.avoid_priority = avoid_priority
 
@@ -37,13 +42,6 @@ class Explorer(ExplorationTechnique):
         self._unknown_stop_points = static_find is None or static_avoid is None
         self._warned_unicorn = False
 
-        # TODO: This is a hack for while CFGFast doesn't handle procedure continuations
-        from .. import analyses
-        if isinstance(cfg, analyses.CFGFast):
-            l.error("CFGFast is currently inappropriate for use with Explorer.")
-            l.error("Usage of the CFG has been disabled for this explorer.")
-            self.cfg = None
-
         if self.cfg is not None:
             avoid = static_avoid or set()
 
@@ -58,25 +56,7 @@ class Explorer(ExplorationTechnique):
                 if cfg.get_any_node(a) is None:
                     l.warning("'Avoid' address %#x not present in CFG...", a)
 
-            # not a queue but a stack... it's just a worklist!
-            queue = []
-            for f in static_find:
-                nodes = cfg.get_all_nodes(f)
-                if len(nodes) == 0:
-                    l.warning("'Find' address %#x not present in CFG...", f)
-                else:
-                    queue.extend(nodes)
-
-            seen_nodes = set()
-            while len(queue) > 0:
-                n = queue.pop()
-                if id(n) in seen_nodes:
-                    continue
-                if n.addr in avoid:
-                    continue
-                self.ok_blocks.add(n.addr)
-                seen_nodes.add(id(n))
-                queue.extend(n.predecessors)
+            self.ok_blocks, self.ok_functions = self._build_reachability_index(cfg, static_find, avoid)
 
             if len(self.ok_blocks) == 0:
                 l.error("No addresses could be validated by the provided CFG!")
@@ -87,9 +67,83 @@ class Explorer(ExplorationTechnique):
             l.warning("Please be sure that the CFG you have passed in is complete.")
             l.warning("Providing an incomplete CFG can cause viable paths to be discarded!")
 
+    @staticmethod
+    def _build_reachability_index(cfg, find, avoid):
+        """
+        Compute the addresses of all blocks that may reach any of the find addresses without going through an avoid
+        address, and the addresses of all functions that may (transitively) call a function where such blocks are.
+
+        :param cfg:         The CFG.
+        :param set find:    The find addresses.
+        :param set avoid:   The avoid addresses.
+        :return:            A tuple of two frozensets: block addresses and function addresses.
+        """
+
+        # not a queue but a stack... it's just a worklist!
+        queue = []
+        for f in find:
+            nodes = cfg.get_all_nodes(f)
+            if len(nodes) == 0:
+                l.warning("'Find' address %#x not present in CFG...", f)
+            else:
+                queue.extend(nodes)
+
+        ok_blocks = set()
+        ok_functions = set()
+        seen_nodes = set()
+        while len(queue) > 0:
+            n = queue.pop()
+            if id(n) in seen_nodes:
+                continue
+            if n.addr in avoid:
+                continue
+            ok_blocks.add(n.addr)
+            if n.function_address is not None:
+                ok_functions.add(n.function_address)
+            seen_nodes.add(id(n))
+            queue.extend(n.predecessors)
+
+        # the block graph does not necessarily contain all call edges, e.g., for calls that are resolved later
+        callgraph = cfg.kb.functions.callgraph
+        queue = [ f for f in ok_functions if f in callgraph ]
+        while queue:
+            f = queue.pop()
+            for caller in callgraph.predecessors(f):
+                if caller not in ok_functions:
+                    ok_functions.add(caller)
+                    queue.append(caller)
+
+        return frozenset(ok_blocks), frozenset(ok_functions)
+
+    def _is_reachable(self, state):
+        """
+        Check if a state may reach any of the find addresses, according to the CFG.
+        """
+
+        if state.addr in self.ok_blocks:
+            return True
+
+        # the state may return to a block that reaches a find address. return edges are not always in the CFG
+        for frame in state.callstack:
+            if frame.ret_addr in self.ok_blocks:
+                return True
+
+        node = self.cfg.get_any_node(state.addr)
+        if node is not None:
+            # a known block that cannot reach any find address. the successors of SimProcedures are not always in the
+            # CFG though (e.g., __libc_start_main calls main)
+            return node.is_simprocedure
+
+        # the state is not at the beginning of a known block. fall back to the function that it is in
+        func_addr = state.callstack.func_addr
+        if func_addr in self.cfg.kb.functions and func_addr not in self.ok_functions:
+            return False
+        return True
+
     def setup(self, simgr):
         if not self.find_stash in simgr.stashes: simgr.stashes[self.find_stash] = []
         if not self.avoid_stash in simgr.stashes: simgr.stashes[self.avoid_stash] = []
+        if not self.prune_stash in simgr.stashes: simgr.stashes[self.prune_stash] = []
 
     def step(self, simgr, stash='active', **kwargs):
         base_extra_stop_points = set(kwargs.pop("extra_stop_points", []))
@@ -125,9 +179,8 @@ class Explorer(ExplorationTechnique):
         avoidable = self.avoid(state)
 
         if not findable and not avoidable:
-            if self.cfg is not None and self.cfg.get_any_node(state.addr) is not None:
-                if state.addr not in self.ok_blocks:
-                    return self.avoid_stash
+            if self.cfg is not None and not self._is_reachable(state):
+                return self.prune_stash
             return None
 
         stash = self._classify(state.addr, findable, avoidable)
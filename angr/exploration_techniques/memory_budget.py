@@ -0,0 +1,187 @@
+import heapq
+import logging
+import itertools
+
+from . import ExplorationTechnique
+from .. import vaults
+from ..errors import AngrVaultError
+
+l = logging.getLogger(name=__name__)
+
+
+class MemoryBudget(ExplorationTechnique):
+    """
+    Keep the approximate memory footprint of the states in the configured stashes of a simulation manager under a
+    budget. States in other stashes are not counted, since they cannot be evicted.
+
+    The footprint of a state is estimated from the number of memory and register pages it owns (i.e., pages that are
+    no longer shared with its parent), the length of its history, and the number of its constraints. When the total
+    footprint exceeds the budget after a step, the lowest-priority states in the configured stashes are evicted to a
+    vault on disk until the footprint drops below the low watermark. Evicted states are paged back in, highest priority
+    first, whenever there is room in the budget or a configured stash runs dry, and are deleted from the vault once
+    they are reloaded.
+    """
+
+    def __init__(self, budget, stashes=('active',), priority_key=None, vault=None, low_watermark=0.8,
+                 page_cost=8192, history_cost=256, constraint_cost=512, state_cost=16384):
+        """
+        :param int budget:          The memory budget, in bytes.
+        :param stashes:             Names of stashes that states may be evicted from.
+        :param priority_key:        A function that takes a state and returns its priority. States with larger values
+                                    are evicted first. By default, shallower states are evicted first.
+        :param vault:               An angr.vaults.Vault object to store evicted states. By default, an
+                                    angr.vaults.VaultDir in a temporary directory is used while any states are
+                                    evicted.
+        :param float low_watermark: After evicting states, the footprint is brought down to low_watermark * budget so
+                                    that states are not evicted again right away.
+        :param int page_cost:       Estimated cost of each owned memory or register page, in bytes.
+        :param int history_cost:    Estimated cost of each history entry, in bytes.
+        :param int constraint_cost: Estimated cost of each constraint, in bytes.
+        :param int state_cost:      Estimated fixed cost of each state, in bytes.
+        """
+
+        super(MemoryBudget, self).__init__()
+
+        if budget <= 0:
+            raise ValueError("The memory budget must be a positive number.")
+
+        self.budget = budget
+        self.stashes = (stashes, ) if isinstance(stashes, str) else tuple(stashes)
+        self.priority_key = priority_key if priority_key is not None else self.state_priority
+        self.low_watermark = low_watermark
+
+        self.page_cost = page_cost
+        self.history_cost = history_cost
+        self.constraint_cost = constraint_cost
+        self.state_cost = state_cost
+
+        self._vault = vault
+        self._own_vault = vault is None
+        # a heap of (priority, counter, stash name, vault ID, footprint) for all evicted states
+        self._evicted = [ ]
+        self._counter = itertools.count()
+
+        self.evicted_count = 0
+        self.reloaded_count = 0
+
+    @property
+    def evicted(self):
+        """
+        The number of states that are currently evicted.
+        """
+        return len(self._evicted)
+
+    #
+    # Footprint estimation
+    #
+
+    @staticmethod
+    def _owned_pages(state, plugin_name):
+        if not state.has_plugin(plugin_name):
+            return 0
+        mem = getattr(state.plugins[plugin_name], 'mem', None)
+        cowed = getattr(mem, '_cowed', None)
+        return len(cowed) if cowed is not None else 0
+
+    def footprint(self, state):
+        """
+        Estimate the memory footprint of a state.
+
+        :param state:   The state.
+        :return:        The estimated footprint, in bytes.
+        :rtype:         int
+        """
+
+        pages = self._owned_pages(state, 'memory') + self._owned_pages(state, 'registers')
+        return self.state_cost + \
+            pages * self.page_cost + \
+            state.history.depth * self.history_cost + \
+            len(state.solver.constraints) * self.constraint_cost
+
+    def total_footprint(self, simgr):
+        return sum(self.footprint(s) for stash in self.stashes for s in simgr.stashes.get(stash, [ ]))
+
+    @staticmethod
+    def state_priority(state):
+        return -state.history.depth
+
+    #
+    # Eviction and reloading
+    #
+
+    def _evict(self, simgr, to_free):
+        candidates = [ ]
+        for stash in self.stashes:
+            states = simgr.stashes.get(stash, [ ])
+            # always keep the highest-priority state in each stash so exploration can continue
+            by_priority = sorted(states, key=self.priority_key)
+            candidates.extend((self.priority_key(s), stash, s) for s in by_priority[1:])
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        freed = 0
+        to_evict = [ ]
+        for priority, stash, state in candidates:
+            if freed >= to_free:
+                break
+            footprint = self.footprint(state)
+            to_evict.append((priority, stash, state, footprint))
+            freed += footprint
+
+        if self._vault is None:
+            self._vault = vaults.VaultDir()
+
+        evicted_ids = set()
+        for priority, stash, state, footprint in to_evict:
+            vault_id = self._vault.store(state)
+            heapq.heappush(self._evicted, (priority, next(self._counter), stash, vault_id, footprint))
+            evicted_ids.add(id(state))
+
+        for stash in self.stashes:
+            if stash in simgr.stashes:
+                simgr.stashes[stash] = [ s for s in simgr.stashes[stash] if id(s) not in evicted_ids ]
+
+        self.evicted_count += len(to_evict)
+        l.debug("Evicted %d states (about %d bytes).", len(to_evict), freed)
+        return freed
+
+    def _reload(self, simgr, available):
+        reloaded = 0
+        while self._evicted:
+            priority, _, stash, vault_id, footprint = self._evicted[0]
+            stash_is_empty = not simgr.stashes.get(stash, None)
+            if footprint > available and not stash_is_empty:
+                break
+
+            heapq.heappop(self._evicted)
+            state = self._vault.load(vault_id)
+            try:
+                del self._vault[vault_id]
+            except AngrVaultError:
+                # not all vaults support deletion
+                pass
+            simgr.stashes.setdefault(stash, [ ]).append(state)
+            available -= footprint
+            reloaded += 1
+
+        if not self._evicted and self._own_vault and self._vault is not None:
+            # remove the temporary directory until states are evicted again
+            self._vault.close()
+            self._vault = None
+
+        self.reloaded_count += reloaded
+        if reloaded:
+            l.debug("Reloaded %d states.", reloaded)
+
+    def step(self, simgr, stash='active', **kwargs):
+        simgr = simgr.step(stash=stash, **kwargs)
+
+        total = self.total_footprint(simgr)
+        target = int(self.budget * self.low_watermark)
+        if total > self.budget:
+            l.debug("Estimated footprint %d exceeds the memory budget %d.", total, self.budget)
+            total -= self._evict(simgr, total - target)
+        if self._evicted:
+            self._reload(simgr, target - total)
+
+        return simgr
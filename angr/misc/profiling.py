@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import threading
+import contextlib
+from collections import defaultdict
+
+
+class PhaseStats:
+    """
+    Aggregated statistics of a phase (or a job).
+    """
+
+    __slots__ = ('count', 'total_time', 'max_time', )
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+    def to_dict(self):
+        return {'count': self.count, 'time': self.total_time, 'max_time': self.max_time}
+
+    def __repr__(self):
+        return "<PhaseStats %d calls, %f sec>" % (self.count, self.total_time)
+
+
+class AnalysisProfiler:
+    """
+    Records time spent in each phase of analyses, per job and per analysis.
+
+    A profiler does nothing unless it is activated by start_profiling() or profiling(). When it is active, all analyses
+    that are created record their total running time, and ForwardAnalysis-based analyses record the time and the
+    number of calls of each phase (_pre_analysis, _get_successors, _handle_successor, _merge_states, etc.), as well as
+    the time spent on each job. Results can be exported as a structured report or as a Chrome trace file (which can be
+    loaded in chrome://tracing or Perfetto).
+    """
+
+    def __init__(self, trace=False, max_trace_events=1000000):
+        """
+        :param bool trace:              Record an event for every single phase call, which is required to export a
+                                        Chrome trace file.
+        :param int max_trace_events:    The maximum number of trace events to keep.
+        """
+
+        self.trace = trace
+        self.max_trace_events = max_trace_events
+
+        # analysis name -> PhaseStats
+        self.analyses = defaultdict(PhaseStats)
+        # analysis name -> phase name -> PhaseStats
+        self.phases = defaultdict(lambda: defaultdict(PhaseStats))
+        # analysis name -> job key -> PhaseStats
+        self.jobs = defaultdict(lambda: defaultdict(PhaseStats))
+
+        self.trace_events = [ ]
+        self._epoch = time.perf_counter()
+
+    def clear(self):
+        self.analyses.clear()
+        self.phases.clear()
+        self.jobs.clear()
+        self.trace_events.clear()
+        self._epoch = time.perf_counter()
+
+    #
+    # Recording
+    #
+
+    def record(self, analysis, phase, start, end, job_key=None):
+        """
+        Record a finished phase.
+
+        :param str analysis:    Name of the analysis.
+        :param str phase:       Name of the phase.
+        :param float start:     Start time (from time.perf_counter()).
+        :param float end:       End time (from time.perf_counter()).
+        :param job_key:         Key of the job that this phase processes, or None if it is not specific to a job.
+        :return:                None
+        """
+
+        elapsed = end - start
+        self.phases[analysis][phase].add(elapsed)
+        if job_key is not None:
+            self.jobs[analysis][job_key].add(elapsed)
+        if self.trace:
+            self._add_trace_event(analysis, phase, start, elapsed, job_key)
+
+    def record_analysis(self, analysis, start, end):
+        """
+        Record a finished analysis.
+
+        :param str analysis:    Name of the analysis.
+        :param float start:     Start time (from time.perf_counter()).
+        :param float end:       End time (from time.perf_counter()).
+        :return:                None
+        """
+
+        self.analyses[analysis].add(end - start)
+        if self.trace:
+            self._add_trace_event(analysis, analysis, start, end - start, None)
+
+    @contextlib.contextmanager
+    def phase(self, analysis, phase, job_key=None):
+        """
+        Record the time spent in the body of the with-statement as a phase of an analysis.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(analysis, phase, start, time.perf_counter(), job_key=job_key)
+
+    def _add_trace_event(self, analysis, phase, start, elapsed, job_key):
+        if len(self.trace_events) >= self.max_trace_events:
+            return
+        event = {
+            'name': phase,
+            'cat': analysis,
+            'ph': 'X',
+            'ts': (start - self._epoch) * 1000000.0,
+            'dur': elapsed * 1000000.0,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        }
+        if job_key is not None:
+            event['args'] = {'job': self._format_job_key(job_key)}
+        self.trace_events.append(event)
+
+    #
+    # Instrumentation
+    #
+
+    @contextlib.contextmanager
+    def instrument(self, obj, phases, job_phases=(), job_key=None):
+        """
+        Temporarily replace methods of an object with wrappers that record the time spent in each of them. Methods are
+        replaced on the instance only, and are restored when the with-statement exits.
+
+        :param obj:                 The object (usually an analysis) to instrument.
+        :param iterable phases:     Names of methods to instrument.
+        :param iterable job_phases: Names of methods whose first argument is a job (or a node). Time spent in these
+                                    methods is also attributed to the job.
+        :param func job_key:        A function that takes a job and returns a hashable key of the job.
+        :return:                    None
+        """
+
+        analysis = getattr(obj, '_name', None) or type(obj).__name__
+        instrumented = [ ]
+        for name in phases:
+            method = getattr(obj, name, None)
+            if method is None or name in obj.__dict__:
+                continue
+            if name in job_phases:
+                wrapper = self._make_job_wrapper(analysis, name, method, job_key)
+            else:
+                wrapper = self._make_wrapper(analysis, name, method)
+            setattr(obj, name, wrapper)
+            instrumented.append(name)
+
+        try:
+            yield
+        finally:
+            for name in instrumented:
+                delattr(obj, name)
+
+    def _make_wrapper(self, analysis, phase, method):
+        record = self.record
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(analysis, phase, start, perf_counter())
+
+        return wrapper
+
+    def _make_job_wrapper(self, analysis, phase, method, job_key):
+        record = self.record
+        perf_counter = time.perf_counter
+
+        def wrapper(job, *args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(job, *args, **kwargs)
+            finally:
+                end = perf_counter()
+                try:
+                    key = job_key(job) if job_key is not None else job
+                    hash(key)
+                except Exception:  # pylint:disable=broad-except
+                    key = None
+                record(analysis, phase, start, end, job_key=key)
+
+        return wrapper
+
+    #
+    # Exporting
+    #
+
+    @staticmethod
+    def _format_job_key(job_key):
+        if isinstance(job_key, int):
+            return "%#x" % job_key
+        return str(job_key)
+
+    def report(self, top_jobs=20):
+        """
+        Generate a structured report.
+
+        :param int top_jobs:    Number of the most time-consuming jobs to include for each analysis. All jobs are
+                                included if it is None.
+        :return:                A dict that maps analysis names to their statistics.
+        :rtype:                 dict
+        """
+
+        r = { }
+        for analysis in set(self.analyses) | set(self.phases):
+            jobs = sorted(self.jobs[analysis].items(), key=lambda kv: kv[1].total_time, reverse=True) \
+                if analysis in self.jobs else [ ]
+            if top_jobs is not None:
+                jobs = jobs[:top_jobs]
+            r[analysis] = {
+                'runs': self.analyses[analysis].to_dict() if analysis in self.analyses else None,
+                'phases': { phase: stats.to_dict() for phase, stats in self.phases[analysis].items() }
+                    if analysis in self.phases else { },
+                'jobs': [ dict(job=self._format_job_key(k), **v.to_dict()) for k, v in jobs ],
+            }
+        return r
+
+    def format_report(self, top_jobs=10):
+        """
+        Generate a human-readable report.
+
+        :param int top_jobs:    Number of the most time-consuming jobs to show for each analysis.
+        :return:                The report.
+        :rtype:                 str
+        """
+
+        lines = [ ]
+        for analysis, r in sorted(self.report(top_jobs=top_jobs).items()):
+            if r['runs'] is not None:
+                lines.append("%s: %d runs, %.6f sec" % (analysis, r['runs']['count'], r['runs']['time']))
+            else:
+                lines.append("%s:" % analysis)
+            for phase, stats in sorted(r['phases'].items(), key=lambda kv: kv[1]['time'], reverse=True):
+                lines.append("    %-32s %10d calls %14.6f sec (max %.6f)" % (phase, stats['count'], stats['time'],
+                                                                           stats['max_time']))
+            if r['jobs']:
+                lines.append("    top jobs:")
+                for job in r['jobs']:
+                    lines.append("        %-28s %10d calls %14.6f sec" % (job['job'], job['count'], job['time']))
+        return "\n".join(lines)
+
+    def dump_report(self, path, top_jobs=None):
+        """
+        Save the structured report as a JSON file.
+        """
+
+        with open(path, 'w') as f:
+            json.dump(self.report(top_jobs=top_jobs), f, indent=2, sort_keys=True)
+
+    def dump_chrome_trace(self, path):
+        """
+        Save all trace events as a Chrome trace file. Only available if the profiler is created with trace=True.
+        """
+
+        if not self.trace:
+            raise ValueError("Trace events are not recorded. Create the profiler with trace=True.")
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events, 'displayTimeUnit': 'ms'}, f)
+
+
+_profiler = None
+
+
+def get_profiler():
+    """
+    Get the active profiler.
+
+    :return:    The active AnalysisProfiler, or None if profiling is disabled.
+    """
+    return _profiler
+
+
+def start_profiling(profiler=None, trace=False):
+    """
+    Activate a profiler. Analyses that start after this call are profiled.
+
+    :param AnalysisProfiler profiler:   The profiler to activate. A new one is created if it is None.
+    :param bool trace:                  Whether the new profiler records trace events or not.
+    :return:                            The active profiler.
+    :rtype:                             AnalysisProfiler
+    """
+
+    global _profiler  # pylint:disable=global-statement
+    _profiler = profiler if profiler is not None else AnalysisProfiler(trace=trace)
+    return _profiler
+
+
+def stop_profiling():
+    """
+    Deactivate the active profiler.
+
+    :return:    The profiler that was active, or None.
+    :rtype:     AnalysisProfiler or None
+    """
+
+    global _profiler  # pylint:disable=global-statement
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+@contextlib.contextmanager
+def profiling(profiler=None, trace=False):
+    """
+    Profile all analyses that run inside the with-statement.
+
+        with angr.misc.profiling.profiling(trace=True) as profiler:
+            proj.analyses.CFGFast()
+        print(profiler.format_report())
+        profiler.dump_chrome_trace("cfgfast.json")
+    """
+
+    previous = _profiler
+    profiler = start_profiling(profiler=profiler, trace=trace)
+    try:
+        yield profiler
+    finally:
+        if previous is None:
+            stop_profiling()
+        else:
+            start_profiling(profiler=previous)
@@ -29,7 +29,11 @@ class memcpy(angr.SimProcedure):
 
         l.debug("Memcpy running with conditional_size %#x", conditional_size)
 
-        if conditional_size > 0:
+        if conditional_size > 0 and not self.state.solver.symbolic(limit) and \
+                ABSTRACT_MEMORY not in self.state.options:
+            # concrete copies can move memory objects instead of loading and storing a large AST
+            self.state.memory.copy_contents(dst_addr, src_addr, conditional_size)
+        elif conditional_size > 0:
             src_mem = self.state.memory.load(src_addr, conditional_size, endness='Iend_BE')
             if ABSTRACT_MEMORY in self.state.options:
                 self.state.memory.store(dst_addr, src_mem, size=conditional_size, endness='Iend_BE')
@@ -44,6 +44,9 @@ class SimulationManager:
     :param completion_mode: A function describing how multiple exploration techniques with the ``complete``
                             hook set will interact. By default, the builtin function ``any``.
     :param techniques:      A list of techniques that should be pre-set to use with this manager.
+    :param memory_budget:   An approximate limit, in bytes, on the memory used by all states. When it is exceeded,
+                            the lowest-priority active states are evicted to disk and paged back in later. See
+                            ``angr.exploration_techniques.MemoryBudget`` for finer control.
 
     :ivar errored:          Not a stash, but a list of ErrorRecords. Whenever a step raises an exception that we catch,
                             the state and some information about the error are placed in this list. You can adjust the
@@ -68,6 +71,7 @@ class SimulationManager:
             errored=None,
             completion_mode=any,
             techniques=None,
+            memory_budget=None,
             **kwargs):
         super(SimulationManager, self).__init__()
 
@@ -121,6 +125,9 @@ class SimulationManager:
             for t in techniques:
                 self.use_technique(t)
 
+        if memory_budget is not None:
+            self.use_technique(MemoryBudget(memory_budget))
+
     def __repr__(self):
         stashes_repr = ', '.join(("%d %s" % (len(v), k)) for k, v in self._stashes.items() if len(v) != 0)
         return "<SimulationManager with %s%s>" % (stashes_repr if stashes_repr else 'all stashes empty', ' (%d errored)' % len(self.errored) if self.errored else '')
@@ -605,8 +612,8 @@ class SimulationManager:
     @staticmethod
     def _merge_key(state):
         return (state.addr if not state.regs._ip.symbolic else 'SYMBOLIC',
-                [x.func_addr for x in state.callstack],
-                set(state.posix.fd) if state.has_plugin('posix') else None)
+                tuple(x.func_addr for x in state.callstack),
+                frozenset(state.posix.fd) if state.has_plugin('posix') else None)
 
     def merge(self, merge_func=None, merge_key=None, stash='active'):
         """
@@ -617,7 +624,8 @@ class SimulationManager:
                             the states as the argument. Should return the merged state.
         :param merge_key:   If provided, should be a function that takes a state and returns a key that will compare
                             equal for all states that are allowed to be merged together, as a first aproximation.
-                            By default: uses PC, callstack, and open file descriptors.
+                            By default: uses PC, callstack, and open file descriptors. States are bucketed in a dict
+                            if the keys are hashable, and compared pairwise otherwise.
 
         :returns:           The simulation manager, for chaining.
         :rtype:             SimulationManager
@@ -627,10 +635,24 @@ class SimulationManager:
         not_to_merge = []
         if merge_key is None: merge_key = self._merge_key
 
+        # index the states by their merge keys
+        buckets = { }
+        unhashable = [ ]
+        for s in to_merge:
+            key = merge_key(s)
+            try:
+                buckets.setdefault(key, [ ]).append(s)
+            except TypeError:
+                unhashable.append((key, s))
+
+        groups = list(buckets.values())
+        while unhashable:
+            base_key = unhashable[0][0]
+            g, unhashable = self._filter_states(lambda ks: base_key == ks[0], unhashable)
+            groups.append([ s for _, s in g ])
+
         merge_groups = [ ]
-        while to_merge:
-            base_key = merge_key(to_merge[0])
-            g, to_merge = self._filter_states(lambda s: base_key == merge_key(s), to_merge)
+        for g in groups:
             if len(g) <= 1:
                 not_to_merge.extend(g)
             else:
@@ -686,19 +708,24 @@ class SimulationManager:
         """
         Merges a list of states.
 
+        States are merged bottom-up: the states that share the deepest common ancestor are merged first, and the merged
+        state then takes part in merging at the ancestor's level. This keeps the merge conditions short.
+
         :param states:      the states to merge
         :returns SimState:  the resulting state
         """
 
         if self._hierarchy:
-            optimal, common_history, others = self._hierarchy.most_mergeable(states)
+            merges, remaining = self._hierarchy.merge_order(states)
         else:
-            optimal, common_history, others = states, None, []
+            merges, remaining = [ ], list(range(len(states)))
 
-        if len(optimal) >= 2:
+        states = list(states)
+        for common_history, indices in merges:
             # We found optimal states (states that share a common ancestor) to merge.
             # Compute constraints for each state starting from the common ancestor,
             # and use them as merge conditions.
+            optimal = [ states[i] for i in indices ]
             constraints = [s.history.constraints_since(common_history) for s in optimal]
 
             o = optimal[0]
@@ -706,25 +733,24 @@ class SimulationManager:
                               merge_conditions=constraints,
                               common_ancestor=common_history.strongref_state
                               )
+            self._hierarchy.add_state(m)
+            states.append(m)
 
-        else:
-            l.warning(
-                "Cannot find states with common history line to merge. Fall back to the naive merging strategy "
-                "and merge all states."
-                )
-            s = states[0]
-            m, _, _ = s.merge(*states[1:])
+        remaining = [ states[i] for i in remaining ]
+        if len(remaining) == 1:
+            return remaining[0]
 
-            others = []
+        l.warning(
+            "Cannot find states with common history line to merge. Fall back to the naive merging strategy "
+            "and merge all states."
+            )
+        s = remaining[0]
+        m, _, _ = s.merge(*remaining[1:])
 
         if self._hierarchy:
             self._hierarchy.add_state(m)
 
-        if len(others):
-            others.append(m)
-            return self._merge_states(others)
-        else:
-            return m
+        return m
 
     #
     #   ...
@@ -808,4 +834,4 @@ from .errors import SimError, SimMergeError
 from .sim_state import SimState
 from .state_hierarchy import StateHierarchy
 from .errors import AngrError, SimUnsatError, SimulationManagerError
-from .exploration_techniques import ExplorationTechnique, Veritesting, Threading, Explorer
+from .exploration_techniques import ExplorationTechnique, Veritesting, Threading, Explorer, MemoryBudget
@@ -88,6 +88,12 @@ SYMBOLIC_WRITE_ADDRESSES = "SYMBOLIC_WRITE_ADDRESSES"
 CONSERVATIVE_WRITE_STRATEGY = "CONSERVATIVE_WRITE_STRATEGY"
 CONSERVATIVE_READ_STRATEGY = "CONSERVATIVE_READ_STRATEGY"
 
+# This causes writes to symbolic addresses to be recorded in a log on top of the paged memory, like the stores of an
+# array in the theory of arrays, instead of being concretized and expanded into If-expressions at every possible target.
+# Reads of the bytes that the writes may target select from the log. Writes whose targets span more than
+# state.options.symbolic_write_log_max_range bytes are handled the usual way.
+SYMBOLIC_WRITE_LOG = "SYMBOLIC_WRITE_LOG"
+
 # This enables dependency tracking for all Claripy ASTs.
 AST_DEPS = "AST_DEPS"
 
@@ -107,6 +113,11 @@ TRACK_OP_ACTIONS = "TRACK_OP_ACTIONS"
 # track the history of actions through a path (multiple states). This action affects things on the angr level
 TRACK_ACTION_HISTORY = "TRACK_ACTION_HISTORY"
 
+# record the register, memory, and exit actions tracked by the VEX engine into a columnar log on the history
+# (state.history.recent_action_log) instead of creating SimAction objects. Actions recorded this way carry no AST
+# dependencies.
+COLUMNAR_ACTIONS = "COLUMNAR_ACTIONS"
+
 # track memory mapping and permissions
 TRACK_MEMORY_MAPPING = "TRACK_MEMORY_MAPPING"
 
@@ -142,6 +153,11 @@ ABSTRACT_SOLVER = "ABSTRACT_SOLVER"
 # this stops SimRun for checking the satisfiability of successor states
 LAZY_SOLVES = "LAZY_SOLVES"
 
+# this makes the VEX engine record conditional exits that are only followed by an update of the instruction pointer as
+# lightweight descriptors. their guards are checked together at the end of the block, and states are only copied for
+# feasible exits
+LAZY_SUCCESSORS = "LAZY_SUCCESSORS"
+
 # This makes angr downsize solvers wherever reasonable.
 DOWNSIZE_Z3 = "DOWNSIZE_Z3"
 
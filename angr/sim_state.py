@@ -96,6 +96,8 @@ class SimState(PluginHub):
         self.options = options
         self.mode = mode
         self.supports_inspect = False
+        # a bitmask of event types that have breakpoints. see angr.state_plugins.inspect.event_type_bits
+        self._inspect_mask = 0
 
         # OS name
         self.os_name = os_name
@@ -432,10 +434,13 @@ class SimState(PluginHub):
             else:
                 constraints = args
 
-            self._inspect('constraints', BP_BEFORE, added_constraints=constraints)
-            constraints = self._inspect_getattr("added_constraints", constraints)
+            inspect = self._inspect_mask & event_type_bits['constraints']
+            if inspect:
+                self._inspect('constraints', BP_BEFORE, added_constraints=constraints)
+                constraints = self._inspect_getattr("added_constraints", constraints)
             added = self.solver.add(*constraints)
-            self._inspect('constraints', BP_AFTER)
+            if inspect:
+                self._inspect('constraints', BP_AFTER)
 
             # add actions for the added constraints
             if o.TRACK_CONSTRAINT_ACTIONS in self.options:
@@ -914,7 +919,7 @@ default_state_plugin_preset = PluginPreset()
 SimState.register_preset('default', default_state_plugin_preset)
 
 from .state_plugins.history import SimStateHistory
-from .state_plugins.inspect import BP_AFTER, BP_BEFORE
+from .state_plugins.inspect import BP_AFTER, BP_BEFORE, event_type_bits
 from .state_plugins.sim_action import SimActionConstraint
 
 from . import sim_options as o
@@ -1,3 +1,4 @@
+import heapq
 import logging
 import weakref
 import networkx
@@ -195,24 +196,100 @@ class StateHierarchy(object):
     # Smart merging support
     #
 
+    @staticmethod
+    def _lineage_frontier(states):
+        """
+        Set up walking the lineages of states upwards together, always advancing the deepest history first.
+
+        :param states: a list of states
+        :returns: a tuple of: (a dict mapping the id of each history on the frontier to the history and the indices of
+                  the states at or below it, a heap of (negative depth, history id) for the frontier)
+        """
+
+        frontier = { }
+        heap = [ ]
+        for i, s in enumerate(states):
+            h = s.history
+            entry = frontier.get(id(h), None)
+            if entry is None:
+                frontier[id(h)] = (h, [ i ])
+                heapq.heappush(heap, (-h.depth, id(h)))
+            else:
+                entry[1].append(i)
+        return frontier, heap
+
+    @staticmethod
+    def _advance_lineage(frontier, heap, history, indices):
+        """
+        Move state indices from a history that has been popped off the frontier to its parent.
+        """
+
+        parent = history.parent
+        entry = frontier.get(id(parent), None)
+        if entry is None:
+            entry = frontier[id(parent)] = (parent, [ ])
+            heapq.heappush(heap, (-parent.depth, id(parent)))
+        entry[1].extend(indices)
+
     def most_mergeable(self, states):
         """
-        Find the "most mergeable" set of states from those provided.
+        Find the "most mergeable" set of states from those provided, i.e., the states whose histories share the deepest
+        common ancestor. Merging these states first keeps the merge conditions (the constraints accumulated since the
+        common ancestor) as short as possible.
+
+        Lineages are walked upwards from all histories at the same time, always advancing the deepest one, so only the
+        histories between the states and their deepest common ancestor are visited. History depths are cached on the
+        histories themselves and are strictly increasing along parent links, even for merged histories.
 
         :param states: a list of states
         :returns: a tuple of: (a list of states to merge, those states' common history, a list of states to not merge yet)
         """
 
-        histories = set(self.get_ref(s.history) for s in states)
-
-        for n in networkx.algorithms.dfs_postorder_nodes(self._graph):
-            intersection = histories.intersection(self.all_successors(n))
-            if len(intersection) > 1:
+        frontier, heap = self._lineage_frontier(states)
+        while heap:
+            # all lineages that may run into this history have been walked when it is popped, so the first history
+            # that more than one state is at or below is the deepest common ancestor
+            _, key = heapq.heappop(heap)
+            h, indices = frontier.pop(key)
+            if len(indices) > 1:
+                merge_indices = set(indices)
                 return (
-                    [ s for s in states if self.get_ref(s.history) in intersection ],
-                    n(),
-                    [ s for s in states if self.get_ref(s.history) not in intersection ]
+                    [ s for i, s in enumerate(states) if i in merge_indices ],
+                    h,
+                    [ s for i, s in enumerate(states) if i not in merge_indices ]
                 )
+            if h.parent is not None:
+                self._advance_lineage(frontier, heap, h, indices)
 
-        # didn't find any?
         return set(), None, states
+
+    def merge_order(self, states):
+        """
+        Plan merging all states provided in a bottom-up order. This is equivalent to repeatedly calling
+        most_mergeable() and merging the states it returns, but walks the lineages of the states only once.
+
+        States and the results of merges are referred to by indices: indices below len(states) are the states
+        provided, and index len(states) + k is the state resulting from the k-th merge.
+
+        :param states: a list of states
+        :returns: a tuple of: (a list of (common history, indices of states to merge) in the order in which they
+                  should be merged, indices of states that are left after all merges)
+        """
+
+        frontier, heap = self._lineage_frontier(states)
+        merges = [ ]
+        remaining = [ ]
+        while heap:
+            # all lineages that may run into this history have been walked when it is popped
+            _, key = heapq.heappop(heap)
+            h, indices = frontier.pop(key)
+            if len(indices) > 1:
+                merges.append((h, sorted(indices)))
+                indices = [ len(states) + len(merges) - 1 ]
+
+            if h.parent is None:
+                remaining.extend(indices)
+            else:
+                self._advance_lineage(frontier, heap, h, indices)
+
+        return merges, remaining
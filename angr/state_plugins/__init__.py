@@ -10,6 +10,7 @@ from .keyvalue_memory import *
 from .javavm_memory import *
 from .fast_memory import *
 from .light_registers import *
+from .register_file import SimRegisterFile
 from .log import *
 from .history import *
 from .scratch import *
@@ -19,6 +20,7 @@ from .uc_manager import *
 from .unicorn_engine import Unicorn
 from .sim_action import *
 from .sim_action_object import *
+from .action_log import SimActionLog, SimActionRecord
 from .sim_event import *
 from .callstack import *
 from .globals import *
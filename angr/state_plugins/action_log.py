@@ -0,0 +1,215 @@
+import array
+
+import claripy
+
+from .sim_event import event_id_count
+
+_NO_ADDR = 0xffffffffffffffff
+_NO_STMT = -0x8000000000000000
+
+
+class SimActionRecord:
+    """
+    A lightweight view of one row of a SimActionLog. It exposes the same attributes that filters usually look at on
+    SimActionData and SimActionExit objects.
+    """
+
+    __slots__ = ('id', 'type', 'action', 'exit_type', 'bbl_addr', 'ins_addr', 'stmt_idx', 'sim_procedure', 'addr',
+                 'offset', 'size', 'data', 'condition', )
+
+    def __init__(self, log, row):
+        kind = log.kinds[row]
+        self.id = log.ids[row]
+        self.type, self.action, self.exit_type = SimActionLog.KIND_DESCRIPTIONS[kind]
+        self.bbl_addr = log._unpack_addr(log.bbl_addrs[row])
+        self.ins_addr = log._unpack_addr(log.ins_addrs[row])
+        stmt_idx = log.stmt_idxs[row]
+        self.stmt_idx = None if stmt_idx == _NO_STMT else stmt_idx
+        self.sim_procedure = None
+        addr = log.addrs[row]
+        self.addr = log.symbolic_addrs.get(row, None) if addr == _NO_ADDR else addr
+        self.offset = self.addr if self.type == 'reg' else None
+        self.size = log.sizes[row]
+        self.data = log.values[row]
+        self.condition = log.conditions.get(row, None)
+
+    @property
+    def target(self):
+        return self.data if self.type == 'exit' else None
+
+    def __repr__(self):
+        if self.stmt_idx is not None:
+            location = "%#x:%d" % (self.bbl_addr, self.stmt_idx)
+        else:
+            location = "%#x" % self.bbl_addr if self.bbl_addr is not None else "unknown"
+        return "<SimActionRecord %s %s/%s>" % (location, self.type, self.action or self.exit_type)
+
+
+class SimActionLog:
+    """
+    An append-only, columnar log of the register, memory, and exit actions of a single history.
+
+    Each action is a row in a set of typed arrays (kind, event ID, block address, instruction address, statement index,
+    concrete address or register offset, size), plus a list of references to the data ASTs. Symbolic addresses and
+    conditions are rare, and are kept in sparse dicts. Rows are indexed by their concrete address (or register
+    offset), so that looking up the accesses to a location does not have to scan the log.
+
+    Event IDs are taken from the same counter as SimEvent IDs, so rows can be ordered against SimAction objects.
+    """
+
+    REG_READ = 0
+    REG_WRITE = 1
+    MEM_READ = 2
+    MEM_WRITE = 3
+    EXIT_CONDITIONAL = 4
+    EXIT_DEFAULT = 5
+
+    KIND_DESCRIPTIONS = (
+        ('reg', 'read', None),
+        ('reg', 'write', None),
+        ('mem', 'read', None),
+        ('mem', 'write', None),
+        ('exit', None, 'conditional'),
+        ('exit', None, 'default'),
+    )
+
+    def __init__(self):
+        self.kinds = array.array('B')
+        self.ids = array.array('Q')
+        self.bbl_addrs = array.array('Q')
+        self.ins_addrs = array.array('Q')
+        self.stmt_idxs = array.array('q')
+        self.addrs = array.array('Q')
+        self.sizes = array.array('I')
+        self.values = [ ]
+        # row -> AST
+        self.symbolic_addrs = { }
+        self.conditions = { }
+        # (region, address) -> rows, where region is 'reg' or 'mem'
+        self._addr_index = { }
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def copy(self):
+        o = SimActionLog.__new__(SimActionLog)
+        o.kinds = array.array('B', self.kinds)
+        o.ids = array.array('Q', self.ids)
+        o.bbl_addrs = array.array('Q', self.bbl_addrs)
+        o.ins_addrs = array.array('Q', self.ins_addrs)
+        o.stmt_idxs = array.array('q', self.stmt_idxs)
+        o.addrs = array.array('Q', self.addrs)
+        o.sizes = array.array('I', self.sizes)
+        o.values = list(self.values)
+        o.symbolic_addrs = dict(self.symbolic_addrs)
+        o.conditions = dict(self.conditions)
+        o._addr_index = { k: array.array('I', v) for k, v in self._addr_index.items() }
+        return o
+
+    @staticmethod
+    def _unpack_addr(v):
+        return None if v == _NO_ADDR else v
+
+    @staticmethod
+    def _concrete_addr(addr):
+        if isinstance(addr, int):
+            return addr
+        if isinstance(addr, claripy.ast.Base) and addr.op == 'BVV':
+            return addr.args[0]
+        return None
+
+    #
+    # Recording
+    #
+
+    def append(self, kind, bbl_addr, ins_addr, stmt_idx, addr, size, data, condition=None):
+        """
+        Append an action to the log.
+
+        :param int kind:        The kind of the action (REG_READ, MEM_WRITE, EXIT_DEFAULT, etc.).
+        :param bbl_addr:        Address of the block the action happens in.
+        :param ins_addr:        Address of the instruction the action happens in.
+        :param stmt_idx:        Index of the statement the action happens in.
+        :param addr:            The register offset or memory address that is accessed (an int or an AST), or None.
+        :param int size:        Size of the access, in bits.
+        :param data:            The data that is read or written, or the target of an exit.
+        :param condition:       The condition of a conditional access or exit.
+        :return:                The index of the new row.
+        :rtype:                 int
+        """
+
+        row = len(self.kinds)
+        self.kinds.append(kind)
+        self.ids.append(next(event_id_count))
+        self.bbl_addrs.append(_NO_ADDR if bbl_addr is None else bbl_addr)
+        self.ins_addrs.append(_NO_ADDR if ins_addr is None else ins_addr)
+        self.stmt_idxs.append(_NO_STMT if stmt_idx is None else stmt_idx)
+        self.sizes.append(size if size is not None else 0)
+        self.values.append(data)
+        if condition is not None:
+            self.conditions[row] = condition
+
+        concrete_addr = self._concrete_addr(addr)
+        if concrete_addr is None:
+            self.addrs.append(_NO_ADDR)
+            if addr is not None:
+                self.symbolic_addrs[row] = addr
+        else:
+            self.addrs.append(concrete_addr)
+            if kind < self.EXIT_CONDITIONAL:
+                key = (self.KIND_DESCRIPTIONS[kind][0], concrete_addr)
+                rows = self._addr_index.get(key, None)
+                if rows is None:
+                    rows = self._addr_index[key] = array.array('I')
+                rows.append(row)
+        return row
+
+    #
+    # Querying
+    #
+
+    def query(self, kinds=None, region=None, addr=None, bbl_addr=None, stmt_idx=None, ins_addr=None):
+        """
+        Find the rows that match all given criteria.
+
+        :param kinds:           A collection of kinds of actions to return, or None for all kinds.
+        :param str region:      'reg' or 'mem'. Required if addr is specified.
+        :param int addr:        Only return accesses to this register offset or concrete memory address.
+        :param int bbl_addr:    Only return actions in blocks starting at this address.
+        :param int stmt_idx:    Only return actions in the nth statement of each block.
+        :param int ins_addr:    Only return actions in the instruction at this address.
+        :return:                Indices of the matching rows, in the order in which they were recorded.
+        :rtype:                 list
+        """
+
+        if addr is not None:
+            if region is None:
+                raise ValueError("The region of the address must be specified.")
+            rows = self._addr_index.get((region, addr), ())
+        else:
+            rows = range(len(self.kinds))
+
+        if kinds is not None:
+            kind_col = self.kinds
+            rows = [ r for r in rows if kind_col[r] in kinds ]
+        if bbl_addr is not None:
+            col = self.bbl_addrs
+            rows = [ r for r in rows if col[r] == bbl_addr ]
+        if stmt_idx is not None:
+            col = self.stmt_idxs
+            rows = [ r for r in rows if col[r] == stmt_idx ]
+        if ins_addr is not None:
+            col = self.ins_addrs
+            rows = [ r for r in rows if col[r] == ins_addr ]
+        return list(rows)
+
+    def record(self, row):
+        """
+        Get a SimActionRecord view of a row.
+        """
+        return SimActionRecord(self, row)
+
+    def records(self, rows=None):
+        if rows is None:
+            rows = range(len(self.kinds))
+        return [ SimActionRecord(self, r) for r in rows ]
@@ -2,7 +2,7 @@ import os
 import logging
 
 from .plugin import SimStatePlugin
-from ..storage.file import SimFile
+from ..storage.file import SimFile, SimMappedFile
 from ..errors import SimMergeError
 from ..misc.ux import once
 
@@ -270,11 +270,14 @@ class SimHostFilesystem(SimMount):
 
     :param str host_path:       The path on the host to mount
     :param str pathsep:         The host path separator character, default os.path.sep
+    :param bool mapped:         Memory-map the host files instead of reading them, so that their content is shared by
+                                all states (see SimMappedFile)
     """
-    def __init__(self, host_path, pathsep=os.path.sep):
+    def __init__(self, host_path, pathsep=os.path.sep, mapped=False):
         super(SimHostFilesystem, self).__init__()
         self.host_path = host_path
         self.pathsep = pathsep
+        self.mapped = mapped
         self.cache = {}
         self.deleted_list = set()
 
@@ -285,7 +288,7 @@ class SimHostFilesystem(SimMount):
 
         if path not in self.cache:
             host_path = os.path.join(self.host_path, path)
-            simfile = self._load_file(host_path)
+            simfile = self._load_file(host_path, mapped=self.mapped)
             if simfile is None:
                 return None
             self.insert(path_elements, simfile)
@@ -293,8 +296,10 @@ class SimHostFilesystem(SimMount):
         return self.cache[path]
 
     @staticmethod
-    def _load_file(path):
+    def _load_file(path, mapped=False):
         try:
+            if mapped:
+                return SimMappedFile(name='file://' + path, path=path)
             with open(path, 'rb') as fp:
                 content = fp.read()
         except OSError:
@@ -316,7 +321,7 @@ class SimHostFilesystem(SimMount):
 
     @SimStatePlugin.memo
     def copy(self, memo):
-        x = SimHostFilesystem(self.host_path, pathsep=self.pathsep)
+        x = SimHostFilesystem(self.host_path, pathsep=self.pathsep, mapped=self.mapped)
         x.cache = {fname: self.cache[fname].copy(memo) for fname in self.cache}
         x.deleted_list = set(self.deleted_list)
         return x
@@ -347,7 +352,7 @@ class SimHostFilesystem(SimMount):
                     subdeck.append(o.cache[fname])
                 except KeyError:
                     if basecase is None:
-                        basecase = self._load_file(os.path.join(self.host_path, fname))
+                        basecase = self._load_file(os.path.join(self.host_path, fname), mapped=self.mapped)
                     subdeck.append(basecase)
 
             if common_ancestor is not None and fname in common_ancestor.cache:
@@ -8,6 +8,7 @@ import claripy
 from .plugin import SimStatePlugin
 from .. import sim_options
 from ..state_plugins.sim_action import SimActionObject
+from .action_log import SimActionLog
 
 l = logging.getLogger(name=__name__)
 
@@ -42,6 +43,8 @@ class SimStateHistory(SimStatePlugin):
 
         # the execution log for this history
         self.recent_events = [ ] if clone is None else list(clone.recent_events)
+        self.recent_action_log = None if clone is None or clone.recent_action_log is None else \
+            clone.recent_action_log.copy()
         self.recent_bbl_addrs = [ ] if clone is None else list(clone.recent_bbl_addrs)
         self.recent_ins_addrs = [ ] if clone is None else list(clone.recent_ins_addrs)
         self.recent_stack_actions = [ ] if clone is None else list(clone.recent_stack_actions)
@@ -172,6 +175,9 @@ class SimStateHistory(SimStatePlugin):
         any read or write to registers or memory, respectively), any string (representing a read
         or write to the named register), and any integer (representing a read or write to the
         memory at this address).
+
+        Actions that are recorded into action logs (with the COLUMNAR_ACTIONS state option) are
+        returned as SimActionRecord objects.
         """
         if read_from is not None:
             if write_to is not None:
@@ -243,7 +249,7 @@ class SimStateHistory(SimStatePlugin):
                 return False
             return True
 
-        return [x for x in reversed(self.actions) if
+        matches = [x for x in reversed(self.actions) if
                     (block_addr is None or x.bbl_addr == block_addr) and
                     (block_stmt is None or x.stmt_idx == block_stmt) and
                     (read_from is None or action_reads(x)) and
@@ -252,6 +258,26 @@ class SimStateHistory(SimStatePlugin):
                     #(insn_addr is None or (x.sim_procedure is None and addr_of_stmt(x.bbl_addr, x.stmt_idx) == insn_addr))
             ]
 
+        # actions recorded with COLUMNAR_ACTIONS are looked up through the indexes of the action logs
+        if read_from is not None:
+            query = { 'region': read_type, 'addr': read_offset,
+                      'kinds': (SimActionLog.REG_READ, ) if read_type == 'reg' else (SimActionLog.MEM_READ, ) }
+        elif write_to is not None:
+            query = { 'region': write_type, 'addr': write_offset,
+                      'kinds': (SimActionLog.REG_WRITE, ) if write_type == 'reg' else (SimActionLog.MEM_WRITE, ) }
+        else:
+            query = { }
+        records = [ ]
+        for h in reversed(self.lineage):
+            log = h.recent_action_log
+            if log:
+                rows = log.query(bbl_addr=block_addr, stmt_idx=block_stmt, ins_addr=insn_addr, **query)
+                records.extend(log.record(r) for r in reversed(rows))
+
+        if records:
+            matches = sorted(matches + records, key=lambda a: a.id, reverse=True)
+        return matches
+
     #def _record_state(self, state, strong_reference=True):
     #   else:
     #       # state.scratch.bbl_addr may not be initialized as final states from the "flat_successors" list. We need to get
@@ -316,6 +342,22 @@ class SimStateHistory(SimStatePlugin):
     def extend_actions(self, new_actions):
         self.recent_events.extend(new_actions)
 
+    def log_action(self, kind, addr, size, data, condition=None):
+        """
+        Record an action into the columnar action log of this history.
+
+        :param int kind:    The kind of the action, one of the SimActionLog constants.
+        :param addr:        The register offset or memory address that is accessed, or None.
+        :param int size:    Size of the access, in bits.
+        :param data:        The data that is read or written, or the target of an exit.
+        :param condition:   The condition of a conditional access or exit.
+        """
+        if self.recent_action_log is None:
+            self.recent_action_log = SimActionLog()
+        scratch = self.state.scratch
+        self.recent_action_log.append(kind, scratch.bbl_addr, scratch.ins_addr, scratch.stmt_idx, addr, size, data,
+                                      condition=condition)
+
     @contextlib.contextmanager
     def subscribe_actions(self):
         start_idx = len(self.recent_actions)
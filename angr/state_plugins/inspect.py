@@ -31,6 +31,10 @@ event_types = {
     'memory_page_map',
 }
 
+# each event type gets a bit in the mask of event types that have breakpoints (see SimState._inspect_mask), so that
+# engines can skip preparing arguments for events that nobody listens to
+event_type_bits = { t: 1 << i for i, t in enumerate(sorted(event_types)) }
+
 inspect_attributes = {
     # mem_read
     'mem_read_address',
@@ -130,6 +134,8 @@ inspect_attributes = {
     'mapped_address',
     }
 
+_cleared_inspect_attributes = dict.fromkeys(inspect_attributes)
+
 NO_OVERRIDE = object()
 
 BP_BEFORE = 'before'
@@ -241,6 +247,7 @@ class SimInspector(SimStatePlugin):
         self._breakpoints = { }
         for t in event_types:
             self._breakpoints[t] = [ ]
+        self._event_mask = 0
 
         for i in inspect_attributes:
             setattr(self, i, None)
@@ -293,6 +300,7 @@ class SimInspector(SimStatePlugin):
                                                                                         ", ".join(event_types))
                              )
         self._breakpoints[event_type].append(bp)
+        self._update_event_mask()
 
     def remove_breakpoint(self, event_type, bp=None, filter_func=None):
         """
@@ -313,6 +321,26 @@ class SimInspector(SimStatePlugin):
         except ValueError:
             # the breakpoint is not found
             l.error('remove_breakpoint(): Breakpoint %s (type %s) is not found.', bp, event_type)
+        self._update_event_mask()
+
+    def listening(self, event_type):
+        """
+        Check if there are any breakpoints for an event type.
+
+        :param str event_type:  The event type.
+        :return:                True if there is at least one breakpoint for this event type, False otherwise.
+        :rtype:                 bool
+        """
+        return bool(self._event_mask & event_type_bits[event_type])
+
+    def _update_event_mask(self):
+        mask = 0
+        for t, bps in self._breakpoints.items():
+            if bps:
+                mask |= event_type_bits[t]
+        self._event_mask = mask
+        if self.state is not None:
+            self.state._inspect_mask = mask
 
     @SimStatePlugin.memo
     def copy(self, memo): # pylint: disable=unused-argument
@@ -322,6 +350,7 @@ class SimInspector(SimStatePlugin):
 
         for t,a in self._breakpoints.items():
             c._breakpoints[t].extend(a)
+        c._event_mask = self._event_mask
         return c
 
     def downsize(self):
@@ -337,9 +366,7 @@ class SimInspector(SimStatePlugin):
         >>> # Remove them from SimInspect
         >>> self.state._inspect.downsize()
         """
-        for k in inspect_attributes:
-            if hasattr(self, k):
-                setattr(self, k, None)
+        self.__dict__.update(_cleared_inspect_attributes)
 
     def _combine(self, others):
         for t in event_types:
@@ -349,6 +376,7 @@ class SimInspector(SimStatePlugin):
                     if id(b) not in seen:
                         self._breakpoints[t].append(b)
                         seen.add(id(b))
+        self._update_event_mask()
         return False
 
     def merge(self, others, merge_conditions, common_ancestor=None): # pylint: disable=unused-argument
@@ -360,6 +388,7 @@ class SimInspector(SimStatePlugin):
     def set_state(self, state):
         super().set_state(state)
         state.supports_inspect = True
+        state._inspect_mask = self._event_mask
 
 
 from angr.sim_state import SimState
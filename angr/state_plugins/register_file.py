@@ -0,0 +1,230 @@
+import claripy
+
+from .plugin import SimStatePlugin
+
+
+class _RegisterLayout:
+    """
+    The registers of an architecture, flattened into per-byte tables indexed by VEX offset.
+
+    :ivar base:     For each byte of the guest state, the offset of the register that contains it, or -1 if the byte
+                    is not part of a register that can be cached (e.g. because registers overlap partially).
+    :ivar sizes:    For each byte of the guest state, the size of the register that starts there, or 0.
+    """
+
+    __slots__ = ('base', 'sizes', )
+
+    def __init__(self, arch):
+        registers = [ r for r in arch.register_list if r.vex_offset is not None and r.size ]
+        end = max((r.vex_offset + r.size for r in registers), default=0)
+        base = [ -1 ] * end
+        sizes = [ 0 ] * end
+        conflicts = set()
+
+        # larger registers first, so that registers that alias parts of them are ignored
+        for reg in sorted(registers, key=lambda r: (-r.size, r.vex_offset)):
+            offsets = range(reg.vex_offset, reg.vex_offset + reg.size)
+            owners = { base[i] for i in offsets }
+            if owners == { -1 }:
+                for i in offsets:
+                    base[i] = reg.vex_offset
+                sizes[reg.vex_offset] = reg.size
+            elif -1 in owners or len(owners) > 1:
+                conflicts |= owners
+                conflicts.add(reg.vex_offset)
+
+        # registers that overlap partially are not cached at all
+        conflicts.discard(-1)
+        for i in range(end):
+            if base[i] in conflicts:
+                base[i] = -1
+        for offset in conflicts:
+            if offset < end:
+                sizes[offset] = 0
+
+        self.base = base
+        self.sizes = sizes
+
+
+class SimRegisterFile(SimStatePlugin):
+    """
+    A write-back cache of the registers of a state, used by the VEX engine while it executes a block. The cache only
+    exists between begin() and end(), so idle states do not carry it around.
+
+    The values of whole registers are kept in a flat list indexed by VEX offset. Accesses to parts of a cached register
+    are handled by extracting and concatenating bits, and modified registers are only written to state.registers when
+    the cache is flushed. Other code only ever sees state.registers, so the cache must be flushed whenever something
+    else may look at the registers (exits, dirty helpers, the end of the block), and cleared when something else may
+    change them. Registers that are not cached yet are only cached by accesses to the whole register, so that partial
+    accesses to uninitialized registers fill the same bytes as they would without the cache.
+
+    Since breakpoints and actions on registers are not triggered for accesses that hit the cache, it is only used when
+    there are no breakpoints and register actions are not tracked.
+    """
+
+    # arch name -> _RegisterLayout
+    _layouts = { }
+
+    def __init__(self):
+        super(SimRegisterFile, self).__init__()
+        self._layout = None
+        self._values = None
+        self._dirty = set()
+
+    def set_state(self, state):
+        super(SimRegisterFile, self).set_state(state)
+        layout = self._layouts.get(state.arch.name, None)
+        if layout is None:
+            layout = self._layouts[state.arch.name] = _RegisterLayout(state.arch)
+        self._layout = layout
+
+    @SimStatePlugin.memo
+    def copy(self, memo): # pylint: disable=unused-argument
+        # the cache is flushed before a state is copied during execution, so copies start without it
+        return SimRegisterFile()
+
+    def merge(self, others, merge_conditions, common_ancestor=None): # pylint: disable=unused-argument
+        return False
+
+    def widen(self, others): # pylint: disable=unused-argument
+        return False
+
+    #
+    # Cache management
+    #
+
+    @property
+    def active(self):
+        return self._values is not None
+
+    def begin(self):
+        """
+        Start caching registers.
+        """
+
+        self._values = [ None ] * len(self._layout.base)
+        self._dirty.clear()
+
+    def end(self):
+        """
+        Flush the cache and stop caching registers.
+        """
+
+        self.flush()
+        self._values = None
+
+    def flush(self):
+        """
+        Write all modified registers to state.registers.
+        """
+
+        if not self._dirty:
+            return
+        values = self._values
+        registers = self.state.registers
+        for offset in sorted(self._dirty):
+            registers.store(offset, values[offset], inspect=False, disable_actions=True)
+        self._dirty.clear()
+
+    def clear(self):
+        """
+        Flush the cache and forget all cached registers.
+        """
+
+        self.flush()
+        self._values = [ None ] * len(self._layout.base)
+
+    #
+    # Accesses
+    #
+
+    def _register_of(self, offset, size):
+        """
+        Find the cacheable register that contains a range of the guest state.
+
+        :return:    The offset and the size of the register, or (-1, 0).
+        """
+
+        base = self._layout.base
+        if type(offset) is not int or not 0 <= offset < len(base) or size <= 0:
+            return -1, 0
+        reg_offset = base[offset]
+        if reg_offset < 0:
+            return -1, 0
+        reg_size = self._layout.sizes[reg_offset]
+        if offset + size > reg_offset + reg_size:
+            return -1, 0
+        return reg_offset, reg_size
+
+    def _bit_range(self, reg_offset, reg_size, offset, size):
+        bw = self.state.arch.byte_width
+        if self.state.arch.register_endness == 'Iend_BE':
+            high = (reg_size - (offset - reg_offset)) * bw - 1
+            low = high - size * bw + 1
+        else:
+            low = (offset - reg_offset) * bw
+            high = low + size * bw - 1
+        return high, low
+
+    def load(self, offset, size):
+        """
+        Load a value from the registers.
+
+        :param int offset:  The VEX offset of the register.
+        :param int size:    The size of the load, in bytes.
+        :return:            The value, as an AST.
+        """
+
+        reg_offset, reg_size = self._register_of(offset, size)
+        if reg_offset < 0:
+            # an access that spans registers, or that touches a part of the guest state that is not a register
+            self.flush()
+            return self.state.registers.load(offset, size, inspect=False, disable_actions=True)
+
+        value = self._values[reg_offset]
+        if value is None:
+            value = self.state.registers.load(offset, size, inspect=False, disable_actions=True)
+            if size == reg_size:
+                self._values[reg_offset] = value
+            return value
+
+        if size == reg_size:
+            return value
+        high, low = self._bit_range(reg_offset, reg_size, offset, size)
+        return value[high:low]
+
+    def store(self, offset, data):
+        """
+        Store a value to the registers.
+
+        :param int offset:  The VEX offset of the register.
+        :param data:        The value, as an AST. Its size determines the size of the store.
+        """
+
+        size, rest = divmod(len(data), self.state.arch.byte_width)
+        reg_offset, reg_size = self._register_of(offset, size) if not rest else (-1, 0)
+        if reg_offset < 0:
+            self.clear()
+            self.state.registers.store(offset, data, inspect=False, disable_actions=True)
+            return
+
+        if size != reg_size:
+            value = self._values[reg_offset]
+            if value is None:
+                self.state.registers.store(offset, data, inspect=False, disable_actions=True)
+                return
+            high, low = self._bit_range(reg_offset, reg_size, offset, size)
+            parts = [ ]
+            if high != len(value) - 1:
+                parts.append(value[len(value) - 1:high + 1])
+            parts.append(data)
+            if low != 0:
+                parts.append(value[low - 1:0])
+            data = claripy.Concat(*parts)
+
+        self._values[reg_offset] = data
+        self._dirty.add(reg_offset)
+
+
+from angr.sim_state import SimState
+SimState.register_default('register_file', SimRegisterFile)
@@ -19,7 +19,82 @@ l = logging.getLogger(name=__name__)
 _timing_enabled = False
 
 lt = logging.getLogger("angr.state_plugins.solver_timing")
+
+
+class SolverClock:
+    """
+    Accumulates the wall-clock time spent in solver queries while it is installed with set_solver_clock(). Nested
+    queries (e.g., eval() calling _eval()) are only counted once.
+    """
+
+    __slots__ = ('total', 'queries', '_depth', '_start', )
+
+    def __init__(self):
+        self.total = 0.0
+        self.queries = 0
+        self._depth = 0
+        self._start = 0.0
+
+    def enter(self):
+        if self._depth == 0:
+            self._start = time.perf_counter()
+            self.queries += 1
+        self._depth += 1
+
+    def exit(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self.total += time.perf_counter() - self._start
+
+
+_solver_clock = None
+# names of the SimSolver methods that are accounted to the installed SolverClock
+_clocked_names = set()
+# name -> the original SimSolver method, while the clocked methods are installed
+_unclocked_functions = { }
+
+
+def set_solver_clock(clock):
+    """
+    Install a SolverClock that all solver queries are accounted to. The timed solver methods are only wrapped while a
+    clock is installed, so there is no overhead otherwise.
+
+    :param SolverClock clock:   The clock to install, or None to uninstall the current one.
+    :return:                    The previously installed clock.
+    """
+    global _solver_clock  # pylint:disable=global-statement
+    previous, _solver_clock = _solver_clock, clock
+
+    if clock is not None and not _unclocked_functions:
+        for name in _clocked_names:
+            f = SimSolver.__dict__[name]
+            _unclocked_functions[name] = f
+            setattr(SimSolver, name, _clocked_function(f))
+    elif clock is None and _unclocked_functions:
+        for name, f in _unclocked_functions.items():
+            setattr(SimSolver, name, f)
+        _unclocked_functions.clear()
+
+    return previous
+
+
+def _clocked_function(f):
+    @functools.wraps(f)
+    def clocked_guy(*args, **kwargs):
+        clock = _solver_clock
+        if clock is None:
+            return f(*args, **kwargs)
+        clock.enter()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            clock.exit()
+
+    return clocked_guy
+
+
 def timed_function(f):
+    _clocked_names.add(f.__name__)
     if _timing_enabled:
         @functools.wraps(f)
         def timing_guy(*args, **kwargs):
@@ -1,7 +1,6 @@
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 
 import logging
-import itertools
 
 l = logging.getLogger(name=__name__)
 
@@ -9,7 +8,7 @@ import claripy
 
 from ..storage.memory import SimMemory, DUMMY_SYMBOLIC_READ_VALUE
 from ..storage.paged_memory import SimPagedMemory
-from ..storage.memory_object import SimMemoryObject
+from ..storage.memory_object import SimMemoryObject, filled_bytes
 from ..sim_state_options import SimStateOptions
 from ..misc.ux import once
 
@@ -27,6 +26,10 @@ def _multiwrite_filter(mem, ast): #pylint:disable=unused-argument
     # this is a huge hack, but so is the whole multiwrite crap
     return any(isinstance(a, MultiwriteAnnotation) for a in ast._uneliminatable_annotations)
 
+# A logged write to a symbolic address. `data` is stored in memory order, `start` and `end` bound the bytes that the
+# write may target, and `shadowed` lists the (start, end) ranges that were overwritten by concrete stores afterwards.
+_LoggedWrite = namedtuple('_LoggedWrite', ('addr', 'data', 'size', 'condition', 'start', 'end', 'shadowed'))
+
 class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
     _CONCRETIZATION_STRATEGIES = [ 'symbolic', 'symbolic_approx', 'any', 'any_approx', 'max', 'max_approx',
                                    'symbolic_nonzero', 'symbolic_nonzero_approx', 'norepeats' ]
@@ -57,6 +60,8 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         self.read_strategies = read_strategies
         self.write_strategies = write_strategies
 
+        # writes to symbolic addresses, oldest first (see SYMBOLIC_WRITE_LOG)
+        self._write_log = [ ]
 
     #
     # Lifecycle management
@@ -78,6 +83,7 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
             stack_region_map=self._stack_region_map,
             generic_region_map=self._generic_region_map
         )
+        c._write_log = list(self._write_log)
 
         return c
 
@@ -86,6 +92,7 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
     #
 
     def _changes_to_merge(self, others):
+        self._flush_write_log()
         changed_bytes = set()
 
         for o in others:  # pylint:disable=redefined-outer-name
@@ -172,7 +179,7 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
             # first, optimize the case where we are dealing with the same-sized memory objects
             if len(mo_bases) == 1 and len(mo_lengths) == 1 and not unconstrained_in:
                 our_mo = self.mem[b]
-                to_merge = [(mo.object, fv) for mo, fv in memory_objects]
+                to_merge = [(mo.bytes_at(mo.base, mo.length), fv) for mo, fv in memory_objects]
 
                 # Update `merged_to`
                 mo_base = list(mo_bases)[0]
@@ -515,6 +522,12 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         return default_mo
 
     def _read_from(self, addr, num_bytes, inspect=True, events=True, ret_on_segv=False):
+        r = self._read_from_pages(addr, num_bytes, inspect=inspect, events=events, ret_on_segv=ret_on_segv)
+        if self._write_log:
+            r = self._select_from_write_log(addr, num_bytes, r)
+        return r
+
+    def _read_from_pages(self, addr, num_bytes, inspect=True, events=True, ret_on_segv=False):
         items = self.mem.load_objects(addr, num_bytes, ret_on_segv=ret_on_segv)
 
         # optimize the case where we have a single object return
@@ -609,6 +622,31 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
 
         return addrs, read_value, load_constraint
 
+    @staticmethod
+    def _concrete_prefix(chunk, chunk_size):
+        """
+        Get the longest concrete prefix of a chunk that is loaded in big-endian.
+
+        :param chunk:           The chunk, as a bitvector.
+        :param int chunk_size:  Size of the chunk, in bytes.
+        :return:                The concrete bytes at the beginning of the chunk.
+        :rtype:                 bytes
+        """
+
+        if chunk.op == 'BVV':
+            return chunk.args[0].to_bytes(chunk_size, 'big')
+        if chunk.op != 'Concat':
+            return b''
+
+        value = 0
+        bits = 0
+        for arg in chunk.args:
+            if arg.op != 'BVV' or arg.length % 8 != 0:
+                break
+            value = (value << arg.length) | arg.args[0]
+            bits += arg.length
+        return value.to_bytes(bits // 8, 'big') if bits else b''
+
     def _find(self, start, what, max_search=None, max_symbolic_bytes=None, default=None, step=1,
               disable_actions=False, inspect=True, chunk_size=None):
         if max_search is None:
@@ -643,7 +681,15 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         else:
             cond_falseness_test = lambda cond: cond.is_false()
 
-        for i in itertools.count(step=step):
+        # when looking for concrete bytes, concrete stretches of memory are searched with bytes.find(), and equality
+        # ASTs are only built from the first symbolic byte on
+        what_bytes = None
+        if self.state.mode != 'static' and byte_width == 8 and what.op == 'BVV':
+            what_bytes = what.args[0].to_bytes(seek_size, 'big')
+        concrete_prefix = self._concrete_prefix(chunk, chunk_size) if what_bytes is not None else b''
+
+        i = 0
+        while True:
             l.debug("... checking offset %d", i)
             if i > max_search - seek_size:
                 l.debug("... hit max size")
@@ -657,8 +703,30 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
                 chunk = self.load(start+chunk_start, chunk_size,
                                   endness="Iend_BE", ret_on_segv=True,
                                   disable_actions=disable_actions, inspect=inspect)
+                if what_bytes is not None:
+                    concrete_prefix = self._concrete_prefix(chunk, chunk_size)
 
             chunk_off = i-chunk_start
+            if chunk_off + seek_size <= len(concrete_prefix):
+                end = min(len(concrete_prefix), max_search - chunk_start)
+                found = concrete_prefix.find(what_bytes, chunk_off, end)
+                while found != -1 and (found - chunk_off) % step != 0:
+                    found = concrete_prefix.find(what_bytes, found + 1, end)
+
+                if found != -1:
+                    l.debug("... found concrete")
+                    i = chunk_start + found
+                    condition = claripy.true
+                    if no_singlevalue_opt and cond_prefix:
+                        condition = claripy.And(*(cond_prefix + [condition]))
+                    cases.append([condition, claripy.BVV(i, len(start))])
+                    match_indices.append(i)
+                    break
+
+                # skip all offsets whose bytes are concrete and do not match
+                i += ((len(concrete_prefix) - seek_size - chunk_off) // step + 1) * step
+                continue
+
             b = chunk[chunk_size*byte_width - chunk_off*byte_width - 1 : chunk_size*byte_width - chunk_off*byte_width - seek_size*byte_width]
             condition = b == what
             if not cond_falseness_test(condition):
@@ -699,6 +767,8 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
                     if b.symbolic and remaining_symbolic is not None:
                         remaining_symbolic -= 1
 
+            i += step
+
         if self.state.mode == 'static':
             r = self.state.solver.ESI(self.state.arch.bits)
             for off in offsets_matched:
@@ -767,6 +837,10 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         if self.state.solver.symbolic(req.size):
             self.state.add_constraints(self.state.solver.ULE(req.size, max_bytes))
 
+        if options.SYMBOLIC_WRITE_LOG in self.state.options and self.category == 'mem' and \
+                self.state.solver.symbolic(req.addr) and not self.state.solver.symbolic(req.size) and \
+                self._log_write(req):
+            return req
 
         #
         # First, resolve the addresses
@@ -828,6 +902,8 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         return req
 
     def _insert_memory_object(self, value, address, size):
+        if self._write_log:
+            self._shadow_write_log(address, address + size)
         if self.category == 'mem':
             self.state.scratch.dirty_addrs.update(range(address, address+size))
         mo = SimMemoryObject(value, address, length=size, byte_width=self.state.arch.byte_width)
@@ -1176,10 +1252,234 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         if max_size == 0:
             return None, [ ]
 
+        if not self.state.solver.symbolic(dst) and not self.state.solver.symbolic(src) and \
+                not self.state.solver.symbolic(size) and \
+                (condition is None or self.state.solver.is_true(condition)) and \
+                self._can_move_objects((src_memory, dst_memory), inspect, disable_actions):
+            self._move_objects(self.state.solver.eval(dst), self.state.solver.eval(src), max_size, src_memory,
+                               dst_memory)
+            return None
+
         data = src_memory.load(src, max_size, inspect=inspect, disable_actions=disable_actions)
         dst_memory.store(dst, data, size=size, condition=condition, inspect=inspect, disable_actions=disable_actions)
         return data
 
+    def _fill(self, dst, value, size, inspect=True, disable_actions=False):
+        if self.state.solver.symbolic(dst) or self.state.solver.symbolic(value) or \
+                not self._can_move_objects((self,), inspect, disable_actions):
+            return super(SimSymbolicMemory, self)._fill(dst, value, size, inspect=inspect,
+                                                        disable_actions=disable_actions)
+
+        if size == 0:
+            return
+        if type(value) is not int:
+            value = self.state.solver.eval(value)
+        self._insert_objects([ SimMemoryObject(filled_bytes(value & 0xff, size), self.state.solver.eval(dst)) ])
+
+    #
+    # Bulk data movement
+    #
+
+    def _can_move_objects(self, memories, inspect, disable_actions):
+        """
+        Check if data can be moved between memories by storing references to memory objects, without ever loading it
+        as an AST. This is only allowed when nothing can observe the AST: no breakpoints on memory accesses, no actions,
+        and no special handling of uninitialized reads.
+
+        :param memories:        The memories that are involved.
+        :param bool inspect:    Whether breakpoints would be triggered by a regular load and store.
+        :param bool disable_actions: Whether actions would be created by a regular load and store.
+        :rtype:                 bool
+        """
+
+        if self.state.arch.byte_width != 8:
+            return False
+        if inspect and self.state._inspect_mask & (event_type_bits['mem_read'] | event_type_bits['mem_write']):
+            return False
+        if not disable_actions and options.AUTO_REFS in self.state.options:
+            return False
+        if options.ABSTRACT_MEMORY in self.state.options or \
+                options.UNINITIALIZED_ACCESS_AWARENESS in self.state.options:
+            return False
+        return all(isinstance(m, SimSymbolicMemory) and m.category != 'reg' and not m._abstract_backer and
+                   not m._write_log for m in memories)
+
+    @staticmethod
+    def _object_ranges(items, end):
+        """
+        Turn the result of SimPagedMemory.load_objects() into a list of non-overlapping [start, end, memory object]
+        ranges, in which each memory object appears once per contiguous range it backs.
+        """
+
+        ranges = [ ]
+        for i, (mo_addr, mo) in enumerate(items):
+            range_end = min(mo.last_addr + 1, end)
+            if i + 1 < len(items):
+                range_end = min(range_end, items[i + 1][0])
+            if ranges and ranges[-1][2] is mo and ranges[-1][1] == mo_addr:
+                ranges[-1][1] = range_end
+            else:
+                ranges.append([ mo_addr, range_end, mo ])
+        return ranges
+
+    def _move_objects(self, dst, src, size, src_memory, dst_memory):
+        """
+        Copy `size` bytes from `src` in `src_memory` to `dst` in `dst_memory` by storing references to the memory
+        objects that hold the source bytes. Objects that are copied in their entirety are shared between the source
+        and the destination, and only the objects at the edges of the copied range are sliced, so the cost of the copy
+        grows with the number of objects and not with the size of the data. Overlapping ranges are handled like
+        memmove().
+
+        :param int dst:         The destination address.
+        :param int src:         The source address.
+        :param int size:        Number of bytes to copy.
+        :param src_memory:      The memory to copy from.
+        :param dst_memory:      The memory to copy to.
+        """
+
+        end = src + size
+        ranges = self._object_ranges(src_memory.mem.load_objects(src, size), end)
+
+        # uninitialized bytes are filled in the source first, exactly as a load would do it
+        missing = [ ]
+        last_addr = src
+        for start, stop, _ in ranges:
+            if start > last_addr:
+                missing.append((last_addr, start - last_addr))
+            last_addr = stop
+        if last_addr < end:
+            missing.append((last_addr, end - last_addr))
+        if missing:
+            for addr, length in missing:
+                src_memory._fill_missing(addr, length)
+            ranges = self._object_ranges(src_memory.mem.load_objects(src, size), end)
+
+        # all new objects are created before anything is stored, so that overlapping copies read the old data
+        delta = dst - src
+        new_objects = [ ]
+        for start, stop, mo in ranges:
+            if start == mo.base and stop == mo.last_addr + 1:
+                new_objects.append(SimMemoryObject(mo.object, mo.base + delta, length=mo.length))
+            else:
+                new_objects.append(SimMemoryObject(mo.bytes_at(start, stop - start, allow_concrete=True),
+                                                   start + delta))
+        dst_memory._insert_objects(new_objects)
+
+    def _insert_objects(self, mos):
+        # the reverse mappings expect ASTs
+        if options.REVERSE_MEMORY_NAME_MAP in self.state.options or \
+                options.REVERSE_MEMORY_HASH_MAP in self.state.options:
+            mos = [ SimMemoryObject(claripy.BVV(mo.concrete_bytes), mo.base, length=mo.length) if mo.is_bytes else mo
+                    for mo in mos ]
+        for mo in mos:
+            if self._write_log:
+                self._shadow_write_log(mo.base, mo.base + mo.length)
+            if self.category == 'mem':
+                self.state.scratch.dirty_addrs.update(range(mo.base, mo.base + mo.length))
+            self.mem.store_memory_object(mo)
+
+    #
+    # Symbolic write log
+    #
+
+    def _log_write(self, req):
+        """
+        Record a store to a symbolic address in the write log instead of storing it into the pages.
+
+        :param req: The MemoryStoreRequest, with a concrete size.
+        :return:    True if the store was logged, False if it has to be handled the usual way.
+        """
+
+        byte_width = self.state.arch.byte_width
+        size = self.state.solver.eval(req.size)
+        start = self.state.solver.min_int(req.addr)
+        end = self.state.solver.max_int(req.addr) + size
+        if size == 0 or end - start > self.state.options.symbolic_write_log_max_range:
+            return False
+
+        data = req.data
+        if size < data.length // byte_width:
+            data = data[len(data)-1:len(data)-size*byte_width]
+        if req.endness == "Iend_LE" or (req.endness is None and self.endness == "Iend_LE"):
+            data = data.reversed
+
+        self._write_log.append(_LoggedWrite(req.addr, data, size, req.condition, start, end, ()))
+        self.state.scratch.dirty_addrs.update(range(start, end))
+
+        req.actual_addresses = [ ]
+        req.stored_values = [ data ]
+        req.completed = True
+        return True
+
+    def _shadow_write_log(self, start, end):
+        """
+        Mark a range of addresses as overwritten by a concrete store, so that earlier logged writes are not selected
+        for them anymore. Logged writes that are entirely overwritten are dropped.
+        """
+
+        log = [ ]
+        for w in self._write_log:
+            if w.start < end and start < w.end:
+                if start <= w.start and w.end <= end:
+                    continue
+                w = w._replace(shadowed=w.shadowed + ((start, end),))
+            log.append(w)
+        self._write_log = log
+
+    def _select_from_write_log(self, addr, num_bytes, value):
+        """
+        Apply the logged writes that may target a range of addresses to the value that is stored in the pages.
+
+        :param int addr:        The start of the range.
+        :param int num_bytes:   The size of the range.
+        :param value:           The contents of the range according to the pages, in memory order.
+        :return:                The contents of the range, in memory order.
+        """
+
+        end = addr + num_bytes
+        writes = [ w for w in self._write_log if w.start < end and addr < w.end ]
+        if not writes:
+            return value
+
+        byte_width = self.state.arch.byte_width
+        bits = self.state.arch.bits
+        chopped = value.chop(byte_width)
+        for i in range(max(addr, min(w.start for w in writes)), min(end, max(w.end for w in writes))):
+            b = chopped[i - addr]
+            for w in writes:
+                if not w.start <= i < w.end or any(s <= i < e for s, e in w.shadowed):
+                    continue
+                # the byte at offset k of the write lands at i if the write starts at i - k
+                for k in range(max(0, i - w.end + w.size), min(w.size, i - w.start + 1)):
+                    hit = w.addr == self.state.solver.BVV(i - k, bits)
+                    if w.condition is not None:
+                        hit = self.state.solver.And(hit, w.condition)
+                    data_byte = w.data[len(w.data) - 1 - k*byte_width:len(w.data) - (k+1)*byte_width]
+                    b = self.state.solver.If(hit, data_byte, b)
+            chopped[i - addr] = b
+        return self.state.solver.Concat(*chopped) if len(chopped) > 1 else chopped[0]
+
+    def _flush_write_log(self):
+        """
+        Store the logged writes into the pages, as If-expressions over their possible targets. This is needed before
+        anything looks at the memory objects in the pages directly, such as merging.
+        """
+
+        if not self._write_log:
+            return
+
+        ranges = [ ]
+        for start, end in sorted((w.start, w.end) for w in self._write_log):
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], end)
+            else:
+                ranges.append([ start, end ])
+
+        values = [ (start, end, self._read_from(start, end - start)) for start, end in ranges ]
+        self._write_log = [ ]
+        for start, end, v in values:
+            self._insert_memory_object(v, start, end - start)
+
     #
     # Things that are actually handled by SimPagedMemory
     #
@@ -1191,6 +1491,8 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         :param other:   The other :class:`SimSymbolicMemory`.
         :returns:       A set of differing bytes
         """
+        self._flush_write_log()
+        other._flush_write_log()
         return self.mem.changed_bytes(other.mem)
 
     def replace_all(self, old, new):
@@ -1290,6 +1592,11 @@ SimStateOptions.register_option("symbolic_ip_max_targets", int,
                                 description="The maximum number of concrete addresses a symbolic instruction pointer "
                                             "can be concretized to."
                                 )
+SimStateOptions.register_option("symbolic_write_log_max_range", int,
+                                default=0x10000,
+                                description="The largest number of bytes that a write to a symbolic address may target "
+                                            "for it to be recorded in the write log (see SYMBOLIC_WRITE_LOG)."
+                                )
 SimStateOptions.register_option("jumptable_symbolic_ip_max_targets", int,
                                 default=16384,
                                 description="The maximum number of concrete addresses a symbolic instruction pointer "
@@ -1302,5 +1609,5 @@ SimState.register_default('sym_memory', SimSymbolicMemory)
 
 from ..errors import SimUnsatError, SimMemoryError, SimMemoryLimitError, SimMemoryAddressError, SimMergeError
 from .. import sim_options as options
-from .inspect import BP_AFTER, BP_BEFORE
+from .inspect import BP_AFTER, BP_BEFORE, event_type_bits
 from .. import concretization_strategies
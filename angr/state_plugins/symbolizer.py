@@ -201,6 +201,7 @@ class SimSymbolizer(SimStatePlugin): #pylint:disable=abstract-method
         assert type(length) is int
 
         self.state.scratch.push_priv(True)
+        storage._flush_write_log()
         memory_objects = storage.mem.load_objects(addr, length)
         self.state.scratch.pop_priv()
 
@@ -805,6 +805,8 @@ class Unicorn(SimStatePlugin):
 
         try:
             ret_on_segv = True if best_effort_read else False
+            # unicorn reads the memory objects directly
+            self.state.memory._flush_write_log()
             items = self.state.memory.mem.load_objects(start, length, ret_on_segv=ret_on_segv)
         except SimSegfaultError:
             raise SegfaultError
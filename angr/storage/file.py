@@ -3,6 +3,7 @@ import logging
 import itertools
 
 from .memory_object import SimMemoryObject
+from .host_file import HostFileBacker
 from ..state_plugins.plugin import SimStatePlugin
 from ..state_plugins.sim_action_object import SimActionObject
 from ..state_plugins.symbolic_memory import SimSymbolicMemory
@@ -310,6 +311,53 @@ class SimFile(SimFileBase, SimSymbolicMemory):
         raise SimMergeError("Widening the filesystem is unsupported")
 
 
+class SimMappedFile(SimFile):
+    """
+    A SimFile whose content is a file on the host, which is memory-mapped instead of being read. The mapping is shared
+    read-only by all states, and only the pages that are written to or symbolized are copied into each state, so even
+    very large concrete inputs (packet captures, disk images, etc.) can be used.
+
+    :param name:        The name of the file
+    :param path:        The path of the file on the host
+    :param backer:      A HostFileBacker to share, instead of mapping the file at path again
+    :param kwargs:      Any other keyword arguments will go on to the SimFile constructor.
+    """
+
+    def __init__(self, name, path=None, backer=None, **kwargs):
+        if backer is None:
+            if 'mem' in kwargs:
+                # copies reach the backer through the memory they are given
+                backer = kwargs['mem']._memory_backer
+            else:
+                backer = HostFileBacker(path)
+        self.backer = backer
+
+        if 'mem' not in kwargs:
+            kwargs['memory_backer'] = backer
+        if kwargs.get('size', None) is None:
+            kwargs['size'] = len(backer)
+        if kwargs.get('concrete', None) is None:
+            kwargs['concrete'] = True
+        super(SimMappedFile, self).__init__(name, **kwargs)
+
+    def symbolize(self, pos, size, name=None):
+        """
+        Replace a range of the file with unconstrained symbolic data in this state.
+
+        :param int pos:     The offset of the first byte.
+        :param int size:    The number of bytes.
+        :param str name:    The name of the symbolic variable, by default derived from the file name and the offset.
+        :return:            The new symbolic data.
+        """
+
+        if name is None:
+            name = '%s_%#x' % (self.ident, pos)
+        data = self.state.solver.BVS(name, size * self.state.arch.byte_width, key=('file', self.name, pos),
+                                     eternal=False)
+        self.store(pos, data)
+        return data
+
+
 class SimFileStream(SimFile):
     """
     A specialized SimFile that uses a flat memory backing, but functions as a stream, tracking its position internally.
@@ -375,15 +423,24 @@ class SimPackets(SimFileBase):
                         autodetected.
     :param content:     Some initial content to use for the file. Can be a list of bytestrings or a list of tuples of
                         content ASTs and size ASTs.
+    :param backing:     Concrete packets to read once the content is used up, as a sequence of bytestrings or of
+                        (length, data) tuples, e.g. the in_streams of a PCAP. The sequence is shared by all copies of
+                        the file, and each packet is only turned into an AST when it is read, so captures of any size
+                        can be replayed. Packets that are longer than a read are delivered over several reads.
 
     :ivar write_mode:   See the eponymous parameter
     :ivar content:      A list of packets, as tuples of content ASTs and size ASTs.
+    :ivar backing:      See the eponymous parameter
     """
-    def __init__(self, name, write_mode=None, content=None, writable=True, ident=None, **kwargs):
+    def __init__(self, name, write_mode=None, content=None, writable=True, ident=None, backing=None, **kwargs):
         super(SimPackets, self).__init__(name, writable=writable, ident=ident, **kwargs)
 
         self.write_mode = write_mode
         self.content = content
+        self.backing = backing
+        # the packet of the backing that is read next, and how much of it has been read
+        self._backing_index = 0
+        self._backing_offset = 0
 
         if self.content is None:
             self.content = []
@@ -456,7 +513,13 @@ class SimPackets(SimFileBase):
         if type(size) is int:
             size = self.state.solver.BVV(size, self.state.arch.bits)
 
-        # The read is on the frontier. let's generate a new packet.
+        # The read is on the frontier. if there is backing data left, the next packet comes from it
+        if self.backing is not None and self._backing_index < len(self.backing):
+            packet = self._read_backing(size)
+            self.content.append(packet)
+            return packet + (pos+1,)
+
+        # otherwise, let's generate a new packet.
         orig_size = size
         max_size = None
 
@@ -487,6 +550,32 @@ class SimPackets(SimFileBase):
         self.content.append(packet)
         return packet + (pos+1,)
 
+    def _read_backing(self, size):
+        packet = self.backing[self._backing_index]
+        if type(packet) is tuple:
+            length, data = packet
+        else:
+            length, data = len(packet), packet
+
+        if self.state.solver.symbolic(size):
+            max_size = self.state.solver.max(size)
+        else:
+            max_size = self.state.solver.eval(size)
+        remaining = length - self._backing_offset
+        chunk_size = min(remaining, max_size)
+        chunk = bytes(data[self._backing_offset:self._backing_offset + chunk_size])
+
+        if chunk_size == remaining:
+            self._backing_index += 1
+            self._backing_offset = 0
+        else:
+            self._backing_offset += chunk_size
+
+        chunk_size = self.state.solver.BVV(chunk_size, self.state.arch.bits)
+        if self.state.solver.symbolic(size):
+            self.state.solver.add(chunk_size <= size)
+        return claripy.BVV(chunk), chunk_size
+
     def write(self, pos, data, size=None, events=True, **kwargs):
         """
         Write a packet to the stream.
@@ -533,7 +622,11 @@ class SimPackets(SimFileBase):
 
     @SimStatePlugin.memo
     def copy(self, memo): # pylint: disable=unused-argument
-        return type(self)(self.name, write_mode=self.write_mode, content=self.content, ident=self.ident, concrete=self.concrete)
+        c = type(self)(self.name, write_mode=self.write_mode, content=self.content, ident=self.ident, concrete=self.concrete,
+                       backing=self.backing)
+        c._backing_index = self._backing_index
+        c._backing_offset = self._backing_offset
+        return c
 
     def merge(self, others, merge_conditions, common_ancestor=None): # pylint: disable=unused-argument
         for o in others:
@@ -547,6 +640,8 @@ class SimPackets(SimFileBase):
         for o in others:
             if len(o.content) != len(self.content):
                 raise SimMergeError("Cannot merge SimPackets with disparate number of packets")
+            if (o._backing_index, o._backing_offset) != (self._backing_index, self._backing_offset):
+                raise SimMergeError("Cannot merge SimPackets with disparate positions in their backing")
 
         for i, default in enumerate(self.content):
             max_data_length = max(len(default[0]), max(len(o.content[i][0]) for o in others))
@@ -0,0 +1,78 @@
+import os
+import mmap
+import weakref
+
+
+def _close_mapping(mapping):
+    try:
+        mapping.close()
+    except BufferError:
+        # views of the mapping are still referenced, e.g. by memory objects. the mapping is released along with them
+        pass
+
+
+class HostFileBacker:
+    """
+    The content of a file on the host, memory-mapped read-only. It can be used as the memory backer of a
+    SimPagedMemory, whose pages then reference the mapping instead of copying it. The mapping is shared by every memory
+    (and every copy of a memory) that uses the backer; writes go to the pages of each memory, and never to the file.
+
+    The mapping is closed by close(), or when the backer is garbage-collected.
+
+    :param str path:    The path of the file on the host.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        self._finalizer = None
+        self.size = 0
+        self._open()
+
+    def _open(self):
+        with open(self.path, 'rb') as fp:
+            self.size = os.fstat(fp.fileno()).st_size
+            if self.size:
+                self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                self._finalizer = weakref.finalize(self, _close_mapping, self._map)
+            else:
+                # empty files cannot be mapped
+                self._map = b''
+
+    def close(self):
+        """
+        Close the mapping and the file descriptor it holds. The backer cannot be used afterwards. If views of the file
+        are still referenced, the mapping stays alive until they are released.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __len__(self):
+        return self.size
+
+    def keys(self):
+        return range(self.size)
+
+    def view(self, start, end):
+        """
+        Get a part of the file without copying it.
+
+        :param int start:   The offset of the first byte.
+        :param int end:     The offset after the last byte.
+        :return:            A memoryview of the data, which is shorter than requested (or empty) past the end of the
+                            file.
+        :rtype:             memoryview
+        """
+        return memoryview(self._map)[start:end]
+
+    def __getstate__(self):
+        # the file is mapped again when unpickling
+        return { 'path': self.path }
+
+    def __setstate__(self, s):
+        self.path = s['path']
+        self._finalizer = None
+        self._open()
+
+    def __repr__(self):
+        return "<HostFileBacker %s (%d bytes)>" % (self.path, self.size)
@@ -523,7 +523,7 @@ class SimMemory(SimStatePlugin):
             raise SimMemoryError("Provided data is too short for this memory store")
 
         if _inspect:
-            if self.category == 'reg':
+            if self.category == 'reg' and self.state._inspect_mask & event_type_bits['reg_write']:
                 self.state._inspect(
                     'reg_write',
                     BP_BEFORE,
@@ -538,7 +538,7 @@ class SimMemory(SimStatePlugin):
                 data_e = self.state._inspect_getattr('reg_write_expr', data_e)
                 condition_e = self.state._inspect_getattr('reg_write_condition', condition_e)
                 endness = self.state._inspect_getattr('reg_write_endness', endness)
-            elif self.category == 'mem':
+            elif self.category == 'mem' and self.state._inspect_mask & event_type_bits['mem_write']:
                 self.state._inspect(
                     'mem_write',
                     BP_BEFORE,
@@ -575,8 +575,10 @@ class SimMemory(SimStatePlugin):
             raise
 
         if _inspect:
-            if self.category == 'reg': self.state._inspect('reg_write', BP_AFTER)
-            elif self.category == 'mem': self.state._inspect('mem_write', BP_AFTER)
+            if self.category == 'reg' and self.state._inspect_mask & event_type_bits['reg_write']:
+                self.state._inspect('reg_write', BP_AFTER)
+            elif self.category == 'mem' and self.state._inspect_mask & event_type_bits['mem_write']:
+                self.state._inspect('mem_write', BP_AFTER)
             # tracer uses address_concretization_add_constraints
             add_constraints = self.state._inspect_getattr('address_concretization_add_constraints', add_constraints)
 
@@ -758,7 +760,7 @@ class SimMemory(SimStatePlugin):
         endness = self.endness if endness is None else endness
 
         if _inspect:
-            if self.category == 'reg':
+            if self.category == 'reg' and self.state._inspect_mask & event_type_bits['reg_read']:
                 self.state._inspect('reg_read', BP_BEFORE, reg_read_offset=addr_e, reg_read_length=size_e,
                                     reg_read_condition=condition_e, reg_read_endness=endness,
                                     )
@@ -767,7 +769,7 @@ class SimMemory(SimStatePlugin):
                 condition_e = self.state._inspect_getattr("reg_read_condition", condition_e)
                 endness = self.state._inspect_getattr("reg_read_endness", endness)
 
-            elif self.category == 'mem':
+            elif self.category == 'mem' and self.state._inspect_mask & event_type_bits['mem_read']:
                 self.state._inspect('mem_read', BP_BEFORE, mem_read_address=addr_e, mem_read_length=size_e,
                                     mem_read_condition=condition_e, mem_read_endness=endness,
                                     )
@@ -817,11 +819,11 @@ class SimMemory(SimStatePlugin):
             r = r.reversed
 
         if _inspect:
-            if self.category == 'mem':
+            if self.category == 'mem' and self.state._inspect_mask & event_type_bits['mem_read']:
                 self.state._inspect('mem_read', BP_AFTER, mem_read_expr=r)
                 r = self.state._inspect_getattr("mem_read_expr", r)
 
-            elif self.category == 'reg':
+            elif self.category == 'reg' and self.state._inspect_mask & event_type_bits['reg_read']:
                 self.state._inspect('reg_read', BP_AFTER, reg_read_expr=r)
                 r = self.state._inspect_getattr("reg_read_expr", r)
 
@@ -918,6 +920,8 @@ class SimMemory(SimStatePlugin):
         :param size:        A claripy expression representing the size of the copy
         :param condition:   A claripy expression representing a condition, if the write should be conditional. If this
                             is determined to be false, the size of the copy will be 0.
+        :return:            The copied data, or None if the data was copied without loading it. This is the case when
+                            the addresses and the size are concrete and nothing observes the memory accesses.
         """
         dst = _raw_ast(dst)
         src = _raw_ast(src)
@@ -931,9 +935,40 @@ class SimMemory(SimStatePlugin):
                       disable_actions=False):
         raise NotImplementedError()
 
+    def fill(self, dst, value, size, inspect=True, disable_actions=False):
+        """
+        Fills memory with copies of a single byte, like memset().
+
+        :param dst:     A claripy expression representing the address of the destination
+        :param value:   The byte to store, as an int or a claripy expression of one byte
+        :param int size: The number of bytes to fill
+        """
+        dst = _raw_ast(dst)
+        value = _raw_ast(value)
+
+        return self._fill(dst, value, size, inspect=inspect, disable_actions=disable_actions)
+
+    def _fill(self, dst, value, size, inspect=True, disable_actions=False):
+        if type(value) is int:
+            value = self.state.solver.BVV(value, self.state.arch.byte_width)
+
+        # concatenating many bytes is slow, so concrete data is built as a single value per chunk
+        offset = 0
+        while offset < size:
+            chunksize = min(size - offset, 0x1000)
+            if self.state.solver.symbolic(value):
+                data = self.state.solver.Concat(*([ value ] * chunksize))
+            else:
+                width = self.state.arch.byte_width
+                # byte * 0x0101...01
+                repeated = self.state.solver.eval(value) * (((1 << (width * chunksize)) - 1) // ((1 << width) - 1))
+                data = self.state.solver.BVV(repeated, chunksize * width)
+            self.store(dst + offset, data, inspect=inspect, disable_actions=disable_actions)
+            offset += chunksize
+
 
 from .. import sim_options as o
 from ..state_plugins.sim_action import SimActionData
 from ..state_plugins.sim_action_object import SimActionObject, _raw_ast
 from ..errors import SimMemoryError, SimRegionMapError, SimSegfaultError
-from ..state_plugins.inspect import BP_BEFORE, BP_AFTER
+from ..state_plugins.inspect import BP_BEFORE, BP_AFTER, event_type_bits
@@ -3,29 +3,55 @@ from ..errors import SimMemoryError
 
 
 def obj_bit_size(o):
-    if type(o) is bytes:
+    if type(o) is bytes or type(o) is memoryview:
         return len(o) * 8
     return o.size()
 
 
-class SimMemoryObject(object):
+# fill byte -> a shared span of that byte, which is handed out as memoryviews by filled_bytes()
+_FILL_SPANS = { }
+_FILL_SPAN_SIZE = 0x1000
+# shorter fills are cheaper as bytes than as memoryviews
+_MIN_SHARED_FILL = 0x100
+
+
+def filled_bytes(value, length):
+    """
+    Get concrete data that consists of `length` repetitions of a byte. Fills that are at least _MIN_SHARED_FILL and at
+    most _FILL_SPAN_SIZE bytes long reference a span that is interned per byte value, so that zero-filled pages and
+    large memsets do not allocate their own data.
+
+    :param int value:   The byte value.
+    :param int length:  Number of bytes.
+    :return:            bytes or a read-only memoryview.
+    """
+
+    if _MIN_SHARED_FILL <= length <= _FILL_SPAN_SIZE:
+        span = _FILL_SPANS.get(value, None)
+        if span is None:
+            span = _FILL_SPANS[value] = memoryview(bytes((value,)) * _FILL_SPAN_SIZE)
+        return span[:length]
+    return bytes((value,)) * length
+
+
+class SimMemoryObject:
     """
     A MemoryObjectRef instance is a reference to a byte or several bytes in
     a specific object in SimSymbolicMemory. It is only used inside
     SimSymbolicMemory class.
+
+    Memory objects are immutable and slotted, since there are a lot of them. SimMemoryObject(...) creates a
+    SimBytesMemoryObject for concrete data and a SimASTMemoryObject for claripy ASTs.
     """
-    def __init__(self, obj, base, length=None, byte_width=8):
-        if type(obj) is bytes:
-            assert byte_width == 8
 
-        elif not isinstance(obj, claripy.ast.Base):
-            raise SimMemoryError('memory can only store claripy Expression')
+    __slots__ = ('base', 'object', 'length', )
 
-        self.is_bytes = type(obj) == bytes
-        self._byte_width = byte_width
-        self.base = base
-        self.object = obj
-        self.length = obj_bit_size(obj) // self._byte_width if length is None else length
+    is_bytes = False
+
+    def __new__(cls, obj, base, length=None, byte_width=8): # pylint:disable=unused-argument
+        if cls is SimMemoryObject:
+            cls = SimBytesMemoryObject if type(obj) is bytes or type(obj) is memoryview else SimASTMemoryObject
+        return object.__new__(cls)
 
     def size(self):
         return self.length * self._byte_width
@@ -40,28 +66,11 @@ class SimMemoryObject(object):
     def includes(self, x):
         return 0 <= x - self.base < self.length
 
-    def bytes_at(self, addr, length, allow_concrete=False):
-        if addr == self.base and length == self.length:
-            return claripy.BVV(self.object) if not allow_concrete and self.is_bytes else self.object
-
-        if self.is_bytes:
-            start = addr - self.base
-            end = start + length
-            o = self.object[start:end]
-            return o if allow_concrete else claripy.BVV(o)
-        obj_size = self.size()
-        left = obj_size - (addr-self.base)*self._byte_width - 1
-        right = left - length*self._byte_width + 1
-        return self.object[left:right]
-
     def _object_equals(self, other):
-        if self.is_bytes != other.is_bytes:
-            return False
+        raise NotImplementedError()
 
-        if self.is_bytes:
-            return self.object == other.object
-        else:
-            return self.object.cache_key == other.object.cache_key
+    def _object_hash(self):
+        raise NotImplementedError()
 
     def _length_equals(self, other):
         if type(self.length) != type(other.length):
@@ -73,7 +82,7 @@ class SimMemoryObject(object):
             return self.length.cache_key == other.length.cache_key
 
     def __eq__(self, other):
-        if type(other) is not SimMemoryObject:
+        if not isinstance(other, SimMemoryObject):
             return NotImplemented
 
         return  self.base == other.base and \
@@ -81,11 +90,94 @@ class SimMemoryObject(object):
                 self._length_equals(other)
 
     def __hash__(self):
-        obj_hash = hash(self.object) if self.is_bytes else self.object.cache_key
-        return hash((obj_hash, self.base, hash(self.length)))
+        return hash((self._object_hash(), self.base, hash(self.length)))
 
     def __ne__(self, other):
         return not self == other
 
+    def __reduce__(self):
+        # memoryviews cannot be pickled
+        obj = self.object.tobytes() if type(self.object) is memoryview else self.object
+        return SimMemoryObject, (obj, self.base, self.length, self._byte_width)
+
+
+class SimBytesMemoryObject(SimMemoryObject):
+    """
+    A memory object that holds concrete data, as bytes or as a memoryview of data that is owned by someone else (e.g.
+    the memory backers of the loader), which must not be modified while the memory object exists.
+    """
+
+    __slots__ = ()
+
+    is_bytes = True
+    _byte_width = 8
+
+    def __init__(self, obj, base, length=None, byte_width=8):
+        assert byte_width == 8
+        self.base = base
+        self.object = obj
+        self.length = len(obj) if length is None else length
+
+    @property
+    def concrete_bytes(self):
+        """
+        The concrete data of this memory object, as bytes. Data that is referenced through a memoryview is copied.
+        """
+        return self.object.tobytes() if type(self.object) is memoryview else self.object
+
+    def bytes_at(self, addr, length, allow_concrete=False):
+        if addr == self.base and length == self.length:
+            o = self.concrete_bytes
+        else:
+            start = addr - self.base
+            o = bytes(self.object[start:start + length])
+        return o if allow_concrete else claripy.BVV(o)
+
+    def _object_equals(self, other):
+        return other.is_bytes and self.object == other.object
+
+    def _object_hash(self):
+        # read-only memoryviews hash their data in place and cache the hash like bytes do, so views of large spans are
+        # not copied every time they are hashed. writable views (e.g. of the bytearrays of the loader) are not hashable
+        o = self.object
+        if type(o) is bytes or o.readonly:
+            return hash(o)
+        return hash(o.tobytes())
+
+    def __repr__(self):
+        return "MO(%s)" % self.concrete_bytes
+
+
+class SimASTMemoryObject(SimMemoryObject):
+    """
+    A memory object that holds a claripy AST.
+    """
+
+    __slots__ = ('_byte_width', )
+
+    def __init__(self, obj, base, length=None, byte_width=8):
+        if not isinstance(obj, claripy.ast.Base):
+            raise SimMemoryError('memory can only store claripy Expression')
+
+        self._byte_width = byte_width
+        self.base = base
+        self.object = obj
+        self.length = obj.size() // byte_width if length is None else length
+
+    def bytes_at(self, addr, length, allow_concrete=False): # pylint:disable=unused-argument
+        if addr == self.base and length == self.length:
+            return self.object
+
+        obj_size = self.size()
+        left = obj_size - (addr-self.base)*self._byte_width - 1
+        right = left - length*self._byte_width + 1
+        return self.object[left:right]
+
+    def _object_equals(self, other):
+        return not other.is_bytes and self.object.cache_key == other.object.cache_key
+
+    def _object_hash(self):
+        return self.object.cache_key
+
     def __repr__(self):
         return "MO(%s)" % self.object
@@ -2,13 +2,15 @@ import claripy
 import cle
 from sortedcontainers import SortedDict
 from collections import ChainMap
+import bisect
 import logging
 
 
 from ..errors import SimMemoryError, SimSegfaultError, SimMemoryMissingError, SimConcreteMemoryError
 
 from .. import sim_options as options
-from .memory_object import SimMemoryObject
+from .memory_object import SimMemoryObject, filled_bytes
+from .host_file import HostFileBacker
 
 l = logging.getLogger(name=__name__)
 
@@ -48,6 +50,15 @@ class BasePage:
         else:
             self.permissions = permissions
 
+        # cached hash of the contents, reset whenever the page is written to
+        self._content_hash = None
+
+    def __getstate__(self):
+        s = dict(self.__dict__)
+        # hashes are not stable across interpreters
+        s['_content_hash'] = None
+        return s
+
     @property
     def concrete_permissions(self):
         if self.permissions.symbolic:
@@ -74,17 +85,52 @@ class BasePage:
         :param overwrite: whether to overwrite objects already in memory (if false, just fill in the holes)
         """
         start, end = self._resolve_range(new_mo)
+        self._content_hash = None
         if overwrite:
             self.store_overwrite(state, new_mo, start, end)
         else:
             self.store_underwrite(state, new_mo, start, end)
 
     def copy(self):
-        return Page(
+        c = Page(
             self._page_addr, self._page_size,
             permissions=self.permissions,
             **self._copy_args()
         )
+        c._content_hash = self._content_hash
+        return c
+
+    @property
+    def content_hash(self):
+        """
+        A hash of the memory objects in this page and of the ranges they occupy. Pages with the same hash hold the same
+        memory objects at the same addresses, so they can be skipped when looking for differences between memories.
+        The hash is computed when it is first needed, and cached until the page is written to.
+        """
+
+        if self._content_hash is None:
+            self._content_hash = hash(tuple((start, end, hash(mo)) for start, end, mo in self.object_ranges()))
+        return self._content_hash
+
+    def object_ranges(self):
+        """
+        Get the memory objects in this page, along with the address ranges they occupy.
+
+        :returns: a list of [start, end, memory_object], where end is not inclusive, sorted by address
+        """
+
+        page_end = self._page_addr + self._page_size
+        items = self.load_slice(None, self._page_addr, page_end)
+        ranges = [ ]
+        for i, (addr, mo) in enumerate(items):
+            end = min(mo.last_addr + 1, page_end)
+            if i + 1 < len(items):
+                end = min(end, items[i + 1][0])
+            if ranges and ranges[-1][2] is mo and ranges[-1][1] == addr:
+                ranges[-1][1] = end
+            else:
+                ranges.append([ addr, end, mo ])
+        return ranges
 
     #
     # Abstract functions
@@ -141,6 +187,7 @@ class TreePage(BasePage):
             return set.union(*(set(range(*self._resolve_range(mo))) for mo in self._storage.values()))
 
     def replace_mo(self, state, old_mo, new_mo):
+        self._content_hash = None
         start, end = self._resolve_range(old_mo)
         for key in self._storage.irange(start, end-1):
             val = self._storage[key]
@@ -260,6 +307,7 @@ class ListPage(BasePage):
             return [ self._page_addr + i for i,v in enumerate(self._storage) if v is not None ]
 
     def replace_mo(self, state, old_mo, new_mo):
+        self._content_hash = None
         if self._sinkhole is old_mo:
             self._sinkhole = new_mo
         else:
@@ -323,6 +371,17 @@ Page = ListPage
 
 #pylint:disable=unidiomatic-typecheck
 
+def _same_object_ranges(ours, theirs):
+    """
+    Check if two lists of object ranges, as returned by BasePage.object_ranges(), describe the same content.
+    """
+
+    if len(ours) != len(theirs):
+        return False
+    return all(a_start == b_start and a_end == b_end and a_mo == b_mo
+               for (a_start, a_end, a_mo), (b_start, b_end, b_mo) in zip(ours, theirs))
+
+
 class SimPagedMemory:
     """
     Represents paged memory.
@@ -333,6 +392,8 @@ class SimPagedMemory:
         self._permissions_backer = permissions_backer # saved for copying
         self._executable_pages = False if permissions_backer is None else permissions_backer[0]
         self._permission_map = { } if permissions_backer is None else permissions_backer[1]
+        # sorted segment starts and segments of the permission map, built on first use
+        self._permission_index = None
         self._pages = { } if pages is None else pages
         self._initialized = set() if initialized is None else initialized
         self._page_size = 0x1000 if page_size is None else page_size
@@ -345,6 +406,8 @@ class SimPagedMemory:
         self._name_mapping = ChainMap() if name_mapping is None else name_mapping
         self._hash_mapping = ChainMap() if hash_mapping is None else hash_mapping
         self._updated_mappings = set()
+        # the reverse mappings are only built when they are first queried
+        self._mappings_built = False
 
     def _page_align_down(self, x):
         return x - (x % self._page_size)
@@ -385,16 +448,21 @@ class SimPagedMemory:
             '_hash_mapping': self._hash_mapping,
             '_symbolic_addrs': self._symbolic_addrs,
             '_preapproved_stack': self._preapproved_stack,
-            '_check_perms': self._check_perms
+            '_check_perms': self._check_perms,
+            '_mappings_built': self._mappings_built,
         }
 
     def __setstate__(self, s):
         self._cowed = set()
+        self._updated_mappings = set()
+        self._mappings_built = False
+        self._permission_index = None
         self.__dict__.update(s)
 
     def branch(self):
-        new_name_mapping = self._name_mapping.new_child() if options.REVERSE_MEMORY_NAME_MAP in self.state.options else self._name_mapping
-        new_hash_mapping = self._hash_mapping.new_child() if options.REVERSE_MEMORY_HASH_MAP in self.state.options else self._hash_mapping
+        # the mappings are shared until one of the memories changes them
+        new_name_mapping = self._name_mapping.new_child() if self._mappings_built and options.REVERSE_MEMORY_NAME_MAP in self.state.options else self._name_mapping
+        new_hash_mapping = self._hash_mapping.new_child() if self._mappings_built and options.REVERSE_MEMORY_HASH_MAP in self.state.options else self._hash_mapping
 
         new_pages = dict(self._pages)
         self._cowed = set()
@@ -408,6 +476,8 @@ class SimPagedMemory:
                            symbolic_addrs=dict(self._symbolic_addrs),
                            check_permissions=self._check_perms)
         m._preapproved_stack = self._preapproved_stack
+        m._mappings_built = self._mappings_built
+        m._permission_index = self._permission_index
         return m
 
     def __getitem__(self, addr):
@@ -516,6 +586,15 @@ class SimPagedMemory:
         if self._memory_backer is None:
             pass
 
+        elif isinstance(self._memory_backer, HostFileBacker):
+            if self.byte_width != 8:
+                raise SimMemoryError("Host files can only back memories with 8-bit bytes.")
+            data = self._memory_backer.view(new_page_addr, new_page_addr + self._page_size)
+            if len(data):
+                mo = SimMemoryObject(data, new_page_addr)
+                self._apply_object_to_page(new_page_addr, mo, page=new_page)
+                initialized = True
+
         elif isinstance(self._memory_backer, cle.Clemory) and self._memory_backer.is_concrete_target_set():
             try:
                 concrete_memory = self._memory_backer.load(new_page_addr, self._page_size)
@@ -536,11 +615,9 @@ class SimPagedMemory:
         elif isinstance(self._memory_backer, cle.Clemory):
             # find permission backer associated with the address
             # fall back to default (read-write-maybe-exec) if can't find any
-            for start, end in self._permission_map:
-                if start <= new_page_addr < end:
-                    flags = self._permission_map[(start, end)]
-                    new_page.permissions = claripy.BVV(flags, 3)
-                    break
+            flags = self._backer_permissions(new_page_addr)
+            if flags is not None:
+                new_page.permissions = claripy.BVV(flags, 3)
 
             # for each clemory backer which intersects with the page, apply its relevant data
             for backer_addr, backer in self._memory_backer.backers(new_page_addr):
@@ -553,7 +630,13 @@ class SimPagedMemory:
                 slice_end = relevant_region_end - backer_addr
 
                 if self.byte_width == 8:
-                    relevant_data = bytes(memoryview(backer)[slice_start:slice_end])
+                    if self._backer_read_only(relevant_region_start, relevant_region_end):
+                        # reference the data of the backer instead of copying it. memory objects are never modified,
+                        # so a store to this page replaces the reference instead of writing through it
+                        relevant_data = memoryview(backer)[slice_start:slice_end]
+                    else:
+                        # the loader may still write to writable segments, e.g. when it applies relocations
+                        relevant_data = bytes(backer[slice_start:slice_end])
                     mo = SimMemoryObject(
                             relevant_data,
                             relevant_region_start,
@@ -604,6 +687,47 @@ class SimPagedMemory:
             self.state.scratch.pop_priv()
         return initialized
 
+    def _backer_permissions(self, addr):
+        """
+        Look up the permissions of the segment of the permissions backer that contains an address.
+
+        :param int addr:    The address.
+        :returns:           The permission flags, or None if no segment contains the address.
+        """
+
+        starts, segments = self._permission_segments()
+        i = bisect.bisect_right(starts, addr) - 1
+        if i >= 0 and addr < segments[i][1]:
+            return segments[i][2]
+        return None
+
+    def _backer_read_only(self, start, end):
+        """
+        Check if a range of addresses is covered by segments of the permissions backer that are not writable.
+
+        :param int start:   The first address of the range.
+        :param int end:     The address after the last address of the range.
+        :returns:           True if every address in the range is in a segment without write permission, False
+                            otherwise.
+        """
+
+        starts, segments = self._permission_segments()
+        i = bisect.bisect_right(starts, start) - 1
+        addr = start
+        while addr < end:
+            if i < 0 or i >= len(segments) or not segments[i][0] <= addr < segments[i][1] or segments[i][2] & 2:
+                return False
+            addr = segments[i][1]
+            i += 1
+        return True
+
+    def _permission_segments(self):
+        if self._permission_index is None:
+            # segments do not overlap, so the only candidate is the last segment that starts at or before an address
+            segments = sorted((start, end, flags) for (start, end), flags in self._permission_map.items())
+            self._permission_index = ([ start for start, _, _ in segments ], segments)
+        return self._permission_index
+
     def _get_page(self, page_num, write=False, create=False, initialize=True):
         page_addr = page_num * self._page_size
         try:
@@ -694,6 +818,10 @@ class SimPagedMemory:
 
             if our_page is their_page:
                 continue
+            # equal hashes are only a hint, since different contents may collide
+            if our_page.content_hash == their_page.content_hash and \
+                    _same_object_ranges(our_page.object_ranges(), their_page.object_ranges()):
+                continue
 
             our_keys = set(our_page.keys())
             their_keys = set(their_page.keys())
@@ -716,9 +844,9 @@ class SimPagedMemory:
             elif c in self and c not in other:
                 differences.add(c)
             else:
-                if type(self[c]) is not SimMemoryObject:
+                if not isinstance(self[c], SimMemoryObject):
                     self[c] = SimMemoryObject(self.state.solver.BVV(ord(self[c]), self.byte_width), c, byte_width=self.byte_width)
-                if type(other[c]) is not SimMemoryObject:
+                if not isinstance(other[c], SimMemoryObject):
                     other[c] = SimMemoryObject(self.state.solver.BVV(ord(other[c]), self.byte_width), c, byte_width=self.byte_width)
                 if c in self and self[c] != other[c]:
                     # Try to see if the bytes are equal
@@ -880,10 +1008,42 @@ class SimPagedMemory:
             d[m] = set()
         self._updated_mappings.add(m)
 
+    def _reverse_mappings_enabled(self):
+        return self._mappings_built and \
+               (options.REVERSE_MEMORY_NAME_MAP in self.state.options or
+                options.REVERSE_MEMORY_HASH_MAP in self.state.options)
+
+    def _build_mappings(self):
+        """
+        Build the reverse mappings from the current contents of memory. This happens when they are queried for the
+        first time, and from then on they are updated on every store.
+        """
+
+        if self._mappings_built:
+            return
+        self._mappings_built = True
+
+        name_map = options.REVERSE_MEMORY_NAME_MAP in self.state.options
+        hash_map = options.REVERSE_MEMORY_HASH_MAP in self.state.options
+        self._name_mapping = ChainMap()
+        self._hash_mapping = ChainMap()
+        self._updated_mappings = set()
+
+        for page in self._pages.values():
+            for start, end, mo in page.object_ranges():
+                # concrete data from the memory backers is never tracked
+                if mo.is_bytes:
+                    continue
+                addrs = range(start, end)
+                if name_map:
+                    for v in self.state.solver.variables(mo.object):
+                        self._name_mapping.setdefault(v, set()).update(addrs)
+                if hash_map:
+                    self._hash_mapping.setdefault(hash(mo.object), set()).update(addrs)
+
     def _update_range_mappings(self, actual_addr, cnt, size):
         if self.state is None or not \
-                (options.REVERSE_MEMORY_NAME_MAP in self.state.options or
-                options.REVERSE_MEMORY_HASH_MAP in self.state.options or
+                (self._reverse_mappings_enabled() or
                 options.MEMORY_SYMBOLIC_BYTES_MAP in self.state.options):
             return
 
@@ -894,13 +1054,12 @@ class SimPagedMemory:
         if options.MEMORY_SYMBOLIC_BYTES_MAP in self.state.options:
             page_num = actual_addr // self._page_size
             page_idx = actual_addr
-            if self.state.solver.symbolic(cnt):
+            if type(cnt) is not memoryview and self.state.solver.symbolic(cnt):
                 self._symbolic_addrs[page_num].add(page_idx)
             else:
                 self._symbolic_addrs[page_num].discard(page_idx)
 
-        if not (options.REVERSE_MEMORY_NAME_MAP in self.state.options or
-                options.REVERSE_MEMORY_HASH_MAP in self.state.options):
+        if not self._reverse_mappings_enabled():
             return
 
         if (options.REVERSE_MEMORY_HASH_MAP not in self.state.options) and \
@@ -963,6 +1122,7 @@ class SimPagedMemory:
         """
         Returns addresses that contain expressions that contain a variable named `n`.
         """
+        self._build_mappings()
         if n not in self._name_mapping:
             return
 
@@ -981,6 +1141,7 @@ class SimPagedMemory:
         """
         Returns addresses that contain expressions that contain a variable with the hash of `h`.
         """
+        self._build_mappings()
         if h not in self._hash_mapping:
             return
 
@@ -1079,7 +1240,7 @@ class SimPagedMemory:
                 page_addr = self._page_addr(page_id)
 
                 if self.byte_width == 8:
-                    content = b'\0' * self._page_size
+                    content = filled_bytes(0, self._page_size)
                 else:
                     content = claripy.BVV(0, self._page_size * self.byte_width)
 
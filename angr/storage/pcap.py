@@ -1,43 +1,141 @@
-import dpkt
+import array
 import socket
+import struct
 import logging
+
+from .host_file import HostFileBacker
+from ..errors import SimFileError
+
 l = logging.getLogger(name=__name__)
 
+# magic -> byte order of the headers. the nanosecond variants only differ in the precision of the timestamps
+_PCAP_MAGICS = {
+    b'\xd4\xc3\xb2\xa1': '<',
+    b'\xa1\xb2\xc3\xd4': '>',
+    b'\x4d\x3c\xb2\xa1': '<',
+    b'\xa1\xb2\x3c\x4d': '>',
+}
+_LINKTYPE_ETHERNET = 1
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_VLAN = 0x8100
+_IPPROTO_TCP = 6
+
+
+class PCAPPackets:
+    """
+    The TCP payloads of one direction of a capture. Payloads are read from the memory-mapped capture when they are
+    accessed, as (length, data) tuples where data is a memoryview.
+    """
+
+    def __init__(self, backer):
+        self.backer = backer
+        self.offsets = array.array('Q')
+        self.lengths = array.array('I')
+
+    def _append(self, offset, length):
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        offset = self.offsets[i]
+        length = self.lengths[i]
+        return length, self.backer.view(offset, offset + length)
+
+    def __iter__(self):
+        for i in range(len(self.offsets)):
+            yield self[i]
+
 
-class PCAP(object):
-    def __init__(self,path, ip_port_tup, init=True):
+class PCAP:
+    """
+    A capture of the TCP traffic of a network service, in the pcap format.
+
+    The capture is memory-mapped and indexed once: for every packet with a TCP payload, only the offset and the length
+    of the payload are recorded. Payloads are read from the mapping on access, so captures of any size can be replayed,
+    and copies of a PCAP share the index and the mapping.
+
+    :param str path:            The path of the capture.
+    :param tuple ip_port_tup:   The IP address and port of the service. Payloads sent to it are in out_streams, and
+                                all other payloads are in in_streams.
+    :param bool init:           Whether to index the capture right away.
+    """
+
+    def __init__(self, path, ip_port_tup, init=True):
         self.path = path
         self.packet_num = 0
         self.pos = 0
-        self.in_streams = []
-        self.out_streams = []
-        #self.in_buf = ''
+        self.in_streams = None
+        self.out_streams = None
         self.ip = ip_port_tup[0]
         self.port = ip_port_tup[1]
         if init:
             self.initialize(self.path)
 
-    def initialize(self,path):
-        f = open(path)
-        pcap = dpkt.pcap.Reader(f)
-        for _,buf in pcap:
-            #data = dpkt.ethernet.Ethernet(buf).ip.data.data
-            ip = dpkt.ethernet.Ethernet(buf).ip
-            tcp = ip.data
-            myip = socket.inet_ntoa(ip.dst)
-            if myip is self.ip and tcp.dport is self.port and len(tcp.data) is not 0:
-                self.out_streams.append((len(tcp.data),tcp.data))
-            elif len(tcp.data) is not 0:
-                self.in_streams.append((len(tcp.data),tcp.data))
-        f.close()
+    def initialize(self, path):
+        backer = HostFileBacker(path)
+        self.in_streams = PCAPPackets(backer)
+        self.out_streams = PCAPPackets(backer)
+
+        header = backer.view(0, 24)
+        if len(header) < 24 or header[:4].tobytes() not in _PCAP_MAGICS:
+            raise SimFileError("%s is not a pcap file" % path)
+        endness = _PCAP_MAGICS[header[:4].tobytes()]
+        linktype = struct.unpack(endness + 'I', header[20:24])[0] & 0xffff
+        if linktype != _LINKTYPE_ETHERNET:
+            raise SimFileError("Unsupported link type %d in %s" % (linktype, path))
+
+        record_header = struct.Struct(endness + 'IIII')
+        offset = 24
+        while offset + 16 <= len(backer):
+            _, _, captured_len, _ = record_header.unpack(backer.view(offset, offset + 16))
+            offset += 16
+            self._index_frame(backer.view(offset, offset + captured_len), offset)
+            offset += captured_len
+
+    def _index_frame(self, frame, frame_offset):
+        # ethernet, with an optional VLAN tag
+        if len(frame) < 14:
+            return
+        ethertype = struct.unpack('>H', frame[12:14])[0]
+        ip_start = 14
+        if ethertype == _ETHERTYPE_VLAN and len(frame) >= 18:
+            ethertype = struct.unpack('>H', frame[16:18])[0]
+            ip_start = 18
+        if ethertype != _ETHERTYPE_IPV4 or len(frame) < ip_start + 20:
+            return
+
+        # IPv4
+        ip_header_len = (frame[ip_start] & 0xf) * 4
+        ip_len = struct.unpack('>H', frame[ip_start + 2:ip_start + 4])[0]
+        if frame[ip_start + 9] != _IPPROTO_TCP:
+            return
+        dst = socket.inet_ntoa(frame[ip_start + 16:ip_start + 20].tobytes())
+
+        # TCP. the frame may be padded, so the length of the payload comes from the IP header
+        tcp_start = ip_start + ip_header_len
+        if len(frame) < tcp_start + 20:
+            return
+        dport = struct.unpack('>H', frame[tcp_start + 2:tcp_start + 4])[0]
+        tcp_header_len = (frame[tcp_start + 12] >> 4) * 4
+        data_start = tcp_start + tcp_header_len
+        data_len = min(ip_len - ip_header_len - tcp_header_len, len(frame) - data_start)
+        if data_len <= 0:
+            return
+
+        if dst == self.ip and dport == self.port:
+            self.out_streams._append(frame_offset + data_start, data_len)
+        else:
+            self.in_streams._append(frame_offset + data_start, data_len)
 
     def recv(self, length):
         temp = 0
-        #pcap = self.pcap
         initial_packet = self.packet_num
         plength, pdata = self.in_streams[self.packet_num]
         length = min(length, plength)
-        if self.pos is 0:
+        if self.pos == 0:
             if plength > length:
                 temp = length
             else:
@@ -53,9 +151,9 @@ class PCAP(object):
 
             packet_data = pdata[self.pos:plength]
 
-        if self.packet_num is not initial_packet:
+        if self.packet_num != initial_packet:
             self.pos = 0
-        return packet_data, length
+        return packet_data.tobytes(), length
 
     def copy(self):
         new_pcap = PCAP(self.path, (self.ip, self.port), init=False)
@@ -6,6 +6,7 @@ import logging
 import claripy
 import pickle
 import shelve
+import shutil
 import uuid
 import os
 import io
@@ -22,6 +23,8 @@ class VaultPickler(pickle.Pickler):
         super().__init__(file, *args, **kwargs)
         self.vault = vault
         self.assigned_objects = assigned_objects
+        # IDs of all persistently stored objects that the pickled object refers to
+        self.references = set()
 
     def persistent_id(self, obj):
         if any(obj is o for o in self.assigned_objects):
@@ -32,7 +35,9 @@ class VaultPickler(pickle.Pickler):
             return None
 
         l.debug("Persistent store: %s %s", obj, pid)
-        return self.vault.store(obj, id=pid)
+        pid = self.vault._store(obj, id=pid)
+        self.references.add(pid)
+        return pid
 
 class VaultUnpickler(pickle.Unpickler):
     def __init__(self, vault, file, *args, **kwargs):
@@ -69,6 +74,12 @@ class Vault(collections.MutableMapping):
         """
         raise NotImplementedError()
 
+    def _delete(self, i):
+        """
+        Should delete the object with the given id i, or raise AngrVaultError if there is no such object.
+        """
+        raise AngrVaultError("We currently don't support deletion from the vault.")
+
     #
     # Persistance managers
     #
@@ -78,6 +89,12 @@ class Vault(collections.MutableMapping):
         self._uuid_cache = weakref.WeakKeyDictionary()
         self.stored = set()
         self.storing = set()
+        # IDs of objects that have been stored explicitly, which are only deleted explicitly
+        self._roots = set()
+        # ID -> IDs of the deduplicated objects that the stored object refers to
+        self._references = { }
+        # ID -> number of stored objects that refer to the deduplicated object
+        self._refcounts = collections.Counter()
         self.hash_dedup = {
             claripy.ast.Base, claripy.ast.BV, claripy.ast.FP, claripy.ast.Bool, claripy.ast.Int, claripy.ast.Bits,
         }
@@ -156,6 +173,11 @@ class Vault(collections.MutableMapping):
         :param o: the object
         :param id: an ID to use
         """
+        actual_id = self._store(o, id=id)
+        self._roots.add(actual_id)
+        return actual_id
+
+    def _store(self, o, id=None): #pylint:disable=redefined-builtin
         actual_id = id or self._get_persistent_id(o) or "TMP-"+str(uuid.uuid4())
 
         l.debug("STORE: %s %s", o, actual_id)
@@ -170,9 +192,15 @@ class Vault(collections.MutableMapping):
 
         with self._write_context(actual_id) as output:
             self.storing.add(actual_id)
-            VaultPickler(self, output, assigned_objects=(o,)).dump(o)
+            try:
+                pickler = VaultPickler(self, output, assigned_objects=(o,))
+                pickler.dump(o)
+            finally:
+                self.storing.discard(actual_id)
             self.stored.add(actual_id)
 
+        self._references[actual_id] = pickler.references
+        self._refcounts.update(pickler.references)
         return actual_id
 
     def dumps(self, o):
@@ -182,7 +210,10 @@ class Vault(collections.MutableMapping):
         :param o: the object
         """
         f = io.BytesIO()
-        VaultPickler(self, f).dump(o)
+        pickler = VaultPickler(self, f)
+        pickler.dump(o)
+        # there is no telling when the string is not used any more, so the objects it refers to are never deleted
+        self._roots.update(pickler.references)
         f.seek(0)
         return f.read()
 
@@ -199,6 +230,27 @@ class Vault(collections.MutableMapping):
     def close():
         pass
 
+    def _forget(self, i):
+        """
+        Drop the bookkeeping of an object that has been deleted from the vault, and delete the deduplicated objects that
+        it referred to if no other stored object refers to them any more.
+        """
+        forget = [ i ]
+        while forget:
+            i = forget.pop()
+            self.stored.discard(i)
+            self._object_cache.pop(i, None)
+            for ref in self._references.pop(i, ()):
+                self._refcounts[ref] -= 1
+                if self._refcounts[ref] > 0:
+                    continue
+                del self._refcounts[ref]
+                if ref in self._roots:
+                    continue
+                with contextlib.suppress(AngrVaultError):
+                    self._delete(ref)
+                forget.append(ref)
+
     #
     # For MutableMapping.
     #
@@ -210,7 +262,9 @@ class Vault(collections.MutableMapping):
         return self.load(k)
 
     def __delitem__(self, k):
-        raise AngrVaultError("We currently don't support deletion from the vault.")
+        self._delete(k)
+        self._roots.discard(k)
+        self._forget(k)
 
     def __iter__(self):
         return iter(self.keys())
@@ -247,15 +301,23 @@ class VaultDict(Vault):
     def keys(self):
         return self._dict.keys()
 
+    def _delete(self, i):
+        try:
+            del self._dict[i]
+        except KeyError as e:
+            raise AngrVaultError from e
+
 class VaultDir(Vault):
     """
-    A Vault that uses a directory for storage.
+    A Vault that uses a directory for storage. A temporary directory is used by default, which is removed when the
+    vault is closed or garbage-collected.
     """
     def __init__(self, d=None):
         super().__init__()
         self._dir = tempfile.mkdtemp() if d is None else d
         with contextlib.suppress(FileExistsError):
             os.makedirs(self._dir)
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self._dir, True) if d is None else None
 
     @contextlib.contextmanager
     def _write_context(self, i):
@@ -273,6 +335,16 @@ class VaultDir(Vault):
     def keys(self):
         return os.listdir(self._dir)
 
+    def _delete(self, i):
+        try:
+            os.remove(os.path.join(self._dir, i))
+        except FileNotFoundError as e:
+            raise AngrVaultError from e
+
+    def close(self):
+        if self._finalizer is not None:
+            self._finalizer()
+
 class VaultShelf(VaultDict):
     """
     A Vault that uses a shelve.Shelf for storage.
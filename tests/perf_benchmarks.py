@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+
+# Throughput benchmarks for CFG recovery, decompilation, data-flow analyses, and symbolic execution.
+#
+# Each benchmark runs in a fresh process against a fixed set of binaries from the binaries repository, and records the
+# wall time, the number of blocks lifted per second, the peak RSS of the process, and the number of solver calls.
+# Memory footprint benchmarks also record the memory that is retained by the states they create.
+#
+#   python perf_benchmarks.py                           # run all benchmarks
+#   python perf_benchmarks.py cfgfast_dir simgr_fauxware  # run selected benchmarks
+#   python perf_benchmarks.py -o results.json           # save results, e.g., as a new baseline
+#   python perf_benchmarks.py -b baseline.json          # compare against a baseline. exits with 1 on regressions
+#
+# Benchmarks that fail or whose process dies are reported, and make the script exit with 1.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import resource
+import functools
+import traceback
+import contextlib
+import multiprocessing
+import queue as queue_mod
+
+import claripy
+
+import angr
+from angr.engines.vex.lifter import VEXLifter
+from angr.storage import paged_memory
+
+
+test_location = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'binaries', 'tests')
+
+# metric name -> (True if larger is better, default regression threshold)
+METRICS = {
+    'wall_time': (False, 0.15),
+    'blocks_per_sec': (True, 0.15),
+    'peak_rss_mb': (False, 0.10),
+    'solver_calls': (False, 0.05),
+    'retained_mb': (False, 0.10),
+}
+
+SOLVER_METHODS = ('satisfiable', 'eval', 'batch_eval', 'min', 'max', 'solution')
+
+
+class Measurement:
+    """
+    Measures wall time, lifted blocks and solver calls of the code running inside measure().
+    """
+
+    def __init__(self):
+        self.wall_time = 0.0
+        self.lifted_blocks = 0
+        self.solver_calls = 0
+        self.retained_bytes = 0
+
+    @contextlib.contextmanager
+    def measure(self):
+        original_lift_vex = VEXLifter.lift_vex
+        z3 = claripy.backends.z3
+
+        def lift_vex(*args, **kwargs):
+            self.lifted_blocks += 1
+            return original_lift_vex(*args, **kwargs)
+
+        def count_solver_calls(method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                self.solver_calls += 1
+                return method(*args, **kwargs)
+            return wrapper
+
+        VEXLifter.lift_vex = lift_vex
+        for name in SOLVER_METHODS:
+            setattr(z3, name, count_solver_calls(getattr(z3, name)))
+
+        start = time.time()
+        try:
+            yield self
+        finally:
+            self.wall_time += time.time() - start
+            VEXLifter.lift_vex = original_lift_vex
+            for name in SOLVER_METHODS:
+                delattr(z3, name)
+
+    @contextlib.contextmanager
+    def measure_retained(self):
+        """
+        Measures the memory that is allocated inside the block and is still alive at its end.
+        """
+
+        tracemalloc.start()
+        try:
+            yield self
+            self.retained_bytes += tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    def results(self):
+        return {
+            'wall_time': self.wall_time,
+            'blocks_per_sec': self.lifted_blocks / self.wall_time if self.wall_time > 0 else 0.0,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+            'solver_calls': self.solver_calls,
+            'retained_mb': self.retained_bytes / (1024.0 * 1024.0),
+        }
+
+
+def _project(arch, name):
+    return angr.Project(os.path.join(test_location, arch, name), auto_load_libs=False)
+
+
+#
+# Benchmarks
+#
+
+def bench_cfgfast_dir(m):
+    p = _project('x86_64', 'dir_gcc_-O0')
+    with m.measure():
+        p.analyses.CFGFast()
+
+
+def bench_cfgfast_dir_data_refs(m):
+    p = _project('x86_64', 'dir_gcc_-O0')
+    with m.measure():
+        p.analyses.CFGFast(data_references=True)
+
+
+def bench_cfgfast_armel_switches(m):
+    p = _project('armel', 'cfg_switches')
+    with m.measure():
+        p.analyses.CFGFast()
+
+
+def bench_cfgemulated_fauxware(m):
+    p = _project('x86_64', 'fauxware')
+    with m.measure():
+        p.analyses.CFGEmulated(keep_state=True, context_sensitivity_level=1)
+
+
+def bench_variable_recovery_all(m):
+    p = _project('x86_64', 'all')
+    cfg = p.analyses.CFGFast(normalize=True)
+    funcs = [ f for f in cfg.kb.functions.values() if not f.is_simprocedure and not f.is_plt ]
+    with m.measure():
+        for f in funcs:
+            p.analyses.VariableRecoveryFast(f, kb=angr.KnowledgeBase(p))
+
+
+def bench_clinic_all(m):
+    p = _project('x86_64', 'all')
+    cfg = p.analyses.CFGFast(normalize=True, data_references=True)
+    funcs = [ f for f in cfg.kb.functions.values() if not f.is_simprocedure and not f.is_plt ]
+    with m.measure():
+        for f in funcs:
+            p.analyses.Clinic(f)
+
+
+def bench_decompiler_all(m):
+    p = _project('x86_64', 'all')
+    cfg = p.analyses.CFGFast(normalize=True, data_references=True)
+    funcs = [ f for f in cfg.kb.functions.values() if not f.is_simprocedure and not f.is_plt ]
+    with m.measure():
+        for f in funcs:
+            p.analyses.Decompiler(f, cfg=cfg)
+
+
+def bench_reaching_definitions_all(m):
+    p = _project('x86_64', 'all')
+    cfg = p.analyses.CFGFast()
+    funcs = [ f for f in cfg.kb.functions.values() if not f.is_simprocedure and not f.is_plt ]
+    with m.measure():
+        for f in funcs:
+            p.analyses.ReachingDefinitions(subject=f, init_func=True, kb=angr.KnowledgeBase(p), observe_all=True)
+
+
+def bench_simgr_fauxware(m):
+    p = _project('x86_64', 'fauxware')
+    simgr = p.factory.simulation_manager(p.factory.entry_state())
+    with m.measure():
+        simgr.run()
+
+
+def bench_simgr_counter(m):
+    p = _project('x86_64', 'counter')
+    state = p.factory.entry_state(add_options={angr.options.SYMBOL_FILL_UNCONSTRAINED_MEMORY,
+                                               angr.options.SYMBOL_FILL_UNCONSTRAINED_REGISTERS})
+    simgr = p.factory.simulation_manager(state)
+    with m.measure():
+        simgr.run(n=500)
+
+
+def _state_population(m, page_cls):
+    # keep a copy of every state that is stepped through, like exploration techniques that never drop states do
+    p = _project('x86_64', 'fauxware')
+    paged_memory.Page = page_cls
+    states = [ ]
+
+    def keep_all(simgr):
+        states.extend(s.copy() for s in simgr.active)
+        return simgr
+
+    with m.measure(), m.measure_retained():
+        simgr = p.factory.simulation_manager(p.factory.entry_state())
+        simgr.run(step_func=keep_all)
+        for s in states:
+            # touch the stack and the data of the binary in every state
+            s.memory.load(s.regs.sp, 0x40)
+            s.memory.load(p.loader.main_object.min_addr, 0x40)
+    return states
+
+
+def bench_footprint_treepage(m):
+    _state_population(m, paged_memory.TreePage)
+
+
+def bench_footprint_listpage(m):
+    _state_population(m, paged_memory.ListPage)
+
+
+BENCHMARKS = { k[len('bench_'):]: v for k, v in sorted(globals().items()) if k.startswith('bench_') and callable(v) }
+
+
+#
+# Running and comparing
+#
+
+class BenchmarkError(Exception):
+    pass
+
+
+def run_one(name, queue):
+    try:
+        m = Measurement()
+        BENCHMARKS[name](m)
+        queue.put((m.results(), None))
+    except Exception:  # pylint:disable=broad-except
+        queue.put((None, traceback.format_exc()))
+
+
+def _run_in_process(name):
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=run_one, args=(name, queue))
+    proc.start()
+    try:
+        while True:
+            try:
+                r, error = queue.get(timeout=1)
+                break
+            except queue_mod.Empty:
+                # the child may have died without reporting anything, e.g., when it was killed by the OOM killer
+                if not proc.is_alive() and queue.empty():
+                    raise BenchmarkError("Benchmark %s died with exit code %s." % (name, proc.exitcode))
+    finally:
+        proc.join()
+    if error is not None:
+        raise BenchmarkError("Benchmark %s failed:\n%s" % (name, error))
+    return r
+
+
+def run_benchmark(name, runs, inline=False):
+    """
+    Run a benchmark several times, and keep the best result of each metric.
+
+    :raises BenchmarkError: If the benchmark fails or its process dies.
+    """
+
+    all_results = [ ]
+    for _ in range(runs):
+        if inline:
+            m = Measurement()
+            BENCHMARKS[name](m)
+            all_results.append(m.results())
+        else:
+            all_results.append(_run_in_process(name))
+
+    results = { }
+    for metric, (larger_is_better, _) in METRICS.items():
+        values = [ r[metric] for r in all_results ]
+        results[metric] = max(values) if larger_is_better else min(values)
+    return results
+
+
+def compare(results, baseline, thresholds):
+    """
+    Compare results against a baseline.
+
+    :return: A list of (benchmark, metric, baseline value, current value) for all regressions.
+    """
+
+    regressions = [ ]
+    for name, metrics in sorted(results.items()):
+        if name not in baseline:
+            continue
+        for metric, value in metrics.items():
+            base = baseline[name].get(metric, None)
+            if not base:
+                continue
+            larger_is_better = METRICS[metric][0]
+            change = (value - base) / base
+            if (-change if larger_is_better else change) > thresholds[metric]:
+                regressions.append((name, metric, base, value))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    header = "%-32s %12s %16s %14s %14s %14s" % ('benchmark', 'wall time (s)', 'blocks/sec', 'peak RSS (MB)',
+                                                  'solver calls', 'retained (MB)')
+    print(header)
+    print('-' * len(header))
+    for name, r in sorted(results.items()):
+        print("%-32s %12.3f %16.1f %14.1f %14d %14.1f" % (name, r['wall_time'], r['blocks_per_sec'], r['peak_rss_mb'],
+                                                          r['solver_calls'], r['retained_mb']))
+        if baseline is not None and name in baseline:
+            b = baseline[name]
+            print("%-32s %12.3f %16.1f %14.1f %14d %14.1f" % ('  (baseline)', b['wall_time'], b['blocks_per_sec'],
+                                                              b['peak_rss_mb'], b['solver_calls'],
+                                                              b.get('retained_mb', 0.0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='angr throughput benchmarks')
+    parser.add_argument('benchmarks', nargs='*', help='Benchmarks to run (default: all). Available: ' +
+                                                      ', '.join(BENCHMARKS))
+    parser.add_argument('-n', '--n-runs', default=3, type=int, help='How many runs for each benchmark (default: 3)')
+    parser.add_argument('-i', '--inline', action='store_true', help='Run benchmarks inline (not in fresh processes)')
+    parser.add_argument('-o', '--output', help='Save results to a JSON file')
+    parser.add_argument('-b', '--baseline', help='Compare results against a baseline JSON file')
+    for metric, (_, threshold) in METRICS.items():
+        parser.add_argument('--%s-threshold' % metric.replace('_', '-'), type=float, default=threshold,
+                            dest='%s_threshold' % metric,
+                            help='Allowed relative regression of %s (default: %.2f)' % (metric, threshold))
+    args = parser.parse_args()
+
+    names = args.benchmarks if args.benchmarks else list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error('Unknown benchmark %s.' % name)
+
+    results = { }
+    failed = [ ]
+    for name in names:
+        print('Running %s...' % name)
+        try:
+            results[name] = run_benchmark(name, args.n_runs, inline=args.inline)
+        except BenchmarkError as ex:
+            print('FAILED: %s' % ex)
+            failed.append(name)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    print_results(results, baseline=baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        thresholds = { metric: getattr(args, '%s_threshold' % metric) for metric in METRICS }
+        regressions = compare(results, baseline, thresholds)
+        for name, metric, base, value in regressions:
+            print('REGRESSION: %s %s: %s -> %s' % (name, metric, base, value))
+        if regressions:
+            sys.exit(1)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,5 +16,52 @@ def test_procedure_actions():
     nose.tools.assert_equal(s.solver.eval(rbx), 2)
     nose.tools.assert_equal(rbx.reg_deps, { s.arch.registers['rbx'][0] })
 
+def test_columnar_actions():
+    # mov rax, [0x1000]; mov [0x2000], rbx; mov [0x2008], rbx
+    code = b"\x48\x8b\x04\x25\x00\x10\x00\x00\x48\x89\x1c\x25\x00\x20\x00\x00\x48\x89\x1c\x25\x08\x20\x00\x00"
+    proj = angr.load_shellcode(code, "amd64")
+    tracking = { angr.sim_options.TRACK_MEMORY_ACTIONS, angr.sim_options.TRACK_REGISTER_ACTIONS,
+                 angr.sim_options.TRACK_JMP_ACTIONS }
+
+    results = { }
+    for add_options in (tracking, tracking | { angr.sim_options.COLUMNAR_ACTIONS }):
+        state = proj.factory.blank_state(addr=0, add_options=add_options)
+        state.regs.rbx = 0x41
+        succ = proj.factory.successors(state)
+        s = succ.flat_successors[0]
+
+        reads = s.history.filter_actions(read_from=0x1000)
+        nose.tools.assert_equal(len(reads), 1)
+        nose.tools.assert_equal(reads[0].action, 'read')
+        nose.tools.assert_equal(reads[0].ins_addr, 0)
+
+        writes = s.history.filter_actions(write_to='mem')
+        nose.tools.assert_equal(len(writes), 2)
+        # the most recent action comes first
+        nose.tools.assert_equal(writes[0].ins_addr, 0x10)
+        nose.tools.assert_equal(s.solver.eval(writes[0].data), 0x41)
+        nose.tools.assert_equal(len(s.history.filter_actions(write_to=0x2008)), 1)
+        nose.tools.assert_equal(len(s.history.filter_actions(insn_addr=8, write_to=0x2008)), 0)
+
+        results[angr.sim_options.COLUMNAR_ACTIONS in add_options] = (
+            len(s.history.filter_actions(read_from='rbx')),
+            len(s.history.filter_actions(write_to='rax')),
+            len(s.history.filter_actions(block_addr=0)),
+        )
+
+        log = s.history.recent_action_log
+        if angr.sim_options.COLUMNAR_ACTIONS in add_options:
+            # no SimAction objects are created
+            nose.tools.assert_equal(s.history.recent_actions, [ ])
+            nose.tools.assert_equal(len(log.query(region='mem', addr=0x2000)), 1)
+            nose.tools.assert_equal([ r.exit_type for r in log.records(log.query(
+                kinds=(angr.state_plugins.SimActionLog.EXIT_DEFAULT, ))) ], [ 'default' ])
+            nose.tools.assert_equal(len(log.copy()), len(log))
+        else:
+            nose.tools.assert_is_none(log)
+
+    nose.tools.assert_equal(results[True], results[False])
+
 if __name__ == '__main__':
     test_procedure_actions()
+    test_columnar_actions()
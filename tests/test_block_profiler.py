@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+import nose
+
+import angr
+from angr.state_plugins.solver import SimSolver, SolverClock, set_solver_clock
+
+test_location = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'binaries', 'tests')
+
+
+def test_block_profiler():
+    p = angr.Project(os.path.join(test_location, 'x86_64', 'fauxware'), auto_load_libs=False)
+    cfg = p.analyses.CFGFast()
+    main = cfg.kb.functions['main']
+
+    simgr = p.factory.simulation_manager()
+    profiler = angr.exploration_techniques.BlockProfiler()
+    simgr.use_technique(profiler)
+    simgr.run()
+
+    blocks = profiler.hot_blocks(n=None)
+    nose.tools.assert_true(blocks)
+    nose.tools.assert_true(any(b['kind'] == 'procedure' for b in blocks))
+    nose.tools.assert_true(all(b['count'] > 0 for b in blocks))
+    nose.tools.assert_true(all(b['solver_time'] <= b['engine_time'] for b in blocks))
+    # the authentication check forks
+    nose.tools.assert_greater(sum(b['forks'] for b in blocks), 0)
+    nose.tools.assert_equal(profiler.hot_blocks(n=1, key='count')[0]['count'], max(b['count'] for b in blocks))
+
+    summary = profiler.function_summary()
+    nose.tools.assert_in(main.addr, summary)
+    nose.tools.assert_equal(summary[main.addr]['name'], 'main')
+    nose.tools.assert_equal(sum(s['count'] for s in summary.values()), sum(b['count'] for b in blocks))
+    nose.tools.assert_true(profiler.format_report())
+
+    folded = profiler.folded_stacks()
+    nose.tools.assert_true(folded)
+    nose.tools.assert_true(any(line.startswith(('main;', '_start;')) or ';main;' in line
+                               for line in folded.split('\n')))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'run.folded')
+        profiler.dump_flamegraph(path)
+        with open(path, 'r') as f:
+            for line in f:
+                stack, micro = line.rsplit(' ', 1)
+                nose.tools.assert_true(stack)
+                nose.tools.assert_greater(int(micro), 0)
+
+    profiler.clear()
+    nose.tools.assert_equal(profiler.hot_blocks(), [ ])
+
+
+def test_solver_clock():
+    p = angr.Project(os.path.join(test_location, 'x86_64', 'fauxware'), auto_load_libs=False)
+    state = p.factory.blank_state()
+    x = state.solver.BVS('x', 32)
+    state.solver.add(x > 10)
+
+    satisfiable = SimSolver.__dict__['satisfiable']
+    clock = SolverClock()
+    previous = set_solver_clock(clock)
+    try:
+        # solver methods are only wrapped while a clock is installed
+        nose.tools.assert_is_not(SimSolver.__dict__['satisfiable'], satisfiable)
+        state.solver.eval(x)
+        state.solver.satisfiable()
+    finally:
+        set_solver_clock(previous)
+    nose.tools.assert_is(SimSolver.__dict__['satisfiable'], satisfiable)
+
+    # each top-level query is counted once
+    nose.tools.assert_equal(clock.queries, 2)
+    nose.tools.assert_greater(clock.total, 0.0)
+
+    state.solver.satisfiable()
+    nose.tools.assert_equal(clock.queries, 2)
+
+
+if __name__ == '__main__':
+    test_block_profiler()
+    test_solver_clock()
@@ -7,7 +7,7 @@ import nose.tools
 import archinfo
 import angr
 
-from angr.analyses.cfg.cfg_fast import SegmentList
+from angr.analyses.cfg.cfg_fast import SegmentList, DataRefsBuffer
 from angr.knowledge_plugins.cfg import CFGNode, CFGModel, MemoryDataSort
 
 l = logging.getLogger("angr.tests.test_cfgfast")
@@ -698,6 +698,27 @@ def test_data_references():
     nose.tools.assert_equal(sneaky_str.sort, "string")
     nose.tools.assert_equal(sneaky_str.content, b"SOSNEAKY")
 
+    # all collected data references are processed after CFG recovery
+    nose.tools.assert_equal(len(cfg._data_refs), 0)
+
+
+def test_data_refs_buffer():
+
+    buf = DataRefsBuffer()
+    buf.add(0x400000, 3, 0x400004, 0x601000, data_size=8, data_type="integer")
+    buf.add(0x400010, 1, 0x400012, 0x600000)
+    buf.add(0x400020, 5, 0x400024, 0x601000, data_size=4, data_type="fp")
+
+    nose.tools.assert_equal(len(buf), 3)
+    nose.tools.assert_is(buf.data_size(1), None)
+    nose.tools.assert_is(buf.data_type(1), None)
+    nose.tools.assert_equal(buf.data_size(2), 4)
+    nose.tools.assert_equal(buf.data_type(0), "integer")
+    nose.tools.assert_equal(buf.data_type(2), "fp")
+
+    buf.clear()
+    nose.tools.assert_equal(len(buf), 0)
+
 
 #
 # CFG with patches
@@ -804,6 +825,7 @@ def run_all():
     test_tail_call_optimization_detection_armel()
     test_blanket_fauxware()
     test_data_references()
+    test_data_refs_buffer()
     test_function_leading_blocks_merging()
     test_cfg_with_patches()
     test_indirect_jump_to_outside()
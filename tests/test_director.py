@@ -57,6 +57,46 @@ def test_call_function_brancher():
     nose.tools.assert_is_not(NonLocal.the_state, None)
     nose.tools.assert_is(NonLocal.the_goal, goal)
 
+def test_execute_address_brancher_with_cfg():
+
+    p = angr.Project(os.path.join(test_location, 'x86_64', 'brancher'), load_options={'auto_load_libs': False})
+    cfg = p.analyses.CFGEmulated(keep_state=True)
+
+    pg = p.factory.simulation_manager()
+
+    # reuse the existing CFG instead of building one from the active states
+    dm = angr.exploration_techniques.Director(num_fallback_states=1, cfg=cfg)
+    goal = angr.exploration_techniques.ExecuteAddressGoal(0x400594)
+    dm.add_goal(goal)
+    pg.use_technique(dm)
+
+    pg.explore(find=(0x4005b4,))
+
+    nose.tools.assert_is(dm._cfg, cfg)
+    nose.tools.assert_greater(len(pg.deprioritized), 0)
+    nose.tools.assert_greater(dm.peek_cache_hits, 0)
+    nose.tools.assert_true(dm._goal_cache)
+
+def test_peek_depth_brancher():
+
+    p = angr.Project(os.path.join(test_location, 'x86_64', 'brancher'), load_options={'auto_load_libs': False})
+
+    pg = p.factory.simulation_manager()
+
+    dm = angr.exploration_techniques.Director(peek_blocks=3, num_fallback_states=1)
+    goal = angr.exploration_techniques.ExecuteAddressGoal(0x400594)
+    dm.add_goal(goal)
+    pg.use_technique(dm)
+
+    for _ in range(6):
+        pg.step()
+        dm._peek_forward(pg)
+        # states inside a region that was peeked from an earlier state still have the full peek depth ahead of them
+        for state in pg.active:
+            node = angr.exploration_techniques.director.BaseGoal._get_cfg_node(dm._cfg, state)
+            if node is not None:
+                nose.tools.assert_equal(dm._paused_nodes(node), { })
+
 if __name__ == "__main__":
 
     logging.getLogger('angr.exploration_techniques.director').setLevel(logging.DEBUG)
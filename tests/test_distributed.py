@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+import nose
+
+import angr
+
+location = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'binaries', 'tests')
+
+
+def _explore_fauxware(simgr):
+    simgr.use_technique(angr.exploration_techniques.Explorer(find=0x4006ed))
+
+
+def test_distributed_fauxware():
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), auto_load_libs=False)
+
+    simgr = p.factory.simulation_manager()
+    _explore_fauxware(simgr)
+    simgr.run()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        checkpoint = os.path.join(tmpdir, 'checkpoint')
+        dsimgr = p.factory.simulation_manager()
+        tech = dsimgr.use_technique(angr.exploration_techniques.Distributed(workers=2, batch_size=1, steps_per_batch=4,
+                                                                            worker_setup=_explore_fauxware,
+                                                                            checkpoint=checkpoint))
+        dsimgr.run()
+
+        nose.tools.assert_equal(len(dsimgr.found), len(simgr.found))
+        nose.tools.assert_equal(len(dsimgr.deadended), len(simgr.deadended))
+        nose.tools.assert_in(b"SOSNEAKY", dsimgr.found[0].posix.dumps(0))
+        nose.tools.assert_greater(tech.batches_done, 1)
+        nose.tools.assert_equal(tech.batches_retried, 0)
+        # all workers are stopped once everything is explored
+        nose.tools.assert_is_none(tech._broker)
+
+        # resume from the final checkpoint
+        rsimgr = p.factory.simulation_manager()
+        rsimgr.use_technique(angr.exploration_techniques.Distributed(workers=1, checkpoint=checkpoint))
+        nose.tools.assert_equal(len(rsimgr.active), 0)
+        nose.tools.assert_equal(len(rsimgr.found), len(simgr.found))
+        nose.tools.assert_equal(len(rsimgr.deadended), len(simgr.deadended))
+
+
+if __name__ == '__main__':
+    test_distributed_fauxware()
@@ -1,8 +1,17 @@
 
+import os
+import socket
+import struct
+import tempfile
+
 import nose.tools
 
 import angr
 from angr.state_plugins.posix import Flags
+from angr.state_plugins.filesystem import SimHostFilesystem
+from angr.storage.file import SimMappedFile, SimPacketsStream
+from angr.storage.host_file import HostFileBacker
+from angr.storage.pcap import PCAP
 
 
 def test_files():
@@ -32,6 +41,110 @@ def test_file_read_missing_content():
     nose.tools.assert_in("oops", next(iter(data.variables)))  # file name should be part of the variable name
 
 
+def test_mapped_file():
+    content = bytes(range(256)) * 0x30
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'input')
+        with open(path, 'wb') as fp:
+            fp.write(content)
+
+        s = angr.SimState(arch='AMD64')
+        f = SimMappedFile('input', path=path, has_end=True)
+        s.fs.insert(b'/input', f)
+        nose.tools.assert_equal(s.solver.eval(f.size), len(content))
+
+        data, _, _ = f.read(0x1ff0, 0x20)
+        nose.tools.assert_equal(s.solver.eval(data, cast_to=bytes), content[0x1ff0:0x2010])
+        # only the pages that are accessed are backed by the mapping
+        nose.tools.assert_equal(sorted(f.mem._pages), [ 1, 2 ])
+        nose.tools.assert_is(type(f.mem[0x1ff0].object), memoryview)
+
+        # writes and symbolized ranges stay in the state that makes them
+        s2 = s.copy()
+        f2 = s2.fs.get(b'/input')
+        nose.tools.assert_is(f2.backer, f.backer)
+        f2.write(0x10, b'XXXX')
+        sym = f2.symbolize(0x20, 4)
+        nose.tools.assert_true(sym.symbolic)
+        nose.tools.assert_equal(s2.solver.eval(f2.load(0x10, 4), cast_to=bytes), b'XXXX')
+        nose.tools.assert_true(f2.load(0x20, 4).symbolic)
+        nose.tools.assert_equal(s.solver.eval(f.load(0x10, 0x14), cast_to=bytes), content[0x10:0x24])
+        nose.tools.assert_equal(s.fs.get(b'/input').concretize(), content)
+        with open(path, 'rb') as fp:
+            nose.tools.assert_equal(fp.read(), content)
+
+        # host filesystems can map their files
+        s = angr.SimState(arch='AMD64')
+        s.fs.mount(b'/host', SimHostFilesystem(tmpdir, mapped=True))
+        f = s.fs.get(b'/host/input')
+        nose.tools.assert_is_instance(f, SimMappedFile)
+        nose.tools.assert_equal(f.concretize(), content)
+
+        # the mapping can be closed once no state references it anymore
+        backer = HostFileBacker(path)
+        nose.tools.assert_equal(backer.view(0, 4).tobytes(), content[:4])
+        backer.close()
+        nose.tools.assert_raises(ValueError, backer.view, 0, 4)
+
+
+def _tcp_frame(src, dst, sport, dport, payload):
+    tcp = struct.pack('>HHIIBBHHH', sport, dport, 0, 0, 5 << 4, 0x18, 0xffff, 0, 0) + payload
+    ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), 0, 0, 64, 6, 0, socket.inet_aton(src),
+                     socket.inet_aton(dst)) + tcp
+    frame = b'\x00' * 12 + b'\x08\x00' + ip
+    # short frames are padded
+    return frame + b'\x00' * max(0, 60 - len(frame))
+
+
+def test_pcap():
+    packets = [
+        _tcp_frame('10.0.0.1', '10.0.0.2', 1234, 80, b'GET / HTTP/1.0\r\n\r\n'),
+        _tcp_frame('10.0.0.2', '10.0.0.1', 80, 1234, b'HTTP/1.0 200 OK'),
+        _tcp_frame('10.0.0.1', '10.0.0.2', 1234, 80, b''),
+        _tcp_frame('10.0.0.2', '10.0.0.1', 80, 1234, b'hi'),
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'capture.pcap')
+        with open(path, 'wb') as fp:
+            fp.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 0xffff, 1))
+            for frame in packets:
+                fp.write(struct.pack('<IIII', 0, 0, len(frame), len(frame)) + frame)
+
+        pcap = PCAP(path, ('10.0.0.2', 80))
+        nose.tools.assert_equal(len(pcap.out_streams), 1)
+        nose.tools.assert_equal(bytes(pcap.out_streams[0][1]), b'GET / HTTP/1.0\r\n\r\n')
+        nose.tools.assert_equal([ bytes(data) for _, data in pcap.in_streams ], [ b'HTTP/1.0 200 OK', b'hi' ])
+
+        copy = pcap.copy()
+        nose.tools.assert_equal(pcap.recv(4), (b'HTTP', 4))
+        nose.tools.assert_equal(pcap.recv(100), (b'/1.0 200 OK', 11))
+        nose.tools.assert_equal(pcap.recv(100), (b'hi', 2))
+        nose.tools.assert_equal(copy.recv(100), (b'HTTP/1.0 200 OK', 15))
+
+        # packets are only turned into ASTs when they are read
+        s = angr.SimState(arch='AMD64')
+        f = SimPacketsStream('sock', backing=pcap.in_streams)
+        f.set_state(s)
+        data, size, _ = f.read(None, 8)
+        nose.tools.assert_equal(s.solver.eval(data, cast_to=bytes), b'HTTP/1.0')
+        nose.tools.assert_equal(s.solver.eval(size), 8)
+        nose.tools.assert_equal(len(f.content), 1)
+
+        f2 = f.copy({})
+        f2.set_state(s)
+        nose.tools.assert_is(f2.backing, f.backing)
+        data, size, _ = f2.read(None, 100)
+        nose.tools.assert_equal(s.solver.eval(data, cast_to=bytes), b' 200 OK')
+        data, size, _ = f2.read(None, 100)
+        nose.tools.assert_equal(s.solver.eval(data, cast_to=bytes), b'hi')
+        # past the end of the capture, packets are symbolic
+        data, size, _ = f2.read(None, 4)
+        nose.tools.assert_true(data.symbolic)
+        nose.tools.assert_equal(len(f.content), 1)
+
+
 if __name__ == '__main__':
     test_files()
     test_file_read_missing_content()
+    test_mapped_file()
+    test_pcap()
@@ -299,9 +299,41 @@ def test_inspect_engine_process():
                     condition=second_symbolic_fork)
     pg.run()
 
+def test_inspect_event_mask():
+    s = SimState(arch='AMD64', mode='symbolic')
+    nose.tools.assert_equal(s._inspect_mask, 0)
+    nose.tools.assert_false(s.inspect.listening('mem_read'))
+
+    bp = s.inspect.b('mem_read', BP_AFTER)
+    s.inspect.b('exit', BP_BEFORE)
+    nose.tools.assert_true(s.inspect.listening('mem_read'))
+    nose.tools.assert_true(s.inspect.listening('exit'))
+    nose.tools.assert_false(s.inspect.listening('reg_write'))
+    nose.tools.assert_equal(s._inspect_mask, s.inspect._event_mask)
+
+    # copies share the mask
+    c = s.copy()
+    nose.tools.assert_equal(c._inspect_mask, s._inspect_mask)
+
+    s.inspect.remove_breakpoint('mem_read', bp=bp)
+    nose.tools.assert_false(s.inspect.listening('mem_read'))
+    nose.tools.assert_true(s.inspect.listening('exit'))
+    nose.tools.assert_true(c.inspect.listening('mem_read'))
+
+    # no inspect attributes are set for events without breakpoints
+    s.memory.store(0x1000, s.solver.BVV(0x41424344, 32))
+    s.memory.load(0x1000, 4)
+    nose.tools.assert_is_none(s.inspect.mem_read_expr)
+    nose.tools.assert_is_none(s.inspect.mem_write_expr)
+
+    # but they are for events with breakpoints
+    c.memory.load(0x1000, 4)
+    nose.tools.assert_is_not_none(c.inspect.mem_read_expr)
+
 if __name__ == '__main__':
     test_inspect()
     test_inspect_concretization()
     test_inspect_exit()
     test_inspect_syscall()
     test_inspect_engine_process()
+    test_inspect_event_mask()
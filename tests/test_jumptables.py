@@ -3,6 +3,7 @@
 
 import os
 import logging
+import tempfile
 
 import nose.tools
 
@@ -221,6 +222,79 @@ def test_jumptable_occupied_as_data():
     nose.tools.assert_equal(len(cfg.model.get_any_node(0x402e4d).successors), 10)
 
 
+def test_jumptable_cache():
+    p = angr.Project(os.path.join(test_location, "x86_64", "cfg_switches"), auto_load_libs=False)
+
+    cache = angr.analyses.cfg.indirect_jump_resolvers.JumpTableCache()
+    cfg_0 = p.analyses.CFGFast(jumptable_cache=cache)
+    nose.tools.assert_greater(len(cache), 0)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_path = os.path.join(tmpdir, "jumptables.cache")
+        cache.save(cache_path)
+
+        # load the persisted cache and resolve all jump tables again
+        cfg_1 = p.analyses.CFGFast(jumptable_cache=cache_path)
+        nose.tools.assert_true(os.path.isfile(cache_path))
+
+    nose.tools.assert_greater(cfg_1._jumptable_cache.hits, 0)
+    nose.tools.assert_equal(set(cfg_0.jump_tables), set(cfg_1.jump_tables))
+    for addr, jumptable in cfg_0.jump_tables.items():
+        nose.tools.assert_equal(jumptable.jumptable_addr, cfg_1.jump_tables[addr].jumptable_addr)
+        nose.tools.assert_equal(jumptable.jumptable_entries, cfg_1.jump_tables[addr].jumptable_entries)
+
+
+def test_jumptable_cache_pic_copies():
+    # a position-independent switch that is duplicated at another address. both copies have the same cache key, but
+    # each copy must be resolved to its own jump table and targets
+    switch = bytes.fromhex(
+        "83ff03"            # 0x00: cmp edi, 3
+        "7728"              # 0x03: ja 0x2d
+        "488d1524000000"    # 0x05: lea rdx, [rip+0x24] (0x30)
+        "486304ba"          # 0x0c: movsxd rax, dword [rdx+rdi*4]
+        "4801d0"            # 0x10: add rax, rdx
+        "ffe0"              # 0x13: jmp rax
+        "b800000000c3"      # 0x15: mov eax, 0; ret
+        "b801000000c3"      # 0x1b: mov eax, 1; ret
+        "b802000000c3"      # 0x21: mov eax, 2; ret
+        "b803000000c3"      # 0x27: mov eax, 3; ret
+        "31c0c3"            # 0x2d: xor eax, eax; ret
+        "e5ffffff" "ebffffff" "f1ffffff" "f7ffffff"   # 0x30: the jump table, relative to itself
+    )
+    base = 0x400000
+    code = switch.ljust(0x100, b"\xcc") + switch
+    p = angr.load_shellcode(code, "amd64", load_address=base)
+
+    cache = angr.analyses.cfg.indirect_jump_resolvers.JumpTableCache()
+    cfg = p.analyses.CFGFast(function_starts=[ base, base + 0x100 ], force_complete_scan=False,
+                             jumptable_cache=cache)
+
+    nose.tools.assert_greater(cache.hits, 0)
+    for func_addr in (base, base + 0x100):
+        jumptable = cfg.jump_tables[func_addr + 0x5]
+        nose.tools.assert_equal(jumptable.jumptable_addr, func_addr + 0x30)
+        nose.tools.assert_equal(jumptable.jumptable_entries, [ func_addr + off for off in (0x15, 0x1b, 0x21, 0x27) ])
+
+
+def test_parallel_jumptable_resolution():
+    p = angr.Project(os.path.join(test_location, "x86_64", "dir_gcc_-O0"), auto_load_libs=False)
+
+    cache_0 = angr.analyses.cfg.indirect_jump_resolvers.JumpTableCache()
+    cache_1 = angr.analyses.cfg.indirect_jump_resolvers.JumpTableCache()
+    cfg_0 = p.analyses.CFGFast(jumptable_cache=cache_0)
+    cfg_1 = p.analyses.CFGFast(indirect_jump_resolution_workers=2, jumptable_cache=cache_1)
+
+    # entries that are stored by the workers end up in the cache of the main process
+    nose.tools.assert_greater(len(cache_1), 0)
+    nose.tools.assert_equal(len(cache_0), len(cache_1))
+
+    nose.tools.assert_equal(set(cfg_0.jump_tables), set(cfg_1.jump_tables))
+    for addr, jumptable in cfg_0.jump_tables.items():
+        nose.tools.assert_equal(jumptable.jumptable_addr, cfg_1.jump_tables[addr].jumptable_addr)
+        nose.tools.assert_equal(jumptable.jumptable_entries, cfg_1.jump_tables[addr].jumptable_entries)
+    nose.tools.assert_equal(len(cfg_0.graph.nodes()), len(cfg_1.graph.nodes()))
+
+
 if __name__ == "__main__":
     test_amd64_dir_gcc_O0()
     test_amd64_cfgswitches_gcc()
@@ -232,3 +306,6 @@ if __name__ == "__main__":
     test_armel_lwip_tcpecho_bm()
     test_s390x_cfgswitches()
     test_jumptable_occupied_as_data()
+    test_jumptable_cache()
+    test_jumptable_cache_pic_copies()
+    test_parallel_jumptable_resolution()
@@ -1,15 +1,19 @@
 import time
 import os
+import pickle
 
 import claripy
 import nose
 
+import angr
 from angr.storage.paged_memory import SimPagedMemory
-from angr import SimState, SIM_PROCEDURES
+from angr.storage.memory_object import SimMemoryObject, SimBytesMemoryObject, SimASTMemoryObject, filled_bytes
+from angr import SimState, SIM_PROCEDURES, BP_AFTER
 from angr import options as o
 from angr.state_plugins import SimSystemPosix, SimLightRegisters
 from angr.storage.file import SimFile
 
+test_location = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'binaries', 'tests')
 
 def test_copy():
     s = SimState(arch="AMD64")
@@ -694,6 +698,300 @@ def test_underconstrained():
     state.memory.store(ptr3, b"\x41", size=1)
     state.memory.load(ptr3, size=1)
 
+def test_concrete_find():
+    s = SimState(arch='AMD64')
+    s.memory.store(0x1000, b"hello world, this is a long string" * 10 + b"\0")
+
+    # entirely concrete, across chunks
+    r, c, i = s.memory.find(0x1000, b"\0", max_search=0x200)
+    nose.tools.assert_equal(s.solver.eval(r), 0x1000 + 340)
+    nose.tools.assert_equal(i, [ 340 ])
+    nose.tools.assert_true(s.solver.is_true(claripy.And(*c)))
+
+    r, _, i = s.memory.find(0x1000, b"wor", max_search=0x200)
+    nose.tools.assert_equal(i, [ 6 ])
+
+    # honor the step
+    r, _, i = s.memory.find(0x1000, b"i", max_search=0x200, step=2)
+    nose.tools.assert_equal(i, [ 18 ])
+
+    # not found within max_search
+    r, c, i = s.memory.find(0x1000, b"\0", max_search=0x20, default=0x4000)
+    nose.tools.assert_equal(i, [ ])
+    nose.tools.assert_equal(s.solver.eval(r), 0x4000)
+
+    # a symbolic byte in the middle: concrete bytes before it are searched natively, the rest byte by byte
+    sym = s.solver.BVS('sym', 8)
+    s.memory.store(0x2000, b"abcdef")
+    s.memory.store(0x2006, sym)
+    s.memory.store(0x2007, b"gh\0")
+    r, c, i = s.memory.find(0x2000, b"\0", max_search=0x100)
+    nose.tools.assert_equal(i, [ 6, 9 ])
+    s.add_constraints(*c)
+    nose.tools.assert_equal(sorted(s.solver.eval_upto(r, 3)), [ 0x2006, 0x2009 ])
+    nose.tools.assert_equal(s.solver.eval_upto(r, 2, extra_constraints=(sym != 0, )), [ 0x2009 ])
+
+
+def test_bulk_copy():
+    s = SimState(arch='AMD64')
+    sym = s.solver.BVS('sym', 32)
+    s.memory.store(0x1000, b"0123456789abcdef" * 0x200)
+    s.memory.store(0x1010, sym)
+
+    # concrete copies do not load the data
+    nose.tools.assert_is_none(s.memory.copy_contents(0x8000, 0x1000, 0x2000))
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x8000, 16), cast_to=bytes), b"0123456789abcdef")
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x9ff0, 16), cast_to=bytes), b"0123456789abcdef")
+    nose.tools.assert_true(s.solver.is_true(s.memory.load(0x8010, 4) == sym))
+
+    # objects are shared instead of being copied
+    nose.tools.assert_is(s.memory.mem[0x8010].object, s.memory.mem[0x1010].object)
+
+    # overlapping copies behave like memmove
+    s.memory.store(0x3000, b"ABCDEFGH")
+    s.memory.copy_contents(0x3002, 0x3000, 6)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x3000, 8), cast_to=bytes), b"ABABCDEF")
+    s.memory.copy_contents(0x3000, 0x3002, 6)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x3000, 8), cast_to=bytes), b"ABCDEFEF")
+
+    # uninitialized bytes are filled in the source
+    s.memory.copy_contents(0x5000, 0x4000, 8)
+    nose.tools.assert_true(s.solver.is_true(s.memory.load(0x5000, 8) == s.memory.load(0x4000, 8)))
+
+    # copies from files
+    f = SimFile(name='f', content=b"file contents")
+    f.set_state(s)
+    s.memory.copy_contents(0x6000, 4, 8, src_memory=f)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x6000, 8), cast_to=bytes), b"contents")
+
+    # breakpoints on memory accesses still see the data
+    reads = [ ]
+    s.inspect.b('mem_read', when=BP_AFTER, action=lambda st: reads.append(st.inspect.mem_read_expr))
+    nose.tools.assert_is_not_none(s.memory.copy_contents(0x7000, 0x1000, 4))
+    nose.tools.assert_equal(len(reads), 1)
+
+    # fills
+    s.memory.fill(0x10000, 0x41, 0x3000)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x10ffe, 4), cast_to=bytes), b"AAAA")
+    s.memory.fill(0x10001, s.solver.BVV(0, 8), 2)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x10000, 4), cast_to=bytes), b"A\0\0A")
+    s.memory.fill(0x20000, sym[7:0], 3)
+    nose.tools.assert_true(s.solver.is_true(s.memory.load(0x20000, 3) == sym[7:0].concat(sym[7:0], sym[7:0])))
+
+
+def test_page_hashes():
+    s = SimState(arch='AMD64')
+    s.memory.store(0x1000, b"A" * 0x100)
+    s.memory.store(0x5000, b"B" * 0x100)
+    s1 = s.copy()
+    s2 = s.copy()
+
+    # the same data is stored separately in both states
+    s1.memory.store(0x1010, b"CCCC")
+    s2.memory.store(0x1010, b"CCCC")
+    p1 = s1.memory.mem._pages[1]
+    p2 = s2.memory.mem._pages[1]
+    nose.tools.assert_is_not(p1, p2)
+    nose.tools.assert_equal(p1.content_hash, p2.content_hash)
+    nose.tools.assert_equal(p1.copy().content_hash, p1.content_hash)
+    nose.tools.assert_equal(s1.memory.changed_bytes(s2.memory), set())
+
+    # stores invalidate the hash
+    old_hash = p2.content_hash
+    s2.memory.store(0x1014, b"C")
+    nose.tools.assert_not_equal(s2.memory.mem._pages[1].content_hash, old_hash)
+    s2.memory.store(0x5004, b"D")
+    nose.tools.assert_equal(s1.memory.changed_bytes(s2.memory), { 0x1014, 0x5004 })
+
+    merged, _, _ = s1.merge(s2)
+    nose.tools.assert_equal(sorted(merged.solver.eval_upto(merged.memory.load(0x5004, 1), 3)), [ 0x42, 0x44 ])
+
+    # colliding hashes do not hide differences
+    s3 = s1.copy()
+    s3.memory.store(0x1020, b"E")
+    p3 = s3.memory.mem._pages[1]
+    p3._content_hash = s1.memory.mem._pages[1].content_hash
+    nose.tools.assert_equal(s1.memory.changed_bytes(s3.memory), { 0x1020 })
+
+
+def test_lazy_reverse_mappings():
+    s = SimState(arch='AMD64', add_options={ o.REVERSE_MEMORY_NAME_MAP, o.REVERSE_MEMORY_HASH_MAP })
+    x = s.solver.BVS('x', 32)
+    x_name = next(iter(x.variables))
+    s.memory.store(0x1000, x)
+    s.memory.store(0x2000, x + 1)
+
+    # nothing is tracked until the first query
+    nose.tools.assert_false(s.memory.mem._mappings_built)
+    nose.tools.assert_equal(len(s.memory.mem._name_mapping), 0)
+
+    nose.tools.assert_equal(set(s.memory.addrs_for_name(x_name)), set(range(0x1000, 0x1004)) | set(range(0x2000, 0x2004)))
+    nose.tools.assert_equal(set(s.memory.addrs_for_hash(hash(x))), set(range(0x1000, 0x1004)))
+    nose.tools.assert_true(s.memory.mem._mappings_built)
+
+    # after that, the mappings are updated on stores
+    s.memory.store(0x1002, b"AB")
+    nose.tools.assert_equal(set(s.memory.addrs_for_name(x_name)), set(range(0x1000, 0x1002)) | set(range(0x2000, 0x2004)))
+
+    # and forked states do not see each other's updates
+    s2 = s.copy()
+    s2.memory.store(0x2000, s2.solver.BVV(0, 32))
+    nose.tools.assert_equal(set(s2.memory.addrs_for_name(x_name)), set(range(0x1000, 0x1002)))
+    nose.tools.assert_equal(set(s.memory.addrs_for_name(x_name)), set(range(0x1000, 0x1002)) | set(range(0x2000, 0x2004)))
+
+    y = s.solver.BVS('y', 32)
+    s.memory.replace_all(x, y)
+    nose.tools.assert_true(s.solver.is_true(s.memory.load(0x1000, 2) == y[31:16]))
+    nose.tools.assert_true(s.solver.is_true(s.memory.load(0x2000, 4) == y + 1))
+
+
+def test_backer_pages():
+    p = angr.Project(os.path.join(test_location, 'x86_64', 'fauxware'), auto_load_libs=False)
+    main = p.loader.main_object
+    text = main.sections_map['.text']
+    expected = p.loader.memory.load(text.vaddr, 0x10)
+
+    s = p.factory.blank_state()
+    mo = s.memory.mem[text.vaddr]
+    # the data of the loader is referenced, not copied
+    nose.tools.assert_is(type(mo.object), memoryview)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(text.vaddr, 0x10), cast_to=bytes), expected)
+
+    # stores do not write through to the loader or to other states
+    s2 = s.copy()
+    s2.memory.store(text.vaddr, b"\xcc" * 4)
+    nose.tools.assert_equal(p.loader.memory.load(text.vaddr, 0x10), expected)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(text.vaddr, 0x10), cast_to=bytes), expected)
+    nose.tools.assert_equal(s2.solver.eval(s2.memory.load(text.vaddr, 4), cast_to=bytes), b"\xcc" * 4)
+
+    # the data of writable segments is copied, since the loader may still modify it
+    data = next(seg for seg in main.segments if seg.is_writable)
+    nose.tools.assert_is(type(s.memory.mem[data.vaddr].object), bytes)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(data.vaddr, 8), cast_to=bytes),
+                            p.loader.memory.load(data.vaddr, 8))
+
+    # permissions come from the segments of the binary
+    nose.tools.assert_equal(s.solver.eval(s.memory.permissions(text.vaddr)) & 5, 5)
+    nose.tools.assert_true(s.memory.mem._permission_map)
+    for (start, end), flags in s.memory.mem._permission_map.items():
+        nose.tools.assert_equal(s.memory.mem._backer_permissions(start), flags)
+        nose.tools.assert_equal(s.memory.mem._backer_permissions(end - 1), flags)
+    nose.tools.assert_is_none(s.memory.mem._backer_permissions(0))
+
+    # states that initialize the same loader pages separately can be compared and merged
+    a = p.factory.blank_state()
+    b = p.factory.blank_state()
+    a.memory.load(text.vaddr, 4)
+    b.memory.load(text.vaddr, 4)
+    hash(a.memory.mem[text.vaddr])
+    nose.tools.assert_equal(a.memory.changed_bytes(b.memory), set())
+    b.memory.store(text.vaddr + 0x100, b"\x90")
+    merged, _, _ = a.merge(b)
+    nose.tools.assert_equal(merged.solver.eval(merged.memory.load(text.vaddr, 0x10), cast_to=bytes), expected)
+
+
+def test_symbolic_write_log():
+    s = SimState(arch='AMD64', add_options={o.SYMBOLIC_WRITE_LOG})
+    x = s.solver.BVS('x', 64)
+    y = s.solver.BVS('y', 64)
+
+    s.memory.store(0x10, b'A'*0x10)
+    s.add_constraints(x >= 0x10, x < 0x20)
+    s.memory.store(x, b'B')
+    # the write is logged, not expanded into the pages
+    nose.tools.assert_equal(len(s.memory._write_log), 1)
+    nose.tools.assert_equal(s.solver.eval(s.memory.mem[0x15].object, cast_to=bytes), b'A'*0x10)
+
+    for i in range(0x10, 0x20):
+        nose.tools.assert_equal(sorted(s.solver.eval_upto(s.memory.load(i, 1), 10, cast_to=bytes)), [ b'A', b'B' ])
+    nose.tools.assert_equal(s.solver.eval_upto(s.memory.load(0x15, 1), 10, cast_to=bytes, extra_constraints=(x == 0x15,)), [ b'B' ])
+
+    # a concrete store afterwards wins
+    s.memory.store(0x14, b'C')
+    nose.tools.assert_equal(s.solver.eval_upto(s.memory.load(0x14, 1), 10, cast_to=bytes), [ b'C' ])
+
+    # multi-byte, little-endian writes
+    s2 = s.copy()
+    s2.add_constraints(y >= 0x10, y < 0x1e)
+    s2.memory.store(y, s2.solver.BVV(0x4544, 16), endness='Iend_LE')
+    nose.tools.assert_equal(len(s.memory._write_log), 1)
+    nose.tools.assert_equal(s2.solver.eval_upto(s2.memory.load(0x18, 2), 10, cast_to=bytes, extra_constraints=(y == 0x18, x == 0x10)), [ b'DE' ])
+    nose.tools.assert_equal(s2.solver.eval_upto(s2.memory.load(0x18, 2), 10, cast_to=bytes, extra_constraints=(y == 0x17, x == 0x19)), [ b'EB' ])
+    # a symbolic read selects from the log as well
+    nose.tools.assert_equal(s2.solver.eval_upto(s2.memory.load(y, 2, endness='Iend_LE'), 10), [ 0x4544 ])
+
+    # merging stores the log into the pages
+    merged, _, _ = s.merge(s2)
+    nose.tools.assert_equal(merged.memory._write_log, [ ])
+    nose.tools.assert_equal(sorted(merged.solver.eval_upto(merged.memory.load(0x14, 1), 10, cast_to=bytes)), [ b'C', b'D', b'E' ])
+    nose.tools.assert_equal(sorted(merged.solver.eval_upto(merged.memory.load(0x12, 1), 10, cast_to=bytes)), [ b'A', b'B', b'D', b'E' ])
+
+    # writes that may target too many bytes are not logged
+    z = s.solver.BVS('z', 64)
+    s.add_constraints(z >= 0x1000, z < 0x100000)
+    s.options.symbolic_write_log_max_range = 0x100
+    s.memory.store(z, b'Z')
+    nose.tools.assert_equal(len(s.memory._write_log), 1)
+
+
+def test_memory_objects():
+    c = SimMemoryObject(b"ABCD", 0x10)
+    a = SimMemoryObject(claripy.BVV(b"ABCD"), 0x10)
+    nose.tools.assert_is_instance(c, SimBytesMemoryObject)
+    nose.tools.assert_is_instance(a, SimASTMemoryObject)
+    # memory objects are slotted
+    nose.tools.assert_false(hasattr(c, '__dict__'))
+    nose.tools.assert_false(hasattr(a, '__dict__'))
+    nose.tools.assert_equal(c.length, 4)
+    nose.tools.assert_equal(a.length, 4)
+    nose.tools.assert_not_equal(a, c)
+
+    nose.tools.assert_equal(c, SimMemoryObject(memoryview(b"ABCD"), 0x10))
+    nose.tools.assert_equal(hash(c), hash(SimMemoryObject(memoryview(b"ABCD"), 0x10)))
+    nose.tools.assert_equal(c.bytes_at(0x11, 2, allow_concrete=True), b"BC")
+    nose.tools.assert_is(a.bytes_at(0x10, 4), a.object)
+
+    for mo in (c, a, SimMemoryObject(memoryview(b"ABCD"), 0x10)):
+        nose.tools.assert_equal(pickle.loads(pickle.dumps(mo)), mo)
+
+    # zero-filled spans are shared
+    z = filled_bytes(0, 0x1000)
+    nose.tools.assert_equal(bytes(z), b"\0" * 0x1000)
+    nose.tools.assert_is(z.obj, filled_bytes(0, 0x200).obj)
+    nose.tools.assert_equal(filled_bytes(0x41, 3), b"AAA")
+    nose.tools.assert_equal(hash(SimMemoryObject(z, 0)), hash(SimMemoryObject(b"\0" * 0x1000, 0)))
+
+    s = SimState(arch='AMD64')
+    s.memory.store(0x1000, b"X" * 0x400)
+    s.memory.fill(0x1000, 0, 0x400)
+    nose.tools.assert_is(s.memory.mem[0x1000].object.obj, z.obj)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x1000, 0x400), cast_to=bytes), b"\0" * 0x400)
+
+
+def test_merge_after_bulk_copy():
+    s = SimState(arch='AMD64')
+    s.memory.store(0x1000, b"0123456789abcdef" * 0x40)
+    s.memory.store(0x2000, b"fedcba9876543210" * 0x40)
+
+    # memory objects that are created by fills and copies hold bytes or memoryviews, which are merged as ASTs
+    a = s.copy()
+    b = s.copy()
+    a.memory.fill(0x8000, 0x41, 0x400)
+    b.memory.fill(0x8000, 0x42, 0x400)
+    a.memory.copy_contents(0x9000, 0x1000, 0x400)
+    b.memory.copy_contents(0x9000, 0x2000, 0x400)
+
+    c = a.solver.BVS('c', 32)
+    merged, _, merging_occurred = a.merge(b, merge_conditions=[ c == 0, c != 0 ])
+    nose.tools.assert_true(merging_occurred)
+
+    nose.tools.assert_equal(sorted(merged.solver.eval_upto(merged.memory.load(0x83fe, 2), 3, cast_to=bytes)),
+                            sorted([ b"AA", b"BB" ]))
+    merged.add_constraints(c == 0)
+    nose.tools.assert_equal(merged.solver.eval(merged.memory.load(0x8000, 4), cast_to=bytes), b"AAAA")
+    nose.tools.assert_equal(merged.solver.eval(merged.memory.load(0x9000, 4), cast_to=bytes), b"0123")
+
+
 if __name__ == '__main__':
     test_crosspage_read()
     test_fast_memory()
@@ -711,3 +1009,11 @@ if __name__ == '__main__':
     test_concrete_memset()
     test_paged_memory_membacker_equal_size()
     test_underconstrained()
+    test_concrete_find()
+    test_bulk_copy()
+    test_merge_after_bulk_copy()
+    test_page_hashes()
+    test_lazy_reverse_mappings()
+    test_backer_pages()
+    test_symbolic_write_log()
+    test_memory_objects()
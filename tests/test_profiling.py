@@ -0,0 +1,77 @@
+import os
+import json
+import tempfile
+
+import nose.tools
+
+import angr
+from angr.misc.profiling import AnalysisProfiler, get_profiler, profiling
+
+test_location = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'binaries', 'tests')
+
+
+def test_profiling_disabled_by_default():
+    nose.tools.assert_is_none(get_profiler())
+
+    p = angr.Project(os.path.join(test_location, 'x86_64', 'fauxware'), auto_load_libs=False)
+    cfg = p.analyses.CFGFast()
+    # no instrumented methods are left on the analysis
+    nose.tools.assert_not_in('_get_successors', cfg.__dict__)
+
+
+def test_profiling_cfgfast():
+    p = angr.Project(os.path.join(test_location, 'x86_64', 'fauxware'), auto_load_libs=False)
+
+    with profiling(trace=True) as profiler:
+        cfg = p.analyses.CFGFast()
+    nose.tools.assert_is_none(get_profiler())
+    nose.tools.assert_not_in('_get_successors', cfg.__dict__)
+
+    report = profiler.report()
+    nose.tools.assert_in('CFGFast', report)
+    cfg_report = report['CFGFast']
+    nose.tools.assert_equal(cfg_report['runs']['count'], 1)
+    for phase in ('_pre_analysis', '_get_successors', '_handle_successor', '_post_analysis'):
+        nose.tools.assert_in(phase, cfg_report['phases'])
+    nose.tools.assert_equal(cfg_report['phases']['_pre_analysis']['count'], 1)
+    nose.tools.assert_greater(cfg_report['phases']['_get_successors']['count'], 0)
+    nose.tools.assert_true(cfg_report['jobs'])
+    nose.tools.assert_true(profiler.format_report())
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        trace_path = os.path.join(tmpdir, 'trace.json')
+        profiler.dump_chrome_trace(trace_path)
+        with open(trace_path, 'r') as f:
+            trace = json.load(f)
+    nose.tools.assert_true(trace['traceEvents'])
+    nose.tools.assert_true(all(e['ph'] == 'X' for e in trace['traceEvents']))
+
+
+def test_profiler_instrument():
+
+    class Dummy:
+        def work(self, job):
+            return job + 1
+
+        def other(self):
+            return 0
+
+    profiler = AnalysisProfiler()
+    d = Dummy()
+    with profiler.instrument(d, ('work', 'other'), job_phases=('work', )):
+        d.work(1)
+        d.work(1)
+        d.work(2)
+        d.other()
+    nose.tools.assert_not_in('work', d.__dict__)
+
+    nose.tools.assert_equal(profiler.phases['Dummy']['work'].count, 3)
+    nose.tools.assert_equal(profiler.phases['Dummy']['other'].count, 1)
+    nose.tools.assert_equal(profiler.jobs['Dummy'][1].count, 2)
+    nose.tools.assert_equal(profiler.jobs['Dummy'][2].count, 1)
+
+
+if __name__ == '__main__':
+    test_profiling_disabled_by_default()
+    test_profiling_cfgfast()
+    test_profiler_instrument()
@@ -115,16 +115,87 @@ def test_explore_with_cfg():
     pg.run()
 
     nose.tools.assert_equal(len(pg.active), 0)
-    nose.tools.assert_equal(len(pg.avoid), 1)
+    nose.tools.assert_equal(len(pg.avoid), 0)
+    nose.tools.assert_equal(len(pg.pruned), 1)
     nose.tools.assert_equal(len(pg.found), 2)
     nose.tools.assert_equal(pg.found[0].addr, 0x4006ED)
     nose.tools.assert_equal(pg.found[1].addr, 0x4006ED)
-    nose.tools.assert_equal(pg.avoid[0].addr, 0x4007C9)
+    nose.tools.assert_equal(pg.pruned[0].addr, 0x4007C9)
+
+def test_explore_with_cfgfast():
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+
+    cfg = p.analyses.CFGFast()
+
+    pg = p.factory.simulation_manager()
+    explorer = pg.use_technique(angr.exploration_techniques.Explorer(find=0x4006ED, cfg=cfg, num_find=3))
+    nose.tools.assert_is_not_none(explorer.cfg)
+    nose.tools.assert_in(cfg.kb.functions['main'].addr, explorer.ok_blocks)
+    nose.tools.assert_in(cfg.kb.functions['main'].addr, explorer.ok_functions)
+    pg.run()
+
+    nose.tools.assert_equal(len(pg.active), 0)
+    nose.tools.assert_equal(len(pg.found), 2)
+    nose.tools.assert_in(0x4007C9, [ s.addr for s in pg.pruned ])
+
+def test_checkpoint_dfs():
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+
+    pg = p.factory.simulation_manager()
+    pg.use_technique(angr.exploration_techniques.DFS())
+    pg.run()
+
+    pg2 = p.factory.simulation_manager()
+    dfs = pg2.use_technique(angr.exploration_techniques.CheckpointDFS())
+    while pg2.active:
+        nose.tools.assert_equal(len(pg2.active), 1)
+        pg2.step()
+
+    # every deferred alternative has been re-derived from its checkpoint
+    nose.tools.assert_equal(dfs.deferred, 0)
+    nose.tools.assert_greater(dfs.rederived_count, 0)
+    nose.tools.assert_equal(sorted(s.posix.dumps(1) for s in pg2.deadended),
+                            sorted(s.posix.dumps(1) for s in pg.deadended))
+
+class _DropFirstSuccessor(angr.exploration_techniques.ExplorationTechnique):
+    def step_state(self, simgr, state, **kwargs):
+        stashes = simgr.step_state(state, **kwargs)
+        successors = stashes.get(None, [ ])
+        if len(successors) > 1:
+            stashes['dropped'] = stashes.get('dropped', [ ]) + successors[:1]
+            stashes[None] = successors[1:]
+        return stashes
+
+def test_checkpoint_dfs_moved_successors():
+    # successors that other techniques move out of the active stash do not shift the indices of the others
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+
+    pg = p.factory.simulation_manager()
+    pg.use_technique(angr.exploration_techniques.DFS())
+    pg.use_technique(_DropFirstSuccessor())
+    pg.run()
+
+    pg2 = p.factory.simulation_manager()
+    dfs = pg2.use_technique(angr.exploration_techniques.CheckpointDFS())
+    pg2.use_technique(_DropFirstSuccessor())
+    while pg2.active:
+        pg2.step()
+
+    nose.tools.assert_equal(dfs.deferred, 0)
+    nose.tools.assert_equal(sorted(s.addr for s in pg2.dropped), sorted(s.addr for s in pg.dropped))
+    nose.tools.assert_equal(sorted(s.posix.dumps(1) for s in pg2.deadended),
+                            sorted(s.posix.dumps(1) for s in pg.deadended))
 
 if __name__ == "__main__":
     logging.getLogger('angr.sim_manager').setLevel('DEBUG')
     print('explore_with_cfg')
     test_explore_with_cfg()
+    print('explore_with_cfgfast')
+    test_explore_with_cfgfast()
+    print('checkpoint_dfs')
+    test_checkpoint_dfs()
+    print('checkpoint_dfs_moved_successors')
+    test_checkpoint_dfs_moved_successors()
     print('find_to_middle')
     test_find_to_middle()
 
@@ -63,8 +63,38 @@ def test_palindrome2():
         for state in pg.cut
     )
 
+@nose.with_setup(setup, teardown)
+def test_memory_budget():
+    project = angr.Project(_bin('tests', 'cgc', 'sc2_0b32aa01_01'))
+    state = project.factory.entry_state()
+
+    budget = angr.exploration_techniques.MemoryBudget(1)
+    nose.tools.assert_greater(budget.footprint(state), 0)
+
+    # a budget that only fits a handful of states
+    budget = angr.exploration_techniques.MemoryBudget(budget.footprint(state) * 4, priority_key=priority_key)
+    pg = project.factory.simulation_manager(state)
+    pg.use_technique(angr.exploration_techniques.LengthLimiter(max_length=250))
+    pg.use_technique(budget)
+    pg.run()
+
+    assert budget.evicted_count > 0
+    assert budget.reloaded_count == budget.evicted_count
+    assert budget.evicted == 0
+    # reloaded states are deleted from the vault, and the temporary vault is removed once it is empty
+    assert budget._vault is None
+
+    # only states in stashes that can be evicted count towards the budget
+    assert pg.deadended
+    assert budget.total_footprint(pg) == sum(budget.footprint(s) for s in pg.active)
+
+    # the simulation manager accepts a budget directly
+    pg = project.factory.simulation_manager(project.factory.entry_state(), memory_budget=2**30)
+    assert any(isinstance(t, angr.exploration_techniques.MemoryBudget) for t in pg._techniques)
+
 if __name__ == '__main__':
     setup()
     test_basic()
     test_palindrome2()
+    test_memory_budget()
     teardown()
@@ -202,6 +202,60 @@ def test_state_merge_optimal():
     assert not s.solver.satisfiable(extra_constraints=(culprit == 12, ))
 
 
+def test_state_merge_order():
+
+    def child(state, constraint):
+        s = state.copy()
+        s.register_plugin('history', state.history.make_child())
+        s.add_constraints(constraint)
+        return s
+
+    root = SimState(arch='AMD64', mode='symbolic')
+    x = root.solver.BVS('x', 32)
+    root.regs.rax = x
+
+    # root -> a -> {b, c}, root -> d -> {e, f}
+    # b and c are merged under a, e and f under d, and then the results under root
+    a = child(root, x < 100)
+    b = child(a, x < 10)
+    c = child(a, x >= 10)
+    d = child(root, x >= 100)
+    e = child(d, x < 200)
+    f = child(d, x >= 200)
+    for s, v in zip((b, c, e, f), (1, 2, 3, 4)):
+        s.regs.rbx = v
+
+    hierarchy = angr.StateHierarchy()
+    optimal, common, others = hierarchy.most_mergeable([e, b, c])
+    nose.tools.assert_equal(optimal, [b, c])
+    nose.tools.assert_is(common, a.history)
+    nose.tools.assert_equal(others, [e])
+
+    merges, remaining = hierarchy.merge_order([b, c, e, f])
+    nose.tools.assert_equal(len(merges), 3)
+    nose.tools.assert_in((a.history, [0, 1]), merges[:2])
+    nose.tools.assert_in((d.history, [2, 3]), merges[:2])
+    nose.tools.assert_equal(merges[2], (root.history, [4, 5]))
+    nose.tools.assert_equal(remaining, [6])
+
+    # a state that is at the common ancestor itself is merged there, not at the parent of the ancestor
+    optimal, common, others = hierarchy.most_mergeable([e, a, b])
+    nose.tools.assert_equal(optimal, [a, b])
+    nose.tools.assert_is(common, a.history)
+    nose.tools.assert_equal(others, [e])
+
+    merges, remaining = hierarchy.merge_order([a, b, c, e])
+    nose.tools.assert_equal(merges, [ (a.history, [0, 1, 2]), (root.history, [3, 4]) ])
+    nose.tools.assert_equal(remaining, [5])
+
+    sm = angr.SimulationManager(None, active_states=[b, c, e, f])
+    sm.merge(merge_key=lambda s: 0)
+    nose.tools.assert_equal(len(sm.active), 1)
+    m = sm.one_active
+    for xv, bv in ((5, 1), (50, 2), (150, 3), (250, 4)):
+        nose.tools.assert_true(m.solver.satisfiable(extra_constraints=(x == xv, m.regs.rbx == bv)))
+        nose.tools.assert_false(m.solver.satisfiable(extra_constraints=(x == xv, m.regs.rbx != bv)))
+
 
 def test_state_pickle():
     s = SimState(arch="AMD64")
@@ -298,14 +352,105 @@ def test_bypass_errored_irstmt():
     nose.tools.assert_equal(len(simgr.active), 1)
 
 
+def test_lazy_successors():
+
+    # cmp rdi, 5; je 8; nop; nop; nop
+    block_bytes = b"\x48\x83\xff\x05\x74\x02\x90\x90\x90"
+    proj = angr.load_shellcode(block_bytes, "amd64")
+
+    copies = [ 0 ]
+    orig_copy = SimState.copy
+
+    def counting_copy(self, *args, **kwargs):
+        copies[0] += 1
+        return orig_copy(self, *args, **kwargs)
+
+    def successors(state):
+        copies[0] = 0
+        SimState.copy = counting_copy
+        try:
+            return proj.factory.successors(state), copies[0]
+        finally:
+            SimState.copy = orig_copy
+
+    for constraint in (None, 5, 6):
+        num_copies = [ ]
+        for add_options in (set(), {angr.sim_options.LAZY_SUCCESSORS}):
+            state = proj.factory.blank_state(addr=0, add_options=add_options)
+            if constraint is not None:
+                state.add_constraints(state.regs.rdi == constraint)
+            succ, n = successors(state)
+            num_copies.append(n)
+            nose.tools.assert_equal(len(succ.lazy_exits), 0)
+            # infeasible exits do not produce any successor
+            nose.tools.assert_equal(len(succ.unsat_successors), 0)
+
+            if constraint == 5:
+                nose.tools.assert_equal([ s.addr for s in succ.flat_successors ], [ 8 ])
+            elif constraint == 6:
+                nose.tools.assert_equal([ s.addr for s in succ.flat_successors ], [ 6 ])
+            else:
+                nose.tools.assert_equal(sorted(s.addr for s in succ.flat_successors), [ 6, 8 ])
+                for s in succ.flat_successors:
+                    if s.addr == 8:
+                        nose.tools.assert_equal(s.solver.eval_upto(s.regs.rdi, 2), [ 5 ])
+                    else:
+                        nose.tools.assert_not_in(5, s.solver.eval_upto(s.regs.rdi, 256))
+
+        # the state is only copied when both sides of the branch are feasible, just like without LAZY_SUCCESSORS
+        nose.tools.assert_equal(num_copies[0], num_copies[1])
+
+
+def test_register_file():
+    s = SimState(arch='AMD64')
+    rf = s.register_file
+    rax = s.arch.registers['rax'][0]
+
+    rf.begin()
+    rf.store(rax, s.solver.BVV(0x1122334455667788, 64))
+    nose.tools.assert_equal(s.solver.eval(rf.load(rax, 1)), 0x88)
+    nose.tools.assert_equal(s.solver.eval(rf.load(rax + 1, 1)), 0x77)
+    rf.store(rax + 1, s.solver.BVV(0xaa, 8))
+    nose.tools.assert_equal(s.solver.eval(rf.load(rax, 8)), 0x112233445566aa88)
+    # the registers of the state are only updated when the cache is flushed
+    nose.tools.assert_true(s.registers.load(rax, 8).symbolic)
+    rf.end()
+    nose.tools.assert_false(rf.active)
+    nose.tools.assert_equal(s.solver.eval(s.regs.rax), 0x112233445566aa88)
+
+    # partial stores to registers that are not cached go to the state directly
+    rf.begin()
+    rf.store(rax, s.solver.BVV(0xbb, 8))
+    nose.tools.assert_equal(s.solver.eval(s.regs.rax), 0x112233445566aabb)
+    rf.end()
+
+    # mov rax, 0x1122334455667788; mov al, 0x99; mov rcx, rax; cmp rdi, 5; je 0x17; nop; nop
+    block_bytes = b"\x48\xb8\x88\x77\x66\x55\x44\x33\x22\x11\xb0\x99\x48\x89\xc1\x48\x83\xff\x05\x74\x02\x90\x90"
+    proj = angr.load_shellcode(block_bytes, "amd64")
+    results = [ ]
+    # register actions disable the cache
+    for add_options in (set(), {angr.sim_options.TRACK_REGISTER_ACTIONS}):
+        state = proj.factory.blank_state(addr=0, add_options=add_options)
+        succ = proj.factory.successors(state)
+        results.append(sorted((s.addr, s.solver.eval(s.regs.rax), s.solver.eval(s.regs.rcx),
+                               s.solver.eval_upto(s.regs.rdi == 5, 2)) for s in succ.flat_successors))
+        nose.tools.assert_false(any(s.register_file.active for s in succ.flat_successors))
+    nose.tools.assert_equal(results[0], results[1])
+    nose.tools.assert_equal([ r[:3] for r in results[0] ], [ (0x15, 0x1122334455667799, 0x1122334455667799),
+                                                            (0x17, 0x1122334455667799, 0x1122334455667799) ])
+
+
 if __name__ == '__main__':
     test_state()
     test_state_merge()
     test_state_merge_3way()
     test_state_merge_optimal()
+    test_state_merge_order()
     test_state_merge_optimal_nostrongrefstate()
     test_state_merge_static()
     test_state_pickle()
     test_global_condition()
     test_successors_catch_arbitrary_interrupts()
     test_bypass_errored_irstmt()
+    test_lazy_successors()
+    test_register_file()
@@ -1,9 +1,15 @@
+import os
+
 import claripy
 import angr
 
 class A:
 	n = 0
 
+class B:
+	def __init__(self, a):
+		self.a = a
+
 def do_vault_identity(v):
 	v.uuid_dedup.add(A)
 	assert len(v.keys()) == 0
@@ -123,10 +129,54 @@ def test_project():
 	assert sum(1 for k in v.keys() if k.startswith('Project')) == 1
 
 
+def do_vault_delete(v):
+	aid = v.store(A())
+	bid = v.store(A())
+	assert len(v.keys()) == 2
+	del v[aid]
+	assert list(v.keys()) == [ bid ]
+	assert not v.is_stored(aid)
+
+	# a deleted ID can be stored again
+	v.store(A(), id=aid)
+	assert len(v.keys()) == 2
+
+	# deduplicated objects are deleted along with the last object that refers to them
+	v.uuid_dedup.add(A)
+	shared = A()
+	b0 = v.store(B(shared))
+	b1 = v.store(B(shared))
+	assert len(v.keys()) == 5
+	del v[b0]
+	assert len(v.keys()) == 4
+	del v[b1]
+	assert sorted(v.keys()) == sorted([ aid, bid ])
+
+	# unless they have been stored explicitly
+	sid = v.store(shared)
+	b2 = v.store(B(shared))
+	del v[b2]
+	assert v.is_stored(sid)
+
+def test_vault_delete():
+	yield do_vault_delete, angr.vaults.VaultDir()
+	yield do_vault_delete, angr.vaults.VaultShelf()
+	yield do_vault_delete, angr.vaults.VaultDict()
+
+def test_vault_dir_close():
+	v = angr.vaults.VaultDir()
+	v.store(A())
+	d = v._dir
+	assert os.path.isdir(d)
+	v.close()
+	assert not os.path.exists(d)
 
 if __name__ == '__main__':
 	for _a,_b in test_vault():
 		_a(_b)
 	for _a,_b in test_ast_vault():
 		_a(_b)
+	for _a,_b in test_vault_delete():
+		_a(_b)
+	test_vault_dir_close()
 	test_project()